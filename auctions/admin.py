@@ -4,11 +4,13 @@ from .models import (
     Bid,
     Comment,
     Watchlist,
-    Listing
+    Listing,
+    MaxBid,
 )
 # Register your models here.
 admin.site.register(User)
 admin.site.register(Bid)
 admin.site.register(Comment)
 admin.site.register(Watchlist)
-admin.site.register(Listing)
\ No newline at end of file
+admin.site.register(Listing)
+admin.site.register(MaxBid)
@@ -0,0 +1,147 @@
+"""
+Read-only JSON API, version 1: the listing feed, listing detail and bid
+history.
+
+Every response carries a strong ETag and a Last-Modified header derived
+from Listing.updated_at, which every write to a listing (save, bid,
+close) moves forward. The validators are computed from a narrow query
+first, so a conditional GET that matches answers 304 Not Modified
+before any owner, bidder or bid rows are read. Bid histories are
+streamed, so their size does not bound memory.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import archive, feeds
+from .models import Listing
+from .pagination import get_page_size, keyset_paginate
+
+
+# Bids serialized per chunk written to the client
+STREAM_BATCH = 500
+
+# Listing fields in the feed, and in the detail on top of the owner and bidder
+FEED_FIELDS = ("id", "title", "category", "image_url", "starting_bid", "current_bid", "bid_count", "end_date", "is_active")
+DETAIL_FIELDS = FEED_FIELDS + ("description", "won_price", "created_at", "last_bid_at", "updated_at")
+VALIDATOR_FIELDS = ("id", "created_at", "updated_at")
+
+
+def dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))
+
+
+def compact(data, **kwargs):
+    return JsonResponse(data, json_dumps_params={"separators": (",", ":")}, **kwargs)
+
+
+def fields(listing, names):
+    return {name: getattr(listing, name) for name in names}
+
+
+def validators(rows, extra=""):
+    """
+        Strong ETag and last-modified time of a set of listings: the ETag
+        changes whenever a listing is added, removed or modified.
+    """
+    digest = hashlib.sha1(extra.encode())
+    last_modified = None
+    for row in rows:
+        changed = row.last_modified
+        digest.update(f"{row.pk}:{changed.timestamp()};".encode())
+        if last_modified is None or changed > last_modified:
+            last_modified = changed
+    return quote_etag(digest.hexdigest()[:32]), last_modified
+
+
+def conditional(request, etag, last_modified, build):
+    """
+        Answer 304 (or 412) when the request's validators match, else the
+        response from build(); either way with ETag and Last-Modified set.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build()
+    response["ETag"] = etag
+    if timestamp is not None:
+        response["Last-Modified"] = http_date(timestamp)
+    return response
+
+
+def not_found(auction_id):
+    return compact({"error": f"No listing {auction_id}."}, status=404)
+
+
+def _validator_row(auction_id):
+    return Listing.objects.only(*VALIDATOR_FIELDS).filter(pk=auction_id).first()
+
+
+def listing_feed(request):
+    """
+        One page of active listings, oldest first, optionally in one
+        `category`. `next` is the cursor for the `after` parameter.
+    """
+    category = request.GET.get("category")
+    queryset = feeds.in_category(category) if category else feeds.active()
+    queryset = queryset.only(*FEED_FIELDS, *VALIDATOR_FIELDS)
+    page = keyset_paginate(queryset, request.GET.get("after"), get_page_size(request))
+    etag, last_modified = validators(page, extra=page.next_cursor or "")
+
+    def build():
+        return compact({
+            "listings": [fields(listing, FEED_FIELDS) for listing in page],
+            "next": page.next_cursor,
+        })
+
+    return conditional(request, etag, last_modified, build)
+
+
+def listing_detail(request, auction_id):
+    row = _validator_row(auction_id)
+    if row is None:
+        return not_found(auction_id)
+    etag, last_modified = validators([row])
+
+    def build():
+        listing = Listing.objects.select_related("owner", "high_bidder").get(pk=auction_id)
+        data = fields(listing, DETAIL_FIELDS)
+        data["owner"] = listing.owner.username
+        data["high_bidder"] = listing.high_bidder.username if listing.high_bidder else None
+        return compact(data)
+
+    return conditional(request, etag, last_modified, build)
+
+
+def listing_bids(request, auction_id):
+    """
+        Every bid on a listing, highest first, streamed as one JSON object,
+        whether its bids are still in the Bid table or archived
+    """
+    row = _validator_row(auction_id)
+    if row is None:
+        return not_found(auction_id)
+    etag, last_modified = validators([row], extra="bids")
+
+    def build():
+        def stream():
+            yield '{"listing":%d,"bids":[' % auction_id
+            separator = ""
+            batch = []
+            for amount, username, created_at in archive.bid_history(auction_id):
+                batch.append(dumps({"amount": amount, "user": username, "created_at": created_at}))
+                if len(batch) >= STREAM_BATCH:
+                    yield separator + ",".join(batch)
+                    separator = ","
+                    batch = []
+            if batch:
+                yield separator + ",".join(batch)
+            yield "]}"
+
+        return StreamingHttpResponse(stream(), content_type="application/json")
+
+    return conditional(request, etag, last_modified, build)
@@ -3,3 +3,15 @@ from django.apps import AppConfig
 
 class AuctionsConfig(AppConfig):
     name = 'auctions'
+
+    def ready(self):
+        from django.conf import settings
+        from django.core import checks
+
+        from . import assets, auth, caching, db, events, facets, notifications, profiling, scheduler, search  # noqa: F401 (connect signal receivers)
+        db.install()
+        checks.register(assets.check_vendored, checks.Tags.staticfiles)
+        checks.register(search.check_fts_triggers, checks.Tags.database)
+        if "auctions.profiling.ProfilingMiddleware" in settings.MIDDLEWARE:
+            profiling.install()
+        scheduler.start()
@@ -0,0 +1,144 @@
+"""
+Archival of the bid history of closed auctions.
+
+A listing that closed more than AUCTIONS_BID_ARCHIVE_DAYS ago only needs
+its winner and a summary, so archive_closed_bids() replaces its Bid rows
+with one BidArchive row: the bid count, the winner and the top bids as
+columns, and every bid as gzipped JSON lines. The Bid table and its
+index keep the size of the recent auctions.
+
+Listings are archived in batches, each in a short transaction of its own
+that writes the archives and deletes the bids, so the sweep never holds
+the write lock for long and can be stopped and run again at any point:
+archived listings are skipped. bid_history() reads a listing's bids from
+wherever they are.
+
+A closed listing's updated_at is the time it closed, or a later edit,
+which only postpones its archival.
+"""
+import gzip
+import itertools
+import json
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Bid, BidArchive, Listing, User
+
+
+ARCHIVE_DAYS = 30
+BATCH_SIZE = 200
+TOP_BIDS = 10
+CHUNK_SIZE = 2000
+
+
+@dataclass
+class ArchiveReport:
+    listings: int = 0
+    bids: int = 0
+
+
+def archive_days():
+    return getattr(settings, "AUCTIONS_BID_ARCHIVE_DAYS", ARCHIVE_DAYS)
+
+
+def archivable(cutoff):
+    """Closed listings with bids in the Bid table that closed before `cutoff`."""
+    return Listing.objects.filter(
+        Q(updated_at__lte=cutoff) | Q(updated_at__isnull=True, end_date__lte=cutoff),
+        is_active=False,
+        bid_count__gt=0,
+        bid_archive__isnull=True,
+    )
+
+
+def _record(bid_id, user_id, amount, created_at):
+    return {"id": bid_id, "user": user_id, "amount": str(amount), "created_at": created_at.isoformat()}
+
+
+def build_archive(listing, rows, top=TOP_BIDS):
+    """BidArchive of `listing` from its bids' (id, user, amount, created_at), highest first."""
+    records = [_record(*row) for row in rows]
+    history = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+    return BidArchive(
+        listing_id=listing.pk,
+        bid_count=len(records),
+        winner_id=listing.high_bidder_id,
+        won_price=listing.won_price,
+        top_bids=records[:top],
+        history=gzip.compress(history.encode()),
+    )
+
+
+def archive_closed_bids(days=None, batch_size=BATCH_SIZE, top=TOP_BIDS, now=None):
+    """
+        Move the bids of listings closed more than `days` ago into
+        BidArchive rows, `batch_size` listings per transaction.
+    """
+    days = archive_days() if days is None else days
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    report = ArchiveReport()
+    last_pk = 0
+    while True:
+        ids = list(
+            archivable(cutoff).filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return report
+        last_pk = ids[-1]
+        with transaction.atomic():
+            # Read again in the transaction: another sweep may have got there first
+            listings = {
+                listing.pk: listing
+                for listing in archivable(cutoff).filter(pk__in=ids).only("id", "high_bidder", "won_price")
+            }
+            rows = (
+                Bid.objects.filter(listing_id__in=listings)
+                .order_by("listing_id", "-amount", "-id")
+                .values_list("listing_id", "id", "user_id", "amount", "created_at")
+            )
+            archives = [
+                build_archive(listings[listing_id], [row[1:] for row in group], top)
+                for listing_id, group in itertools.groupby(rows, key=lambda row: row[0])
+            ]
+            BidArchive.objects.bulk_create(archives, ignore_conflicts=True)
+            deleted, _ = Bid.objects.filter(listing_id__in=[archive.listing_id for archive in archives]).delete()
+        report.listings += len(archives)
+        report.bids += deleted
+
+
+def archived_bids(archive):
+    """Yield the bids of `archive` as dicts, highest first."""
+    for line in gzip.decompress(archive.history).decode().splitlines():
+        record = json.loads(line)
+        record["amount"] = Decimal(record["amount"])
+        record["created_at"] = parse_datetime(record["created_at"])
+        yield record
+
+
+def usernames(user_ids):
+    return dict(User.objects.filter(pk__in=set(user_ids)).values_list("pk", "username"))
+
+
+def bid_history(listing_id):
+    """
+        Every bid on a listing, highest first, as (amount, username,
+        created_at) tuples, from its archive or else the Bid table.
+    """
+    archive = BidArchive.objects.filter(pk=listing_id).only("history").first()
+    if archive is None:
+        return (
+            Bid.objects.filter(listing_id=listing_id)
+            .order_by("-amount", "-id")
+            .values_list("amount", "user__username", "created_at")
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+    bids = list(archived_bids(archive))
+    names = usernames(bid["user"] for bid in bids)
+    return ((bid["amount"], names.get(bid["user"]), bid["created_at"]) for bid in bids)
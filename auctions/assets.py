@@ -0,0 +1,249 @@
+"""
+Static asset pipeline: vendored front-end libraries, content-hashed file
+names with precompressed siblings, and a middleware that serves the
+collected files with far-future cache headers.
+
+    python manage.py vendor_assets      # fetch VENDOR into auctions/static
+    python manage.py collectstatic      # hash, write the manifest, compress
+
+vendor_assets checks each download against the integrity hash pinned
+below, and layout.html loads the committed copies through {% static %},
+so no page depends on a third-party host. The auctions.W001 check names
+any that are missing.
+
+collectstatic copies every file to STATIC_ROOT under a name that carries
+its content hash and writes a .gz (and, when the brotli package is
+installed, a .br) sibling of each text asset. Templates refer to the
+hashed names through {% static %}, so a hashed file never changes and is
+served as immutable for a year; a new deploy changes the names instead.
+Before collectstatic has run there is no manifest and the source names
+are used, so development and tests need no build step.
+"""
+import base64
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core import checks
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+VENDOR_DIR = "auctions/vendor"
+
+# (source URL, file name under VENDOR_DIR, subresource integrity hash)
+VENDOR = [
+    (
+        "https://stackpath.bootstrapcdn.com/bootstrap/4.5.2/css/bootstrap.min.css",
+        "bootstrap.min.css",
+        "sha384-JcKb8q3iqJ61gNV9KGb8thSsNjpSL0n8PARn9HuZOnIxN0hoP+VmmDGMN5t9UJ0Z",
+    ),
+    (
+        "https://stackpath.bootstrapcdn.com/bootstrap/4.5.2/js/bootstrap.min.js",
+        "bootstrap.min.js",
+        "sha384-B4gt1jrGC7Jh4AgTPSdUtOBvfO8shuf57BaghqFfPlYxofvL8/KUEfYiJOMMV+rV",
+    ),
+    (
+        "https://code.jquery.com/jquery-3.5.1.slim.min.js",
+        "jquery.slim.min.js",
+        "sha384-DfXdz2htPH0lsSSs5nCTpuj/zy4C+OGpamoFVy38MVBnE+IbbVYUew+OrCXaRkfj",
+    ),
+    (
+        "https://cdn.jsdelivr.net/npm/popper.js@1.16.1/dist/umd/popper.min.js",
+        "popper.min.js",
+        "sha384-9/reFTGAW83EW2RDu2S0VKaIzap3H66lZH3s/LpxNUnZMOA2K5TnD37jrCK/Og4Y",
+    ),
+]
+
+# The maps are not vendored, and collectstatic fails on references to
+# files it cannot find
+SOURCE_MAP_COMMENT = re.compile(rb"\s*(/\*|//)# sourceMappingURL=\S+( \*/)?\s*$")
+
+COMPRESSIBLE = {".css", ".js", ".json", ".map", ".svg", ".txt", ".xml", ".html"}
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Seconds unhashed files (referenced without {% static %}) may be cached
+MAX_AGE = 60
+
+
+def integrity(data):
+    """Subresource integrity value (sha384) of `data`."""
+    return "sha384-" + base64.b64encode(hashlib.sha384(data).digest()).decode()
+
+
+def strip_source_map(data):
+    return SOURCE_MAP_COMMENT.sub(b"\n", data)
+
+
+def check_vendored(app_configs=None, **kwargs):
+    missing = [name for _, name, _ in VENDOR if finders.find(f"{VENDOR_DIR}/{name}") is None]
+    if not missing:
+        return []
+    return [checks.Warning(
+        f"The vendored {', '.join(missing)} are missing from the static files, so pages load without them.",
+        hint="Run manage.py vendor_assets and commit the files it writes.",
+        id="auctions.W001",
+    )]
+
+
+def compressed_siblings(data):
+    """{suffix: bytes} of the encodings that make `data` smaller."""
+    siblings = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        siblings[".br"] = brotli.compress(data, quality=11)
+    return {suffix: body for suffix, body in siblings.items() if len(body) < len(data)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+        ManifestStaticFilesStorage that also writes compressed siblings of
+        the collected text files, and uses the source names until a
+        manifest exists.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(paths) | set(self.hashed_files.values())):
+            if os.path.splitext(name)[1] in COMPRESSIBLE and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        for suffix, body in compressed_siblings(data).items():
+            with open(self.path(name + suffix), "wb") as target:
+                target.write(body)
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticAsset:
+    def __init__(self, path):
+        info = os.stat(path)
+        self.path = path
+        self.size = info.st_size
+        self.mtime = int(info.st_mtime)
+        self.etag = f'"{self.size:x}-{self.mtime:x}"'
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.encoded = {}
+
+
+class StaticAssetMiddleware:
+    """
+        Serve files collected into STATIC_ROOT ahead of the URL resolver.
+        The directory is indexed once when the middleware is loaded, so a
+        request costs a dict lookup; the compressed sibling the client
+        accepts is picked, and hashed names are marked immutable.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        root = settings.STATIC_ROOT
+        if not root or not os.path.isdir(root):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = "/" + settings.STATIC_URL.lstrip("/")
+        self.immutable = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+        self.files = self.index(root)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def index(self, root):
+        files = {}
+        suffixes = {suffix: coding for coding, suffix in ENCODINGS}
+        siblings = []
+        for directory, _, names in os.walk(root):
+            for filename in names:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                base, suffix = os.path.splitext(name)
+                if suffix in suffixes:
+                    siblings.append((name, base, suffixes[suffix], path))
+                else:
+                    files[name] = StaticAsset(path)
+        for name, base, coding, path in siblings:
+            if base in files:
+                files[base].encoded[coding] = (path, os.stat(path).st_size)
+            else:
+                # A compressed file collected in its own right
+                files[name] = StaticAsset(path)
+        return files
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.serve(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        response = self.serve(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+    def serve(self, request):
+        if request.method not in ("GET", "HEAD") or not request.path.startswith(self.prefix):
+            return None
+        name = request.path[len(self.prefix):]
+        asset = self.files.get(name)
+        if asset is None:
+            return None
+        path, size, etag, coding = asset.path, asset.size, asset.etag, None
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        for candidate, _ in ENCODINGS:
+            if candidate in accepted and candidate in asset.encoded:
+                coding = candidate
+                path, size = asset.encoded[coding]
+                # Each encoding is a different representation
+                etag = f'{asset.etag[:-1]}-{coding}"'
+                break
+        response = get_conditional_response(request, etag=etag, last_modified=asset.mtime)
+        if response is None:
+            if request.method == "HEAD":
+                response = HttpResponse(content_type=asset.content_type)
+            else:
+                response = FileResponse(open(path, "rb"), content_type=asset.content_type)
+            response["Content-Length"] = size
+            if coding:
+                response["Content-Encoding"] = coding
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(asset.mtime)
+        if asset.encoded:
+            response["Vary"] = "Accept-Encoding"
+        if name in self.immutable:
+            response["Cache-Control"] = IMMUTABLE
+        else:
+            response["Cache-Control"] = f"public, max-age={getattr(settings, 'AUCTIONS_STATIC_MAX_AGE', MAX_AGE)}"
+        return response
@@ -0,0 +1,176 @@
+"""
+Async versions of the read views, served in place of the ones in
+views.py when AUCTIONS_ASYNC_VIEWS is on (commerce/asgi.py turns it on).
+
+Each view loads everything the page shows before rendering: the user,
+the page rows, the watched ids and the category facets, with the queries
+that do not depend on each other running at the same time. The template
+then only reads loaded objects and makes no query of its own.
+
+Django's async ORM hands every query of a request to one thread, one
+after the other, so the queries run here on a small pool of threads
+instead, each with its own database connection. Caches and the
+primary/replica routing behave as in the sync views: the functions run
+are the same, and the request's context goes with them.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.shortcuts import render
+
+from auctions import caching, comments, facets, feeds
+from .models import Listing
+from .pagination import get_page_size, keyset_paginate, newest_first_paginate
+from .views import watchlist_items
+
+
+# Threads, and so database connections, shared by every async view
+QUERY_WORKERS = 8
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    getattr(settings, "AUCTIONS_QUERY_WORKERS", QUERY_WORKERS),
+                    thread_name_prefix="auctions-query",
+                )
+    return _executor
+
+
+def _call(function):
+    # A worker's connection outlives requests; apply CONN_MAX_AGE and
+    # the health check as the request cycle does for the sync views
+    close_old_connections()
+    return function()
+
+
+async def gather(*functions):
+    """Call the sync `functions` at the same time; returns their results in order."""
+    return await asyncio.gather(*(
+        sync_to_async(_call, thread_sensitive=False, executor=get_executor())(function)
+        for function in functions
+    ))
+
+
+async def load_user(request):
+    """
+        The request's user, through the cached session and auth backend;
+        set as request.user so that templates do not load it again
+    """
+    user = await sync_to_async(get_user)(request)
+    request.user = user
+    return user
+
+
+def _layout(user):
+    # What the layout and the cards read through the context processors
+    return [partial(caching.watched_ids, user), facets.visible_facets]
+
+
+def _cards(queryset, request, kind):
+    page = keyset_paginate(feeds.listing_keys(queryset), request.GET.get("after"), get_page_size(request))
+    return page, caching.listing_cards_html(page, kind)
+
+
+async def index(request):
+    """
+        views.index: the page of cards is loaded next to the layout's data
+    """
+    user = await load_user(request)
+    (page, cards), watched, category_facets = await gather(
+        partial(_cards, feeds.active(), request, "index"), *_layout(user)
+    )
+    return render(request, "auctions/index.html", {
+        "cards": cards,
+        "page": page,
+        "watched_ids": watched,
+        "category_facets": category_facets,
+    })
+
+
+async def category_view(request, category_name):
+    """
+        views.category_view: the page of cards is loaded next to the
+        layout's data
+    """
+    user = await load_user(request)
+    (page, cards), watched, category_facets = await gather(
+        partial(_cards, feeds.in_category(category_name), request, "category"), *_layout(user)
+    )
+    return render(request, "auctions/category.html", {
+        "category": category_name,
+        "cards": cards,
+        "page": page,
+        "watched_ids": watched,
+        "category_facets": category_facets,
+    })
+
+
+def _listing(auction_id):
+    # The version is read before the listing, as in views.auction_detail
+    version = caching.versions([auction_id])[auction_id]
+    return version, Listing.objects.select_related("owner", "high_bidder").get(id=auction_id)
+
+
+async def auction_detail(request, auction_id):
+    """
+        views.auction_detail: the listing with its owner and winner, the
+        first page of comments and the layout's data are loaded at the
+        same time, then the detail sections are taken from the fragment
+        cache or rendered from them
+    """
+    user = await load_user(request)
+    (version, item), comment_page, watched, category_facets = await gather(
+        partial(_listing, auction_id), partial(comments.comment_page, auction_id), *_layout(user)
+    )
+    fragments, = await gather(partial(caching.detail_fragments, item, version, comment_page))
+    is_winner = (
+        not item.is_active
+        and item.high_bidder_id is not None
+        and item.high_bidder_id == user.id
+    )
+    return render(request, "auctions/auction_detail.html", {
+        "listing": item,
+        "fragments": fragments,
+        "is_owner": item.owner == user,
+        "is_active": item.is_active,
+        "is_winner": is_winner,
+        "is_watched": auction_id in watched,
+        "winner": item.high_bidder if not item.is_active else None,
+        "watched_ids": watched,
+        "category_facets": category_facets,
+    })
+
+
+def _watchlist_page(user, request):
+    return newest_first_paginate(watchlist_items(user), request.GET.get("after"), get_page_size(request))
+
+
+async def watchlist(request):
+    """
+        views.watchlist: the page of watched listings is loaded next to
+        the layout's data
+    """
+    user = await load_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    page, watched, category_facets = await gather(partial(_watchlist_page, user, request), *_layout(user))
+    return render(request, "auctions/watchlist.html", {
+        "watchlist": page,
+        "page": page,
+        "watched_ids": watched,
+        "category_facets": category_facets,
+    })
@@ -0,0 +1,77 @@
+"""
+Authentication backend that keeps logged-in users in an in-process cache.
+
+AuthenticationMiddleware loads request.user from the backend on every
+request that reads it. CachedModelBackend answers from the
+AUCTIONS_USER_CACHE cache and only reads the User row on a miss;
+saving or deleting a user (profile edits, set_password(), last_login on
+login) drops the cached copy, so the session hash check always sees the
+current password. QuerySet.update() on users bypasses that and must
+call forget_user().
+
+The password hash is never cached: a user is stored as its other field
+values and its session auth hash, and comes back with password deferred,
+so reading it (check_password()) loads it from the database and save()
+leaves it alone.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import routing
+from .models import User
+
+
+USER_CACHE = "users"
+
+# Seconds a user is kept; bounds how long a missed invalidation is seen
+USER_TIMEOUT = 300
+
+
+def get_cache():
+    return caches[getattr(settings, "AUCTIONS_USER_CACHE", USER_CACHE)]
+
+
+def _user_key(user_id):
+    return f"user:{user_id}:object"
+
+
+def _cached_fields():
+    return [field.attname for field in User._meta.concrete_fields if field.attname != "password"]
+
+
+def forget_user(user_id):
+    """Delete the cached user now and again once the current transaction commits."""
+    key = _user_key(user_id)
+    get_cache().delete(key)
+    transaction.on_commit(lambda: get_cache().delete(key))
+
+
+class CachedModelBackend(ModelBackend):
+
+    def get_user(self, user_id):
+        cache = get_cache()
+        key = _user_key(user_id)
+        fields = _cached_fields()
+        cached = cache.get(key)
+        if cached is not None:
+            session_hash, values = cached
+            user = User.from_db(DEFAULT_DB_ALIAS, fields, values)
+            user.cached_session_auth_hash = session_hash
+            return user
+        # Not from a replica: a password change must not be missed
+        with routing.primary_reads():
+            user = super().get_user(user_id)
+        if user is not None:
+            values = [getattr(user, name) for name in fields]
+            cache.set(key, (user.get_session_auth_hash(), values), USER_TIMEOUT)
+        return user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
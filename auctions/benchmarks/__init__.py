@@ -0,0 +1,58 @@
+"""
+Helpers shared by the bench_* management commands.
+
+Benchmarks never touch the configured database: they run against a
+throwaway copy created the same way the test runner does it.
+"""
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+
+
+@contextmanager
+def scratch_database(alias=DEFAULT_DB_ALIAS):
+    """
+        Create a fresh, migrated test database for `alias` and drop it
+        on exit. SQLite databases are put in a temporary file so that
+        several threads can open their own connection to it. DEBUG is
+        off, as in production and under the test runner, so queries are
+        not logged in memory; the test client's host is allowed, and
+        rate limits are off so that simulated users are not throttled.
+    """
+    connection = connections[alias]
+    tmpdir = None
+    if connection.vendor == "sqlite":
+        tmpdir = tempfile.mkdtemp(prefix="auctions-bench-")
+        connection.settings_dict.setdefault("TEST", {})
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(tmpdir, "bench.sqlite3")
+    # create_test_db() returns the test database's name, not this one
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with override_settings(
+            DEBUG=False,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            AUCTIONS_RATE_LIMITS={},
+        ):
+            yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+@contextmanager
+def stopwatch():
+    """Yield a dict whose "seconds" key is filled in on exit."""
+    timing = {}
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing["seconds"] = time.perf_counter() - start
@@ -0,0 +1,270 @@
+"""
+In-process load generator for every URL in auctions/urls.py.
+
+Each scenario drives one URL with `concurrency` threads, each with its
+own test Client (and so its own session and database connection). Per
+request the runner records the wall-clock latency and the number of SQL
+statements the request executed.
+"""
+import itertools
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.db import connection
+from django.test import Client
+from django.urls import get_resolver, reverse
+
+from auctions import caching
+from auctions.benchmarks.seed import ADJECTIVES, CATEGORIES, NOUNS
+from auctions.models import Listing, User
+
+
+PASSWORD = "password"
+
+
+@dataclass
+class ClientState:
+    """What one simulated user knows about the dataset."""
+    user: User
+    active_ids: list
+    own_active_ids: list
+    rng: random.Random
+    counter: itertools.count = field(default_factory=itertools.count)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    method: str
+    build: object
+    login: bool = True
+    # Log in again before every request (for views that log the client out)
+    relogin: bool = False
+    # Log in as a staff user (for staff-only views)
+    staff: bool = False
+
+
+def _listing(state):
+    return state.rng.choice(state.active_ids)
+
+
+def _bid(state):
+    listing_id = _listing(state)
+    current = Listing.objects.filter(pk=listing_id).values_list("current_bid", flat=True).first()
+    return reverse("place_bid", args=[listing_id]), {"bid_amount": str(current + state.rng.randrange(1, 100))}
+
+
+def _max_bid(state):
+    listing_id = _listing(state)
+    current = Listing.objects.filter(pk=listing_id).values_list("current_bid", flat=True).first()
+    return reverse("place_max_bid", args=[listing_id]), {"max_amount": str(current + state.rng.randrange(1, 500))}
+
+
+def _own_listing(state):
+    # Each close uses up one of the client's own active listings
+    listing_id = state.own_active_ids.pop() if state.own_active_ids else _listing(state)
+    return reverse("close_auction", args=[listing_id]), {}
+
+
+def _new_user(state):
+    n = next(state.counter)
+    name = f"new-{state.user.pk}-{n}"
+    return reverse("register"), {
+        "username": name, "email": f"{name}@example.com",
+        "password": PASSWORD, "confirmation": PASSWORD,
+    }
+
+
+def _new_auction(state):
+    return reverse("create_auction"), {
+        "title": f"{state.rng.choice(ADJECTIVES).title()} {state.rng.choice(NOUNS)}",
+        "description": "Load test listing",
+        "starting_bid": "10.00",
+        "end_date": "2099-01-01T00:00+00:00",
+        "category": state.rng.choice(CATEGORIES),
+        "image_auction": "",
+    }
+
+
+SCENARIOS = [
+    Scenario("index", "get", lambda s: (reverse("index"), {}), login=False),
+    Scenario("category_view", "get", lambda s: (reverse("category_view", args=[s.rng.choice(CATEGORIES)]), {}), login=False),
+    Scenario("search", "get", lambda s: (reverse("search"), {"q": f"{s.rng.choice(ADJECTIVES)} {s.rng.choice(NOUNS)}"}), login=False),
+    Scenario("auction_detail", "get", lambda s: (reverse("auction_detail", args=[_listing(s)]), {})),
+    Scenario("listing_comments", "get", lambda s: (reverse("listing_comments", args=[_listing(s)]), {}), login=False),
+    Scenario("listing_events", "get", lambda s: (reverse("listing_events", args=[_listing(s)]), {}), login=False),
+    Scenario("watchlist", "get", lambda s: (reverse("watchlist"), {})),
+    Scenario("add_to_watchlist", "get", lambda s: (reverse("add_to_watchlist", args=[_listing(s)]), {})),
+    Scenario("remove_from_watchlist", "get", lambda s: (reverse("remove_from_watchlist", args=[_listing(s)]), {})),
+    Scenario("place_bid", "post", _bid),
+    Scenario("place_max_bid", "post", _max_bid),
+    Scenario("add_comment", "post", lambda s: (reverse("add_comment", args=[_listing(s)]), {"comment_content": "Still available?"})),
+    Scenario("close_auction", "post", _own_listing),
+    Scenario("create_auction", "post", _new_auction),
+    Scenario("login", "post", lambda s: (reverse("login"), {"username": s.user.username, "password": PASSWORD}), login=False),
+    Scenario("logout", "get", lambda s: (reverse("logout"), {}), relogin=True),
+    Scenario("register", "post", _new_user, login=False),
+    Scenario("cache_stats", "get", lambda s: (reverse("cache_stats"), {}), staff=True),
+    Scenario("api_listings", "get", lambda s: (reverse("api_listings"), {}), login=False),
+    Scenario("api_listing", "get", lambda s: (reverse("api_listing", args=[_listing(s)]), {}), login=False),
+    Scenario("api_listing_bids", "get", lambda s: (reverse("api_listing_bids", args=[_listing(s)]), {}), login=False),
+]
+
+
+def staff_user():
+    user, _ = User.objects.get_or_create(
+        username="loadtest-staff", defaults={"email": "loadtest-staff@example.com", "is_staff": True}
+    )
+    return user
+
+
+def url_names():
+    """Names of every URL pattern of the auctions app."""
+    from auctions import urls
+    return {pattern.name for pattern in urls.urlpatterns if pattern.name}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class LoadRunner:
+
+    def __init__(self, concurrency=8, requests=50, seed=0):
+        self.concurrency = concurrency
+        self.requests = requests
+        self.seed = seed
+        get_resolver()  # build the URL resolver before timing anything
+
+    def client_states(self):
+        users = list(User.objects.filter(username__startswith="user").order_by("pk")[:self.concurrency])
+        active_ids = list(Listing.objects.filter(is_active=True).values_list("id", flat=True)[:5000])
+        states = []
+        for index, user in enumerate(users):
+            own = list(Listing.objects.filter(owner=user, is_active=True).values_list("id", flat=True))
+            states.append(ClientState(user, active_ids, own, random.Random(self.seed + index)))
+        return states
+
+    def run(self, scenarios=None):
+        results = {}
+        for scenario in scenarios or SCENARIOS:
+            results[scenario.name] = self.run_scenario(scenario)
+        return results
+
+    def run_scenario(self, scenario):
+        states = self.client_states()
+        staff = staff_user() if scenario.staff else None
+        caching.reset_stats()
+        samples = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(states) + 1)
+
+        def worker(state):
+            client = Client(raise_request_exception=False)
+            counted = [0]
+
+            def count(execute, sql, params, many, context):
+                counted[0] += 1
+                return execute(sql, params, many, context)
+
+            local = []
+            try:
+                if scenario.staff:
+                    client.force_login(staff)
+                elif scenario.login:
+                    client.force_login(state.user)
+                barrier.wait()
+                with connection.execute_wrapper(count):
+                    for _ in range(self.requests):
+                        if scenario.relogin:
+                            client.force_login(state.user)
+                        path, data = scenario.build(state)
+                        counted[0] = 0
+                        start = time.perf_counter()
+                        response = getattr(client, scenario.method)(path, data)
+                        if response.streaming:
+                            # Streamed bodies run their queries as they are read
+                            b"".join(response.streaming_content)
+                        elapsed = time.perf_counter() - start
+                        local.append((elapsed, counted[0], response.status_code >= 400))
+            finally:
+                with lock:
+                    samples.extend(local)
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(state,)) for state in states]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        return dict(summarize(samples, wall), fragment_cache=caching.stats())
+
+
+def summarize(samples, wall):
+    latencies = sorted(sample[0] for sample in samples)
+    queries = [sample[1] for sample in samples]
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for sample in samples if sample[2]),
+        "seconds": round(wall, 4),
+        "throughput_rps": round(len(samples) / wall, 1) if wall else None,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(latencies[-1] if latencies else None),
+        },
+        "queries": {
+            "mean": round(sum(queries) / len(queries), 2) if queries else None,
+            "max": max(queries) if queries else None,
+        },
+    }
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+        Compare `results` with a stored `baseline` report. A view regresses
+        when its p95 latency or throughput is worse by more than `threshold`
+        (a fraction), or when it runs more queries per request.
+    """
+    comparison = {}
+    for name, current in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        p95_ratio = _ratio(current["latency_ms"]["p95"], before["latency_ms"]["p95"])
+        rps_ratio = _ratio(current["throughput_rps"], before["throughput_rps"])
+        query_delta = (current["queries"]["mean"] or 0) - (before["queries"]["mean"] or 0)
+        regressions = []
+        if p95_ratio is not None and p95_ratio > 1 + threshold:
+            regressions.append("p95")
+        if rps_ratio is not None and rps_ratio < 1 - threshold:
+            regressions.append("throughput")
+        if query_delta > 0:
+            regressions.append("queries")
+        comparison[name] = {
+            "p95_ratio": p95_ratio,
+            "throughput_ratio": rps_ratio,
+            "queries_delta": round(query_delta, 2),
+            "regressions": regressions,
+        }
+    return comparison
+
+
+def _ratio(current, before):
+    if not current or not before:
+        return None
+    return round(current / before, 3)
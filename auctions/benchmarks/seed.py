@@ -0,0 +1,194 @@
+"""
+Bulk data generators for the benchmarks.
+
+Rows are written with bulk_create in batches, so seeding a million
+listings takes seconds rather than the hours Listing.save() would need.
+"""
+import itertools
+import random
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from auctions import facets
+from auctions.bidding import refresh_bid_stats
+from auctions.common import CATEGORY_CHOICES
+from auctions.models import Bid, Comment, Listing, User, Watchlist
+
+
+BATCH_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class Scale:
+    users: int
+    listings: int
+    bids: int
+    comments: int
+    watchlists: int
+
+
+SCALES = {
+    "tiny": Scale(users=50, listings=500, bids=2000, comments=1000, watchlists=500),
+    "small": Scale(users=500, listings=10000, bids=50000, comments=20000, watchlists=10000),
+    "medium": Scale(users=5000, listings=100000, bids=1000000, comments=200000, watchlists=100000),
+    "large": Scale(users=50000, listings=1000000, bids=10000000, comments=2000000, watchlists=1000000),
+}
+
+# Exponent of the Zipf-like popularity of listings: a few hot auctions
+# collect most of the bids, comments and watchers
+SKEW = 1.1
+CATEGORIES = [category[0] for category in CATEGORY_CHOICES]
+DESCRIPTION = (
+    "Gently used and carefully stored. Comes with the original box, manual "
+    "and every accessory that shipped with it. Pick up or shipping available. "
+) * 8
+ADJECTIVES = [
+    "vintage", "refurbished", "signed", "rare", "wireless", "leather", "carbon",
+    "handmade", "limited", "classic", "portable", "electric", "wooden", "retro",
+]
+NOUNS = [
+    "camera", "guitar", "bicycle", "watch", "jacket", "lamp", "drone", "sofa",
+    "sneakers", "console", "headphones", "helmet", "skateboard", "turntable",
+    "keyboard", "tent", "telescope", "racket", "saddle", "printer",
+]
+
+
+def random_title(rng):
+    return f"{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS)} {rng.randrange(1000)}"
+
+
+def random_description(rng):
+    return f"{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS)}. {DESCRIPTION}"
+
+
+def seed_users(count, prefix="user"):
+    password = make_password("password")
+    User.objects.bulk_create(
+        (
+            User(username=f"{prefix}{i}", email=f"{prefix}{i}@example.com", password=password)
+            for i in range(count)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    return list(User.objects.filter(username__startswith=prefix).values_list("id", flat=True))
+
+
+def seed_listings(count, owner_ids, active_ratio=0.8, rng=None):
+    """
+        Create `count` listings spread over the last year, owned by
+        random users from `owner_ids`. Returns nothing; query for ids.
+    """
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    batch = []
+    for _ in range(count):
+        created_at = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        price = Decimal(rng.randrange(100, 100000)) / 100
+        batch.append(Listing(
+            title=random_title(rng),
+            description=random_description(rng),
+            starting_bid=price,
+            current_bid=price,
+            image_url="https://placehold.co/600x400",
+            category=rng.choice(CATEGORIES),
+            created_at=created_at,
+            end_date=created_at + timedelta(days=7),
+            owner_id=rng.choice(owner_ids),
+            is_active=rng.random() < active_ratio,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            Listing.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Listing.objects.bulk_create(batch)
+
+
+def popularity(ids, rng, skew=SKEW):
+    """
+        Return a function that picks from `ids` with Zipf-like skew.
+        The hot listings are a random sample, not the oldest ones.
+    """
+    ranked = list(ids)
+    rng.shuffle(ranked)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(len(ranked))))
+    return lambda: rng.choices(ranked, cum_weights=cum_weights)[0]
+
+
+def seed_bids(count, listing_ids, user_ids, rng=None):
+    """
+        Create `count` strictly increasing bids per listing, skewed
+        towards popular listings, then refresh the listings' bid stats.
+    """
+    rng = rng or random.Random(0)
+    pick = popularity(listing_ids, rng)
+    prices = dict(Listing.objects.values_list("id", "starting_bid").iterator())
+    when = timezone.now() - timedelta(days=7)
+    step = timedelta(days=7) / max(count, 1)
+    batch = []
+    for n in range(count):
+        listing_id = pick()
+        prices[listing_id] += Decimal(rng.randrange(1, 500)) / 100
+        batch.append(Bid(
+            listing_id=listing_id,
+            user_id=rng.choice(user_ids),
+            amount=prices[listing_id],
+            created_at=when + step * n,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            Bid.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Bid.objects.bulk_create(batch)
+    refresh_bid_stats(Listing.objects.filter(bids__isnull=False).distinct())
+
+
+def seed_comments(count, listing_ids, user_ids, rng=None):
+    rng = rng or random.Random(0)
+    pick = popularity(listing_ids, rng)
+    batch = []
+    for n in range(count):
+        batch.append(Comment(
+            listing_id=pick(),
+            user_id=rng.choice(user_ids),
+            content=f"Is the {rng.choice(NOUNS)} still available? Comment {n}.",
+        ))
+        if len(batch) >= BATCH_SIZE:
+            Comment.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Comment.objects.bulk_create(batch)
+
+
+def seed_watchlists(count, listing_ids, user_ids, rng=None):
+    rng = rng or random.Random(0)
+    pick = popularity(listing_ids, rng)
+    count = min(count, len(listing_ids) * len(user_ids))
+    pairs = set()
+    while len(pairs) < count:
+        pairs.add((rng.choice(user_ids), pick()))
+    Watchlist.objects.bulk_create(
+        (Watchlist(user_id=user_id, listing_id=listing_id) for user_id, listing_id in pairs),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def seed_dataset(scale, seed=0):
+    """
+        Seed a complete dataset at `scale` (a Scale or a SCALES key) and
+        return the row counts.
+    """
+    if isinstance(scale, str):
+        scale = SCALES[scale]
+    rng = random.Random(seed)
+    user_ids = seed_users(scale.users)
+    seed_listings(scale.listings, user_ids, rng=rng)
+    listing_ids = list(Listing.objects.values_list("id", flat=True))
+    seed_bids(scale.bids, listing_ids, user_ids, rng=rng)
+    seed_comments(scale.comments, listing_ids, user_ids, rng=rng)
+    seed_watchlists(scale.watchlists, listing_ids, user_ids, rng=rng)
+    facets.rebuild()
+    return asdict(scale)
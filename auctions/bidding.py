@@ -0,0 +1,338 @@
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import routing, signals
+from .models import Bid, Listing, MaxBid, User
+
+
+ACCEPTED = "accepted"
+OUTBID = "outbid"
+CLOSED = "closed"
+INVALID = "invalid"
+PROXY_OUTBID = "proxy_outbid"
+NOT_RAISED = "not_raised"
+
+MESSAGES = {
+    ACCEPTED: "Bid placed successfully!",
+    OUTBID: "Bid must be higher than the current bid.",
+    CLOSED: "This auction is closed.",
+    INVALID: "Invalid bid amount. Please enter a valid number.",
+    PROXY_OUTBID: "You have been outbid by another bidder's maximum bid.",
+    NOT_RAISED: "Your maximum bid must be higher than your current maximum bid.",
+}
+
+# Standard bid increments: (price below, increment). The proxy engine
+# raises the price by the increment of the bid it has to beat.
+INCREMENTS = [
+    (Decimal("1.00"), Decimal("0.05")),
+    (Decimal("5.00"), Decimal("0.25")),
+    (Decimal("25.00"), Decimal("0.50")),
+    (Decimal("100.00"), Decimal("1.00")),
+    (Decimal("250.00"), Decimal("2.50")),
+    (Decimal("500.00"), Decimal("5.00")),
+    (Decimal("1000.00"), Decimal("10.00")),
+    (Decimal("2500.00"), Decimal("25.00")),
+    (Decimal("5000.00"), Decimal("50.00")),
+    (None, Decimal("100.00")),
+]
+
+
+@dataclass(frozen=True)
+class BidResult:
+    status: str
+    amount: Decimal = None
+    bid: Bid = None
+
+    @property
+    def accepted(self):
+        return self.status == ACCEPTED
+
+    @property
+    def message(self):
+        return MESSAGES[self.status]
+
+
+def parse_amount(value):
+    """
+        Parse a submitted bid amount into a two-place Decimal,
+        or return None if it is not a valid positive amount
+    """
+    try:
+        amount = Decimal(str(value).strip()).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        return None
+    if not amount.is_finite() or amount <= 0:
+        return None
+    return amount
+
+
+def bid_increment(price):
+    """The least amount a bid of `price` must be beaten by."""
+    for below, increment in INCREMENTS:
+        if below is None or price < below:
+            return increment
+
+
+def is_open(listing, now):
+    """True if `listing` takes bids at `now`: active, and not past its end_date."""
+    return listing.is_active and (listing.end_date is None or listing.end_date > now)
+
+
+# The columns a bid is decided on
+BID_STATE = ("is_active", "end_date", "current_bid", "high_bidder", "bid_count", "top_max_bid")
+
+
+def _bid_state(listing_id, lock=False):
+    listings = Listing.objects.select_for_update() if lock else Listing.objects
+    with routing.primary_reads():
+        rows = list(listings.filter(pk=listing_id).values_list(*BID_STATE, named=True))
+    if not rows:
+        raise Listing.DoesNotExist(f"Listing {listing_id} does not exist.")
+    return rows[0]
+
+
+def _refusal(listing, amount, now):
+    if not is_open(listing, now):
+        return BidResult(CLOSED, amount)
+    if amount <= listing.current_bid:
+        return BidResult(OUTBID, amount)
+    return None
+
+
+def _take_lead(listing_id, listing, user, amount, now):
+    # Only applies to the listing exactly as read: no bid, close or new
+    # maximum can have come in between
+    return Listing.objects.filter(pk=listing_id, **listing._asdict()).update(
+        current_bid=amount,
+        high_bidder=user,
+        bid_count=listing.bid_count + 1,
+        last_bid_at=now,
+        updated_at=now,
+    )
+
+
+def place_bid(listing_id, user, amount):
+    """
+        Place a bid of `amount` by `user` on the listing `listing_id`.
+
+        The bid is decided on the listing as read from the primary,
+        outside any transaction, so a refused bid usually takes no lock.
+        The listing is then written by a conditional UPDATE that only
+        applies while its BID_STATE columns are as read. When another
+        write got in between, the UPDATE still took the write lock on
+        SQLite (select_for_update() takes the row lock elsewhere), and
+        the bid is decided again on the listing read under it. So two
+        concurrent bidders can never both win the same price, no accepted
+        bid is lost, and the leader the bid displaces is known without
+        another query. The Bid row is written in the same transaction,
+        and only the bid columns of the listing (current_bid,
+        high_bidder, bid_count, last_bid_at, updated_at) are rewritten.
+        A listing past its end_date is closed for bids even before the
+        expiry sweep has closed it.
+        Maximum bids of other users answer the bid in the same
+        transaction; a bid above every maximum (top_max_bid) skips them.
+    """
+    amount = parse_amount(amount)
+    if amount is None:
+        return BidResult(INVALID)
+
+    now = timezone.now()
+    listing = _bid_state(listing_id)
+    refused = _refusal(listing, amount, now)
+    if refused:
+        return refused
+    with transaction.atomic():
+        if not _take_lead(listing_id, listing, user, amount, now):
+            listing = _bid_state(listing_id, lock=True)
+            refused = _refusal(listing, amount, now)
+            if refused:
+                return refused
+            _take_lead(listing_id, listing, user, amount, now)
+        bid = Bid.objects.create(listing_id=listing_id, user=user, amount=amount)
+        answers = []
+        if listing.top_max_bid is not None and listing.top_max_bid >= amount:
+            answers = resolve_max_bids(listing_id, amount, user.pk, now)
+        announce(listing_id, [bid, *answers], listing.high_bidder)
+    if answers:
+        return BidResult(PROXY_OUTBID, answers[-1].amount, bid)
+    return BidResult(ACCEPTED, amount, bid)
+
+
+def place_max_bid(listing_id, user, maximum):
+    """
+        Register `maximum` as the most `user` will pay for the listing
+        `listing_id`, or raise their earlier maximum to it, and let the
+        proxy engine bid for them.
+
+        The maximum is written first, which takes the write lock on
+        SQLite (select_for_update() locks the listing elsewhere), so the
+        listing read after it cannot change until the commit. A maximum
+        must be higher than the current bid, like any bid. BidResult.bid
+        is the bid placed for `user`, if any, and amount the price after
+        the maxima were resolved.
+    """
+    maximum = parse_amount(maximum)
+    if maximum is None:
+        return BidResult(INVALID)
+
+    now = timezone.now()
+    with transaction.atomic():
+        raised = MaxBid.objects.filter(listing_id=listing_id, user=user, amount__lt=maximum).update(
+            amount=maximum,
+            placed_at=now,
+        )
+        if not raised:
+            try:
+                with transaction.atomic():
+                    MaxBid.objects.create(listing_id=listing_id, user=user, amount=maximum, placed_at=now)
+            except IntegrityError:
+                if MaxBid.objects.filter(listing_id=listing_id, user=user).exists():
+                    return BidResult(NOT_RAISED, maximum)
+                raise Listing.DoesNotExist(f"Listing {listing_id} does not exist.")
+
+        listing = (
+            Listing.objects.select_for_update()
+            .only("is_active", "end_date", "current_bid", "high_bidder", "top_max_bid")
+            .get(pk=listing_id)
+        )
+        if not is_open(listing, now) or maximum <= listing.current_bid:
+            transaction.set_rollback(True)
+            return BidResult(OUTBID if is_open(listing, now) else CLOSED, maximum)
+        if listing.top_max_bid is None or maximum > listing.top_max_bid:
+            Listing.objects.filter(pk=listing_id).update(top_max_bid=maximum)
+
+        bids = resolve_max_bids(listing_id, listing.current_bid, listing.high_bidder_id, now)
+        if bids:
+            announce(listing_id, bids, listing.high_bidder_id)
+        mine = next((bid for bid in bids if bid.user_id == user.pk), None)
+        if (bids and bids[-1].user_id == user.pk) or (not bids and listing.high_bidder_id == user.pk):
+            return BidResult(ACCEPTED, bids[-1].amount if bids else listing.current_bid, mine)
+        return BidResult(PROXY_OUTBID, bids[-1].amount if bids else listing.current_bid, mine)
+
+
+def resolve_max_bids(listing_id, price, high_bidder_id, now):
+    """
+        Settle the maximum bids of a listing whose current bid is `price`
+        by `high_bidder_id` (None without bids), inside the caller's
+        transaction, and return the bids written.
+
+        Only the two highest maxima matter: the highest (the earliest of
+        equal ones) wins, at one increment above the best rival bid,
+        capped at its own maximum. Instead of a row per step of the
+        bidding war, the runner-up's bid at its maximum and the winning
+        bid are written, and the listing is updated once. The caller
+        announces them with the rest of its transaction's bids.
+    """
+    # Users are only loaded once there are bids to write, which most
+    # calls, on listings without maxima, never get to
+    top = list(
+        MaxBid.objects.filter(listing_id=listing_id)
+        .order_by("-amount", "placed_at", "pk")
+        .only("user", "amount")[:2]
+    )
+    if not top:
+        return []
+    leader = top[0]
+    runner_up = top[1] if len(top) > 1 and top[1].amount > price else None
+
+    # The bids the leader has to beat: the runner-up's maximum and the
+    # current bid, or the starting bid, unless the leader holds it
+    rivals = [runner_up.amount] if runner_up is not None else []
+    if high_bidder_id != leader.user_id:
+        rivals.append(price)
+    if not rivals:
+        return []
+    rival = max(rivals)
+    if leader.amount < rival:
+        # A plain bid went past every maximum
+        return []
+    if leader.amount == rival:
+        # A tie goes to the maximum placed first, which is the leader
+        new_price = rival
+    else:
+        new_price = min(leader.amount, rival + bid_increment(rival))
+
+    bidders = [runner_up] if runner_up is not None and runner_up.amount < new_price else []
+    users = User.objects.in_bulk([maximum.user_id for maximum in (*bidders, leader)])
+    bids = [Bid(listing_id=listing_id, user=users[maximum.user_id], amount=maximum.amount) for maximum in bidders]
+    bids.append(Bid(listing_id=listing_id, user=users[leader.user_id], amount=new_price))
+    Bid.objects.bulk_create(bids)
+    Listing.objects.filter(pk=listing_id).update(
+        current_bid=new_price,
+        high_bidder=leader.user_id,
+        bid_count=F("bid_count") + len(bids),
+        last_bid_at=now,
+        updated_at=now,
+    )
+    return bids
+
+
+def announce(listing_id, bids, previous_bidder_id):
+    """
+        Send bid_placed once for the `bids` one transaction wrote on the
+        listing `listing_id`, in order; `previous_bidder_id` led it before.
+    """
+    signals.bid_placed.send(
+        sender=Listing, listing_id=listing_id, bid=bids[-1], bids=bids, previous_bidder_id=previous_bidder_id
+    )
+
+
+def won_price():
+    """Expression for the price a listing closes at: its top bid, or 0 without bids."""
+    return Case(
+        When(bid_count__gt=0, then=F("current_bid")),
+        default=Value(Decimal("0.00")),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def close_listing(listing_id, owner):
+    """
+        Close the listing `listing_id` if it is still active and owned by
+        `owner`. Returns True if this call closed it.
+    """
+    with transaction.atomic():
+        closed = Listing.objects.filter(pk=listing_id, owner=owner, is_active=True).update(
+            is_active=False,
+            won_price=won_price(),
+            updated_at=timezone.now(),
+        )
+        if closed:
+            signals.listings_closed.send(sender=Listing, listing_ids=[listing_id])
+    return bool(closed)
+
+
+def refresh_bid_stats(listings=None, batch_size=1000):
+    """
+        Recompute current_bid, high_bidder, bid_count and last_bid_at of
+        `listings` (default: all) from the Bid table, and top_max_bid from
+        the MaxBid table, one UPDATE per batch of listing ids. Returns the
+        number of listings refreshed.
+        Listings whose bids were archived (auctions.archive) keep theirs.
+    """
+    queryset = Listing.objects.all() if listings is None else listings
+    queryset = queryset.filter(bid_archive__isnull=True)
+    bids = Bid.objects.filter(listing=OuterRef("pk")).order_by()
+    top_bid = bids.order_by("-amount", "created_at")
+    top_max_bid = MaxBid.objects.filter(listing=OuterRef("pk")).order_by("-amount")
+    stats = {
+        "current_bid": Coalesce(Subquery(top_bid.values("amount")[:1]), F("starting_bid")),
+        "high_bidder": Subquery(top_bid.values("user")[:1]),
+        "bid_count": Coalesce(Subquery(bids.values("listing").annotate(n=Count("id")).values("n")), 0),
+        "last_bid_at": Subquery(bids.values("listing").annotate(last=Max("created_at")).values("last")),
+        "top_max_bid": Subquery(top_max_bid.values("amount")[:1]),
+        "updated_at": timezone.now(),
+    }
+    refreshed, last_pk = 0, 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return refreshed
+        with transaction.atomic():
+            refreshed += Listing.objects.filter(pk__in=ids).update(**stats)
+        last_pk = ids[-1]
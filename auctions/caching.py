@@ -0,0 +1,229 @@
+"""
+Version-keyed fragment cache for listing cards and auction detail pages.
+
+Every listing has a version token in the cache. Rendered fragments are
+stored under keys that include it, so a bid, comment or close only has
+to replace the token for every fragment
+of that listing to be missed from then on; the stale entries age out
+through the backend's LRU eviction and timeout.
+
+Versions are always read before the listing itself: a fragment rendered
+from data older than its version cannot be stored under a newer version.
+For the same reason missing fragments are rendered from the primary
+database, never from a replica that may trail the version.
+
+The same cache keeps each user's set of watched listing ids, so any page
+can mark watched listings without a query.
+
+The backend is the CACHES alias named by AUCTIONS_FRAGMENT_CACHE.
+"""
+import threading
+import uuid
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import routing, signals
+from .feeds import listing_cards
+from .models import Listing, Watchlist
+
+
+FRAGMENT_CACHE = "fragments"
+
+# Seconds a user's watched ids are kept; bounds how long a lost race
+# between a read and an invalidation can be seen
+WATCHED_TIMEOUT = 300
+
+CARD_TEMPLATES = {
+    "index": "auctions/cards/index.html",
+    "category": "auctions/cards/category.html",
+}
+DETAIL_TEMPLATES = {
+    "summary": "auctions/fragments/listing_summary.html",
+    "comments": "auctions/fragments/comments.html",
+}
+
+Card = namedtuple("Card", ["id", "html"])
+
+_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, "AUCTIONS_FRAGMENT_CACHE", FRAGMENT_CACHE)]
+
+
+def _version_key(pk):
+    return f"listing:{pk}:v"
+
+
+def _fragment_key(kind, pk, version):
+    return f"listing:{pk}:{kind}:{version}"
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def versions(ids):
+    """
+        Return {listing id: version token}. A listing without a token (new,
+        or evicted) gets a fresh one, which no stored fragment can match.
+    """
+    cache = get_cache()
+    keys = {_version_key(pk): pk for pk in ids}
+    found = cache.get_many(keys)
+    result = {keys[key]: version for key, version in found.items()}
+    for key, pk in keys.items():
+        if key not in found:
+            version = _new_version()
+            # add() so that a concurrent bump is not overwritten
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+            result[pk] = version
+    return result
+
+
+def bump(ids):
+    """Give each listing in `ids` a new version."""
+    get_cache().set_many({_version_key(pk): _new_version() for pk in ids}, timeout=None)
+
+
+def invalidate(ids):
+    """
+        Bump the versions of `ids` now and again once the current
+        transaction commits, which drops anything rendered from the
+        uncommitted state in between.
+    """
+    bump(ids)
+    transaction.on_commit(lambda: bump(ids))
+
+
+def _watched_key(user_id):
+    return f"user:{user_id}:watched"
+
+
+def watched_ids(user):
+    """Frozen set of the ids of the listings `user` watches."""
+    if not user.is_authenticated:
+        return frozenset()
+    cache = get_cache()
+    key = _watched_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        with routing.primary_reads():
+            ids = frozenset(Watchlist.objects.filter(user_id=user.pk).values_list("listing_id", flat=True))
+        cache.set(key, ids, WATCHED_TIMEOUT)
+    return ids
+
+
+def forget(key):
+    """Delete `key` now and again once the current transaction commits."""
+    get_cache().delete(key)
+    transaction.on_commit(lambda: get_cache().delete(key))
+
+
+def forget_watched(user_id):
+    """Drop the cached watched ids of a user whose watchlist changed."""
+    forget(_watched_key(user_id))
+
+
+def _count(kind, hits, misses):
+    with _counts_lock:
+        _counts[(kind, "hits")] += hits
+        _counts[(kind, "misses")] += misses
+
+
+def stats():
+    """Hit and miss counters of this process, per fragment kind."""
+    with _counts_lock:
+        counts = dict(_counts)
+    result = {}
+    for kind in sorted({kind for kind, _ in counts}):
+        hits, misses = counts.get((kind, "hits"), 0), counts.get((kind, "misses"), 0)
+        result[kind] = {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 3)}
+    return result
+
+
+def reset_stats():
+    with _counts_lock:
+        _counts.clear()
+
+
+def listing_cards_html(rows, kind):
+    """
+        Rendered Cards, in order, for the listings in `rows` (objects with
+        at least an id). Cached cards are fetched in one round trip; the
+        missing ones are loaded with one query, rendered and stored.
+    """
+    ids = [row.pk for row in rows]
+    if not ids:
+        return []
+    cache = get_cache()
+    listing_versions = versions(ids)
+    keys = {pk: _fragment_key(kind, pk, listing_versions[pk]) for pk in ids}
+    found = cache.get_many(keys.values())
+    missing = [pk for pk in ids if keys[pk] not in found]
+    _count(kind, len(ids) - len(missing), len(missing))
+    if missing:
+        rendered = {}
+        with routing.primary_reads():
+            for listing in listing_cards(Listing.objects.filter(pk__in=missing)):
+                rendered[keys[listing.pk]] = render_to_string(CARD_TEMPLATES[kind], {"listing": listing})
+        cache.set_many(rendered)
+        found.update(rendered)
+    # A listing deleted since the page query has no card
+    return [Card(pk, mark_safe(found[keys[pk]])) for pk in ids if keys[pk] in found]
+
+
+def detail_fragments(listing, version, comments):
+    """
+        Rendered summary and comments sections of the detail page of
+        `listing`, whose `version` was read before the listing was loaded.
+        `comments` is the first page of comments, wrapped so it is only
+        loaded on a miss.
+    """
+    cache = get_cache()
+    keys = {kind: _fragment_key(kind, listing.pk, version) for kind in DETAIL_TEMPLATES}
+    found = cache.get_many(keys.values())
+    missing = {kind: key for kind, key in keys.items() if key not in found}
+    for kind in keys:
+        _count(kind, int(kind not in missing), int(kind in missing))
+    if missing:
+        with routing.primary_reads():
+            if listing._state.db != DEFAULT_DB_ALIAS:
+                listing = Listing.objects.select_related("owner", "high_bidder").get(pk=listing.pk)
+            context = {"listing": listing, "comments": comments}
+            rendered = {key: render_to_string(DETAIL_TEMPLATES[kind], context) for kind, key in missing.items()}
+        cache.set_many(rendered)
+        found.update(rendered)
+    return {kind: mark_safe(found[key]) for kind, key in keys.items()}
+
+
+@receiver(signals.bid_placed)
+def _bump_bid(sender, listing_id, **kwargs):
+    # Bid columns are only read from the primary for fragments, and the
+    # bid is not visible there before the commit: one bump after it does
+    transaction.on_commit(lambda: bump([listing_id]))
+
+
+@receiver(signals.comment_added)
+def _bump_listing(sender, listing_id, **kwargs):
+    invalidate([listing_id])
+
+
+@receiver(signals.listings_closed)
+def _bump_closed(sender, listing_ids, **kwargs):
+    invalidate(list(listing_ids))
+
+
+@receiver(post_save, sender=Listing)
+def _bump_saved(sender, instance, **kwargs):
+    # Edits through the admin, and ids reused after rows were deleted
+    invalidate([instance.pk])
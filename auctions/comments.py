@@ -0,0 +1,33 @@
+"""
+Comments of a listing, newest first, one keyset page at a time.
+
+The detail page renders the first page; the rest are fetched from the
+listing_comments JSON endpoint as the reader scrolls. Each page is one
+query on the comment_listing_created_idx index with the author joined.
+"""
+from django.conf import settings
+
+from .models import Comment
+from .pagination import DEFAULT_PAGE_SIZE, keyset_paginate
+
+
+def listing_comments(listing_id):
+    return (
+        Comment.objects.filter(listing_id=listing_id)
+        .select_related("user")
+        .only("id", "content", "created_at", "user__username")
+    )
+
+
+def comment_page(listing_id, cursor=None, page_size=None):
+    page_size = page_size or getattr(settings, "AUCTIONS_PAGE_SIZE", DEFAULT_PAGE_SIZE)
+    return keyset_paginate(listing_comments(listing_id), cursor, page_size, descending=True)
+
+
+def serialize(comment):
+    return {
+        "id": comment.id,
+        "user": comment.user.username,
+        "content": comment.content,
+        "created_at": comment.created_at.isoformat(),
+    }
@@ -5,4 +5,24 @@ CATEGORY_CHOICES = [
     ('Toys', 'Toys'),
     ('Sports', 'Sports'),
     ('Automotive', 'Automotive'),
-]
\ No newline at end of file
+]
+
+DEFAULT_IMAGE_URL = "https://placehold.co/600x400"
+
+# Display width (CSS pixels) of listing images per view; uploads are
+# resized to each width and twice it for high density screens
+THUMBNAIL_SIZES = {
+    "watchlist": 250,
+    "card": 300,
+    "detail": 540,
+}
+THUMBNAIL_WIDTHS = sorted({width * scale for width in THUMBNAIL_SIZES.values() for scale in (1, 2)})
+
+
+def thumbnail_name(image_name, width):
+    """Storage name of the `width` pixels wide copy of an uploaded image."""
+    stem = image_name.rsplit(".", 1)[0]
+    return f"thumbs/{stem}-{width}w.webp"
+
+# Length of an auction when no end date is given
+AUCTION_DAYS = 7
@@ -0,0 +1,19 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import caching, facets
+
+
+def watched(request):
+    """
+        `watched_ids`: ids of the listings the user watches, looked up
+        only when a template uses them
+    """
+    return {"watched_ids": SimpleLazyObject(lambda: caching.watched_ids(request.user))}
+
+
+def category_facets(request):
+    """
+        `category_facets`: categories with active listings, with their
+        counts and price ranges, read from the precomputed facet table
+    """
+    return {"category_facets": SimpleLazyObject(facets.visible_facets)}
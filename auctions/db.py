@@ -0,0 +1,96 @@
+"""
+Database profiles, chosen with the AUCTIONS_DB_PROFILE environment
+variable (see DATABASES in commerce/settings.py):
+
+    sqlite-wal  SQLite in WAL mode with the pragmas below and persistent
+                connections. Readers no longer wait for the bid writer,
+                and commits skip the fsync until the next checkpoint.
+    sqlite      SQLite with its default rollback journal, reconnecting on
+                every request: the setup the project started with.
+    postgres    PostgreSQL, with persistent, health-checked connections,
+                one per thread. Django does not pool them; PgBouncer
+                does, and AUCTIONS_PGBOUNCER=1 makes the connections
+                safe for its transaction pooling mode.
+
+The SQLite pragmas are per connection, so they are set each time one is
+opened; journal_mode is stored in the database file and is set either way.
+"""
+import importlib.util
+
+from django.conf import settings
+from django.core import checks
+from django.db.backends.signals import connection_created
+
+
+PROFILE = "sqlite-wal"
+
+SQLITE_PRAGMAS = {
+    "sqlite": {
+        "journal_mode": "DELETE",
+    },
+    "sqlite-wal": {
+        "journal_mode": "WAL",
+        # In WAL mode a power loss can lose the last commits but not
+        # corrupt the database
+        "synchronous": "NORMAL",
+        # Milliseconds a writer waits for the lock before "database is locked"
+        "busy_timeout": 5000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        # Negative: KiB of page cache per connection
+        "cache_size": -32000,
+    },
+}
+
+
+def profile():
+    return getattr(settings, "AUCTIONS_DB_PROFILE", PROFILE)
+
+
+def sqlite_pragmas(name=None):
+    return SQLITE_PRAGMAS.get(name or profile(), {})
+
+
+def configure(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    for pragma, value in sqlite_pragmas().items():
+        # Straight on the driver connection: nothing to log or profile
+        connection.connection.execute(f"PRAGMA {pragma} = {value}")
+
+
+def pgbouncer_errors(databases):
+    """
+        What keeps the PostgreSQL aliases of `databases` from working
+        behind PgBouncer in transaction pooling mode: state that outlives
+        a transaction, which the next one may not find on its connection.
+    """
+    psycopg3 = importlib.util.find_spec("psycopg") is not None
+    errors = []
+    for alias, database in databases.items():
+        if database["ENGINE"] != "django.db.backends.postgresql":
+            continue
+        if not database.get("DISABLE_SERVER_SIDE_CURSORS"):
+            errors.append(checks.Error(
+                f"DATABASES[{alias!r}] uses server-side cursors, which do not survive PgBouncer's transaction pooling.",
+                hint="Set DISABLE_SERVER_SIDE_CURSORS to True.",
+                id="auctions.E001",
+            ))
+        if psycopg3 and database.get("OPTIONS", {}).get("prepare_threshold", 5) is not None:
+            errors.append(checks.Error(
+                f"DATABASES[{alias!r}] lets psycopg prepare statements, which do not survive PgBouncer's transaction pooling.",
+                hint="Set OPTIONS['prepare_threshold'] to None.",
+                id="auctions.E002",
+            ))
+    return errors
+
+
+def check_pgbouncer(app_configs=None, **kwargs):
+    if not getattr(settings, "AUCTIONS_PGBOUNCER", False):
+        return []
+    return pgbouncer_errors(settings.DATABASES)
+
+
+def install():
+    connection_created.connect(configure, dispatch_uid="auctions.db")
+    checks.register(check_pgbouncer)
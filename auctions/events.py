@@ -0,0 +1,165 @@
+"""
+Live listing events (bids, comments, closes) for server-sent event streams.
+
+Events are fanned out through a broker chosen by AUCTIONS_EVENT_BROKER.
+The default InMemoryBroker delivers within one server process; another
+broker (a Redis pub/sub stand-in, say) only has to provide the same
+subscribe() / publish() pair.
+
+Subscribers never touch the database: they wait on an in-memory buffer
+that publishers fill after the writing transaction commits.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from . import signals
+
+
+DEFAULT_BROKER = "auctions.events.InMemoryBroker"
+
+# Undelivered events kept per subscriber; older ones are dropped first
+BUFFER_SIZE = 16
+
+# Seconds between keep-alive comments, and before a stream is ended so
+# the browser reconnects
+HEARTBEAT = 15
+STREAM_TIMEOUT = 300
+
+
+class Subscription:
+    """
+        One subscriber's view of a channel. Holds at most `buffer_size`
+        undelivered events and wakes the waiting coroutine on its own loop.
+    """
+
+    __slots__ = ("broker", "channel", "loop", "buffer", "ready")
+
+    def __init__(self, broker, channel, buffer_size):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.buffer = deque(maxlen=buffer_size)
+        self.ready = asyncio.Event()
+
+    def push(self, message):
+        # Called from any thread
+        try:
+            self.loop.call_soon_threadsafe(self._push, message)
+        except RuntimeError:
+            # The subscriber's event loop is gone; nobody is listening
+            self.close()
+
+    def _push(self, message):
+        self.buffer.append(message)
+        self.ready.set()
+
+    async def get(self, timeout=None):
+        """
+            Wait for the next event and return it, or None after
+            `timeout` seconds without one
+        """
+        if not self.buffer:
+            self.ready.clear()
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self.buffer.popleft()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker:
+
+    def __init__(self, buffer_size=BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._channels = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.buffer_size)
+        with self._lock:
+            self._channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.push(message)
+        return len(subscribers)
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._channels.get(channel, ()))
+            return sum(len(subscribers) for subscribers in self._channels.values())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, "AUCTIONS_EVENT_BROKER", DEFAULT_BROKER)
+                _broker = import_string(path)()
+    return _broker
+
+
+def channel_name(listing_id):
+    return f"listing:{listing_id}"
+
+
+def format_event(event, data):
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def publish(listing_id, event, data):
+    """Publish `event` to the listing's subscribers once the current transaction commits."""
+    message = format_event(event, dict(data, listing=listing_id))
+    transaction.on_commit(lambda: get_broker().publish(channel_name(listing_id), message))
+
+
+@receiver(signals.bid_placed)
+def publish_bid(sender, listing_id, bids, **kwargs):
+    for bid in bids:
+        publish(listing_id, "bid", {
+            "amount": str(bid.amount),
+            "bidder": bid.user.username,
+        })
+
+
+@receiver(signals.comment_added)
+def publish_comment(sender, listing_id, comment, **kwargs):
+    publish(listing_id, "comment", {
+        "user": comment.user.username,
+        "content": comment.content,
+        "created_at": comment.created_at.isoformat(),
+    })
+
+
+@receiver(signals.listings_closed)
+def publish_close(sender, listing_ids, **kwargs):
+    for listing_id in listing_ids:
+        publish(listing_id, "close", {})
@@ -0,0 +1,56 @@
+"""
+Closing of auctions whose end_date has passed.
+
+Expired listings are closed in batches with set-based UPDATEs: the
+won price of every listing in a batch comes from its denormalized bid
+columns, so no listing or bid is ever loaded into Python. Each sweep
+also brings the category price ranges up to date with the bids since
+the last one.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import facets, signals
+from .bidding import won_price
+from .models import Listing
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def expired_listings(now=None):
+    return Listing.objects.filter(is_active=True, end_date__lte=now or timezone.now())
+
+
+def close_expired_listings(now=None, batch_size=BATCH_SIZE):
+    """
+        Close every active listing whose end_date is at or before `now`
+        and return how many were closed. Safe to run repeatedly or from
+        several processes: a listing is only ever closed once.
+    """
+    now = now or timezone.now()
+    closed = 0
+    while True:
+        ids = list(
+            expired_listings(now).order_by("end_date").values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        # One short write transaction per batch keeps bidders from waiting on the sweep
+        with transaction.atomic():
+            batch = Listing.objects.filter(id__in=ids, is_active=True)
+            # Writing first takes the write lock, so the ids read next are
+            # exactly the rows this sweep closes, not ones closed concurrently
+            batch.update(won_price=won_price())
+            ids = list(batch.values_list("id", flat=True))
+            closed += Listing.objects.filter(id__in=ids).update(is_active=False, updated_at=timezone.now())
+            signals.listings_closed.send(sender=Listing, listing_ids=ids)
+    if closed:
+        logger.info("Closed %d expired auctions", closed)
+    # Bids do not move the category price ranges; every sweep catches up
+    facets.refresh_prices()
+    return closed
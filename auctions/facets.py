@@ -0,0 +1,149 @@
+"""
+Category facets: the number of active listings and their current price
+range per category, for the navigation and the category sidebar.
+
+Counts are updated in the transaction that changes them: when a listing
+is created, deleted or edited through save(), or listings are closed by
+their owner or the expiry sweep. They move by the number of listings
+added or removed, and the price range is re-read with two seeks on the
+listing_cat_active_price_idx index at the same time.
+
+Bids leave the facets alone, so a bid transaction never writes a facet
+row. A bid can only raise a price, which moves the maximum of its
+category or the minimum when the listing was the cheapest; the expiry
+sweep re-reads every category's range with refresh_prices() and writes
+the ones that moved, so the range trails bids by at most one sweep
+interval. Bulk loads bypass all of that and call rebuild() (or the
+rebuild_category_facets command) afterwards.
+
+The navigation reads the facets from the fragments cache; any change
+drops the cached copy.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Subquery
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import caching, routing, signals
+from .common import CATEGORY_CHOICES
+from .models import CategoryFacet, Listing
+
+
+CACHE_KEY = "category-facets"
+
+
+def _price_bound(lowest):
+    listings = Listing.objects.filter(category=OuterRef("category"), is_active=True)
+    order = "current_bid" if lowest else "-current_bid"
+    return Subquery(listings.order_by(order).values("current_bid")[:1])
+
+
+def _price_range():
+    return {"min_price": _price_bound(True), "max_price": _price_bound(False)}
+
+
+def rebuild():
+    """Recompute every facet from the Listing table; returns the number of rows."""
+    facets = {category: CategoryFacet(category=category) for category, _ in CATEGORY_CHOICES}
+    rows = (
+        Listing.objects.filter(is_active=True)
+        .values_list("category")
+        .annotate(count=Count("id"), low=Min("current_bid"), high=Max("current_bid"))
+        .order_by()
+    )
+    for category, count, low, high in rows:
+        facets[category] = CategoryFacet(category=category, active_count=count, min_price=low, max_price=high)
+    with transaction.atomic():
+        CategoryFacet.objects.all().delete()
+        CategoryFacet.objects.bulk_create(facets.values())
+    caching.forget(CACHE_KEY)
+    return len(facets)
+
+
+def recount(category):
+    """Recompute one category's facet exactly, creating it if needed."""
+    count = Listing.objects.filter(category=category, is_active=True).count()
+    CategoryFacet.objects.update_or_create(category=category, defaults={"active_count": count})
+    CategoryFacet.objects.filter(category=category).update(**_price_range())
+    caching.forget(CACHE_KEY)
+
+
+def adjust(category, delta):
+    """Add `delta` (negative when listings closed) to a category's count."""
+    updated = CategoryFacet.objects.filter(category=category).update(
+        active_count=F("active_count") + delta, **_price_range()
+    )
+    if updated:
+        caching.forget(CACHE_KEY)
+    else:
+        recount(category)
+
+
+def refresh_prices():
+    """
+        Re-read the price range of every category and write the facets
+        whose range moved since; returns how many were written.
+    """
+    with routing.primary_reads():
+        moved = [
+            pk
+            for pk, min_price, max_price, low, high in CategoryFacet.objects.annotate(
+                low=_price_bound(True), high=_price_bound(False)
+            ).values_list("pk", "min_price", "max_price", "low", "high")
+            if (min_price, max_price) != (low, high)
+        ]
+    if moved:
+        CategoryFacet.objects.filter(pk__in=moved).update(**_price_range())
+        caching.forget(CACHE_KEY)
+    return len(moved)
+
+
+def visible_facets():
+    """Categories that have active listings, for navigation."""
+    cache = caching.get_cache()
+    facets = cache.get(CACHE_KEY)
+    if facets is None:
+        # Uncategorized listings have no category page
+        with routing.primary_reads():
+            facets = list(CategoryFacet.objects.filter(active_count__gt=0).exclude(category=""))
+        cache.set(CACHE_KEY, facets)
+    return facets
+
+
+@receiver(post_save, sender=Listing)
+def _listing_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    stored = getattr(instance, "_loaded_values", {})
+    if created:
+        if instance.is_active:
+            adjust(instance.category, 1)
+    elif "category" not in stored or "is_active" not in stored:
+        # An edit of a listing not loaded from the database: its old
+        # category is unknown, and only rebuild() corrects that one
+        recount(instance.category)
+    elif (stored["category"], stored["is_active"]) != (instance.category, instance.is_active):
+        # An edit, e.g. through the admin, that moved or closed the listing
+        if stored["is_active"]:
+            adjust(stored["category"], -1)
+        if instance.is_active:
+            adjust(instance.category, 1)
+    instance._loaded_values = {**stored, "category": instance.category, "is_active": instance.is_active}
+
+
+@receiver(post_delete, sender=Listing)
+def _listing_deleted(sender, instance, **kwargs):
+    # The instance may be stale (closed since it was loaded), so count again
+    recount(instance.category)
+
+
+@receiver(signals.listings_closed)
+def _listings_closed(sender, listing_ids, **kwargs):
+    closed = (
+        Listing.objects.filter(pk__in=listing_ids)
+        .values_list("category")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    for category, count in closed:
+        adjust(category, -count)
@@ -0,0 +1,54 @@
+"""
+Querysets behind the listing feeds (index and category pages).
+
+Only the columns the listing cards display are selected; the description
+is cut down to a short preview in SQL instead of loading the full text.
+"""
+from django.db.models.functions import Substr
+
+from .models import Listing
+
+
+PREVIEW_CHARS = 200
+
+CARD_FIELDS = (
+    "id",
+    "title",
+    "image_url",
+    "image",
+    "thumbnails",
+    "current_bid",
+    "starting_bid",
+    "bid_count",
+    "end_date",
+    "category",
+    "created_at",
+)
+
+
+def listing_cards(queryset):
+    # One extra character so templates can tell a truncated preview apart
+    return queryset.only(*CARD_FIELDS).annotate(
+        description_preview=Substr("description", 1, PREVIEW_CHARS + 1)
+    )
+
+
+def listing_keys(queryset):
+    # Enough to paginate on; the cards come from the fragment cache
+    return queryset.only("id", "created_at")
+
+
+def active():
+    return Listing.objects.filter(is_active=True)
+
+
+def in_category(category_name):
+    return Listing.objects.filter(category=category_name, is_active=True)
+
+
+def active_listings():
+    return listing_cards(active())
+
+
+def category_listings(category_name):
+    return listing_cards(in_category(category_name))
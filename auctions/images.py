@@ -0,0 +1,125 @@
+"""
+Uploaded listing images and their thumbnails.
+
+An upload is checked and stored under MEDIA_ROOT with the listing. Once
+the listing is committed, a WebP copy is made at every width in
+THUMBNAIL_WIDTHS (the display width of each view and twice it) that is
+not wider than the upload, and the widths are recorded on the listing.
+Templates offer the copies through srcset and let the browser pick the
+smallest one that fills the image at the screen's density.
+
+With AUCTIONS_THUMBNAIL_WORKERS set, the copies are made by a thread pool
+of that size after the response has been sent; otherwise in the request.
+Until they exist, pages show the upload itself.
+
+Needs Pillow; without it uploads are refused.
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import caching
+from .common import THUMBNAIL_WIDTHS, thumbnail_name
+from .models import Listing
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"JPEG", "PNG", "GIF", "WEBP"}
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+QUALITY = 80
+
+_pool = None
+_lock = threading.Lock()
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def validate(upload):
+    """Raise InvalidImage unless `upload` is an image we can resize."""
+    if Image is None:
+        raise InvalidImage("Image uploads are not available on this server.")
+    if upload.size > getattr(settings, "AUCTIONS_MAX_UPLOAD_BYTES", MAX_UPLOAD_BYTES):
+        raise InvalidImage("The image is too large.")
+    try:
+        with Image.open(upload) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        raise InvalidImage("The file is not an image.")
+    finally:
+        upload.seek(0)
+    if image_format not in FORMATS:
+        raise InvalidImage("Upload a JPEG, PNG, GIF or WebP image.")
+
+
+def make_thumbnails(listing_id):
+    """
+        Write the thumbnails of a listing's upload and record their widths.
+        Returns the widths, or None if the listing has no upload.
+    """
+    listing = Listing.objects.filter(pk=listing_id).only("id", "image").first()
+    if listing is None or not listing.image:
+        return None
+    name = listing.image.name
+    with default_storage.open(name) as source, Image.open(source) as image:
+        # JPEGs are decoded straight at a fraction of their size when possible
+        image.draft("RGB", (THUMBNAIL_WIDTHS[-1], image.height * THUMBNAIL_WIDTHS[-1] // image.width))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or "A" in image.getbands() else "RGB")
+        # Never enlarged; an upload narrower than every width keeps its own
+        widths = [width for width in THUMBNAIL_WIDTHS if width <= image.width] or [image.width]
+        # Largest first, each resized from the previous one
+        for width in reversed(widths):
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, "WEBP", quality=QUALITY, method=4)
+            target = thumbnail_name(name, width)
+            default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+    # Unless the image was replaced meanwhile
+    Listing.objects.filter(pk=listing_id, image=name).update(thumbnails=widths, updated_at=timezone.now())
+    caching.invalidate([listing_id])
+    return widths
+
+
+def _run(listing_id, in_worker=False):
+    try:
+        make_thumbnails(listing_id)
+    except Exception:
+        logger.exception("Thumbnails for listing %s failed", listing_id)
+    finally:
+        if in_worker:
+            connection.close()
+
+
+def _get_pool(workers):
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auction-thumbnails")
+    return _pool
+
+
+def schedule(listing_id):
+    """Make the thumbnails of a listing once the current transaction commits."""
+    workers = getattr(settings, "AUCTIONS_THUMBNAIL_WORKERS", 0)
+    if workers:
+        transaction.on_commit(lambda: _get_pool(workers).submit(_run, listing_id, in_worker=True))
+    else:
+        transaction.on_commit(lambda: _run(listing_id))
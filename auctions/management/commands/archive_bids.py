@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from auctions.archive import BATCH_SIZE, TOP_BIDS, archive_closed_bids, archive_days
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the bids of auctions closed longer than --days ago into compressed "
+        "per-listing archives. Runs in short batches; safe to interrupt and run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Default: AUCTIONS_BID_ARCHIVE_DAYS.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Listings per transaction.")
+        parser.add_argument("--top", type=int, default=TOP_BIDS, help="Highest bids kept in each summary.")
+
+    def handle(self, *args, **options):
+        days = archive_days() if options["days"] is None else options["days"]
+        report = archive_closed_bids(days, batch_size=options["batch_size"], top=options["top"])
+        self.stdout.write(f"Archived {report.bids} bid(s) of {report.listings} listing(s) closed over {days} day(s) ago.")
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import random
+import time
+from types import ModuleType
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import include, path, reverse
+
+from auctions import async_views, caching, urls, views
+from auctions.benchmarks import scratch_database
+from auctions.benchmarks.runner import _ratio, summarize
+from auctions.benchmarks.seed import CATEGORIES, SCALES, seed_dataset
+from auctions.models import Listing, User
+
+
+MODES = {"sync": views, "async": async_views}
+
+
+async def asgi_get(application, url, cookie):
+    """GET `url` through the ASGI `application`, as a server would; returns the status."""
+    url_path, _, query = url.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": url_path,
+        "raw_path": url_path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client stays connected until the response is sent
+        await asyncio.Event().wait()
+
+    status = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the index, category, listing and watchlist pages through Django's ASGI "
+        "handler with the sync views and with the async views; compare their latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--requests", type=int, default=50, help="Requests per client and view.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        report = {"scale": options["scale"], "concurrency": options["concurrency"], "results": {}}
+        with scratch_database() as connection:
+            seed_dataset(options["scale"], seed=options["seed"])
+            cookies = self.log_in(options["concurrency"])
+            listing_ids = list(Listing.objects.values_list("id", flat=True)[:5000])
+            rng = random.Random(options["seed"])
+            targets = {
+                "index": lambda: reverse("index"),
+                "category_view": lambda: reverse("category_view", args=[rng.choice(CATEGORIES)]),
+                "auction_detail": lambda: reverse("auction_detail", args=[rng.choice(listing_ids)]),
+                "watchlist": lambda: reverse("watchlist"),
+            }
+            # Profiling would add the same cost to both sides
+            with override_settings(AUCTIONS_PROFILING_SAMPLE_RATE=0):
+                for mode, read_views in MODES.items():
+                    urlconf = ModuleType(f"{mode}_urls")
+                    urlconf.urlpatterns = [path("", include(urls.build(read_views)))]
+                    with override_settings(ROOT_URLCONF=urlconf):
+                        report["results"][mode] = {
+                            name: asyncio.run(self.run(target, cookies, options["requests"]))
+                            for name, target in targets.items()
+                        }
+            report["database"] = connection.vendor
+        report["p50_async_over_sync"] = {
+            name: _ratio(report["results"]["async"][name]["latency_ms"]["p50"], sync["latency_ms"]["p50"])
+            for name, sync in report["results"]["sync"].items()
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def log_in(self, count):
+        cookies = []
+        for user in User.objects.filter(username__startswith="user").order_by("pk")[:count]:
+            client = Client()
+            client.force_login(user)
+            cookies.append(f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}")
+        return cookies
+
+    async def run(self, target, cookies, requests):
+        application = ASGIHandler()
+        caching.get_cache().clear()
+        samples = []
+
+        async def client(cookie):
+            for _ in range(requests):
+                start = time.perf_counter()
+                status = await asgi_get(application, target(), cookie)
+                samples.append((time.perf_counter() - start, 0, status >= 400))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(cookie) for cookie in cookies))
+        result = summarize(samples, time.perf_counter() - start)
+        del result["queries"]
+        return result
+
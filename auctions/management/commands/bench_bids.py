@@ -0,0 +1,120 @@
+import json
+import threading
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from auctions import bidding
+from auctions.benchmarks import scratch_database, stopwatch
+from auctions.models import Bid, Listing, User
+
+
+def legacy_place_bid(listing_id, user, amount):
+    """The read / compare / save sequence place_bid used before the bidding service."""
+    item = Listing.objects.get(id=listing_id)
+    amount = float(amount)
+    if amount <= item.current_bid:
+        return False
+    item.current_bid = amount
+    item.save()
+    Bid(listing=item, user=user, amount=amount).save()
+    return True
+
+
+def service_place_bid(listing_id, user, amount):
+    return bidding.place_bid(listing_id, user, amount).accepted
+
+
+STRATEGIES = {
+    "legacy": legacy_place_bid,
+    "service": service_place_bid,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a bid storm against one listing and report the valid accepted bids per second, "
+        "next to the bids processed per second and the accepts that were lost updates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--bids", type=int, default=200, help="Bids submitted per thread.")
+        parser.add_argument("--strategy", choices=sorted(STRATEGIES), action="append")
+
+    def handle(self, *args, **options):
+        report = {}
+        with scratch_database():
+            for name in options["strategy"] or sorted(STRATEGIES):
+                report[name] = self.storm(STRATEGIES[name], options["threads"], options["bids"])
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def storm(self, place, threads, bids):
+        owner = User.objects.create_user(f"owner-{place.__name__}", f"{place.__name__}@example.com", "x")
+        users = [
+            User.objects.create_user(f"{place.__name__}-{i}", f"{place.__name__}-{i}@example.com", "x")
+            for i in range(threads)
+        ]
+        listing = Listing(title="Hot item", starting_bid=Decimal("1.00"), owner=owner)
+        listing.save()
+
+        accepted = []
+        errors = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def worker(index, user):
+            barrier.wait()
+            try:
+                for n in range(bids):
+                    amount = Decimal(2 + n * threads + index)
+                    try:
+                        ok = place(listing.id, user, amount)
+                    except OperationalError as exc:
+                        with lock:
+                            errors.append(str(exc))
+                        continue
+                    if ok:
+                        with lock:
+                            accepted.append(amount)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(i, u)) for i, u in enumerate(users)]
+        with stopwatch() as timing:
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+
+        listing.refresh_from_db()
+        amounts = list(Bid.objects.filter(listing=listing).order_by("id").values_list("amount", flat=True))
+        # A stale bid was accepted although a higher one had already been
+        # committed; the listing lost that higher price for a while
+        stale, highest = 0, None
+        for amount in amounts:
+            if highest is not None and amount <= highest:
+                stale += 1
+            else:
+                highest = amount
+        processed = threads * bids - len(errors)
+        valid = len(accepted) - stale
+        return {
+            "threads": threads,
+            "submitted": threads * bids,
+            # Bids answered with an accept or a refusal
+            "processed": processed,
+            "processed_per_second": round(processed / timing["seconds"], 1),
+            "accepted": len(accepted),
+            "recorded": len(amounts),
+            # Accepts that were lost updates: 0 is the only correct value
+            "stale_accepted": stale,
+            "valid_accepted": valid,
+            "valid_accepted_per_second": round(valid / timing["seconds"], 1),
+            "final_price_lost": listing.current_bid != highest,
+            "errors": len(errors),
+            "final_current_bid": str(listing.current_bid),
+            "top_recorded_bid": str(highest),
+            "seconds": round(timing["seconds"], 4),
+        }
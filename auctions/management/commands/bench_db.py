@@ -0,0 +1,126 @@
+import json
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection
+from django.test.utils import override_settings
+
+from auctions import bidding, db, feeds
+from auctions.benchmarks import scratch_database
+from auctions.benchmarks.seed import seed_listings, seed_users
+from auctions.models import Listing, User
+
+# CONN_MAX_AGE of each SQLite profile, as in commerce/settings.py
+SQLITE_PROFILES = {"sqlite": 0, "sqlite-wal": 600}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent feed/detail readers and bidders for a fixed time under each database "
+        "profile and report operations per second. SQLite profiles are compared side by side; "
+        "with AUCTIONS_DB_PROFILE=postgres only that profile runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=6)
+        parser.add_argument("--bidders", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--listings", type=int, default=2000)
+        parser.add_argument("--profile", choices=sorted(SQLITE_PROFILES), action="append")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            profiles = {name: SQLITE_PROFILES[name] for name in options["profile"] or SQLITE_PROFILES}
+        else:
+            profiles = {settings.AUCTIONS_DB_PROFILE: connection.settings_dict["CONN_MAX_AGE"]}
+        report = {}
+        for name, conn_max_age in profiles.items():
+            with override_settings(AUCTIONS_DB_PROFILE=name), scratch_database() as scratch:
+                scratch.settings_dict["CONN_MAX_AGE"] = conn_max_age
+                # Reopen so the profile's pragmas apply
+                scratch.close()
+                report[name] = self.run_profile(options)
+                report[name]["journal_mode"] = self.journal_mode()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def journal_mode(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode" if connection.vendor == "sqlite" else "SELECT 'n/a'")
+            return cursor.fetchone()[0]
+
+    def run_profile(self, options):
+        owners = seed_users(50)
+        seed_listings(options["listings"], owners)
+        bidders = list(User.objects.filter(pk__in=owners).order_by("pk")[:options["bidders"]])
+        # Readers and bidders crowd the same listings
+        hot = list(feeds.active().order_by("id").values_list("id", flat=True)[:20])
+        connection.close()
+
+        counts = {"reads": 0, "bids": 0, "accepted": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options["seconds"]
+        barrier = threading.Barrier(options["readers"] + options["bidders"])
+
+        def record(**deltas):
+            with lock:
+                for key, delta in deltas.items():
+                    counts[key] += delta
+
+        def read(rng):
+            listing_id = rng.choice(hot)
+            list(feeds.listing_cards(feeds.active()).order_by("created_at", "id")[:20])
+            Listing.objects.select_related("owner", "high_bidder").get(pk=listing_id)
+
+        def reader(index):
+            rng = random.Random(index)
+            barrier.wait()
+            try:
+                while time.perf_counter() < deadline:
+                    try:
+                        read(rng)
+                        record(reads=1)
+                    except OperationalError:
+                        record(errors=1)
+                    # End of a request: closed unless CONN_MAX_AGE keeps it
+                    close_old_connections()
+            finally:
+                connection.close()
+
+        def bidder(user, index):
+            rng = random.Random(1000 + index)
+            barrier.wait()
+            try:
+                while time.perf_counter() < deadline:
+                    listing_id = rng.choice(hot)
+                    amount = Decimal(rng.randint(1, 10 ** 6))
+                    try:
+                        accepted = bidding.place_bid(listing_id, user, amount).accepted
+                        record(bids=1, accepted=int(accepted))
+                    except OperationalError:
+                        record(errors=1)
+                    close_old_connections()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(options["readers"])]
+        threads += [threading.Thread(target=bidder, args=(user, i)) for i, user in enumerate(bidders)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+        return {
+            "readers": options["readers"],
+            "bidders": len(bidders),
+            "seconds": round(seconds, 2),
+            "reads_per_second": round(counts["reads"] / seconds, 1),
+            "bids_per_second": round(counts["bids"] / seconds, 1),
+            "accepted_bids": counts["accepted"],
+            "errors": counts["errors"],
+            "pragmas": db.sqlite_pragmas() if connection.vendor == "sqlite" else {},
+        }
@@ -0,0 +1,66 @@
+import json
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from auctions import feeds, views
+from auctions.benchmarks import scratch_database, stopwatch
+from auctions.benchmarks.seed import seed_listings, seed_users
+from auctions.common import CATEGORY_CHOICES
+from auctions.models import Listing
+from auctions.pagination import encode_cursor
+
+
+def legacy_index():
+    """What index rendered before pagination: every listing, every column."""
+    return render_to_string("auctions/benchmarks/legacy_index.html", {
+        "listings": Listing.objects.filter().order_by("created_at"),
+        "categories": [category[0] for category in CATEGORY_CHOICES],
+    })
+
+
+class Command(BaseCommand):
+    help = "Compare render time and peak memory of the unpaginated and keyset-paginated listing feeds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=100000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--skip-legacy", action="store_true", help="Skip the full-table render on huge datasets.")
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        with scratch_database():
+            seed_listings(options["listings"], seed_users(options["users"]))
+
+            middle = feeds.active_listings().order_by("created_at", "id")[options["listings"] // 3]
+            deep_cursor = encode_cursor(middle.created_at, middle.pk)
+            category = CATEGORY_CHOICES[0][0]
+
+            cases = {
+                "index_first_page": lambda: views.index(factory.get("/")),
+                "index_deep_page": lambda: views.index(factory.get("/", {"after": deep_cursor})),
+                "category_first_page": lambda: views.category_view(factory.get("/"), category),
+                "category_deep_page": lambda: views.category_view(factory.get("/", {"after": deep_cursor}), category),
+            }
+            if not options["skip_legacy"]:
+                cases["legacy_index_all_rows"] = legacy_index
+
+            report = {"listings": options["listings"], "results": {}}
+            for name, case in cases.items():
+                report["results"][name] = self.measure(case, options["repeat"])
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, case, repeat):
+        best = None
+        for _ in range(repeat):
+            tracemalloc.start()
+            with stopwatch() as timing:
+                case()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if best is None or timing["seconds"] < best["seconds"]:
+                best = {"seconds": round(timing["seconds"], 4), "peak_kib": peak // 1024}
+        return best
@@ -0,0 +1,58 @@
+import json
+import os
+import random
+import resource
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from auctions.benchmarks import scratch_database, stopwatch
+from auctions.benchmarks.seed import seed_listings, seed_users
+from auctions.models import Bid, Listing
+
+
+class Command(BaseCommand):
+    help = "Time import_auctions and export_auctions on a generated bid file of the given size."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bids", type=int, default=1000000)
+        parser.add_argument("--listings", type=int, default=10000)
+        parser.add_argument("--users", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        with scratch_database(), tempfile.TemporaryDirectory() as tmpdir:
+            seed_listings(options["listings"], seed_users(options["users"]))
+            listing_ids = list(Listing.objects.values_list("id", flat=True))
+            source = os.path.join(tmpdir, "bids.jsonl")
+            with open(source, "w") as stream:
+                for n in range(options["bids"]):
+                    stream.write(json.dumps({
+                        "listing": rng.choice(listing_ids),
+                        "user": f"user{rng.randrange(options['users'])}",
+                        "amount": f"{10 + n / 100:.2f}",
+                        "created_at": "2025-06-16T12:00:00+00:00",
+                    }))
+                    stream.write("\n")
+
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            with stopwatch() as import_timing:
+                call_command("import_auctions", "bids", source, stdout=open(os.devnull, "w"))
+            rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+            target = os.path.join(tmpdir, "export.jsonl")
+            with stopwatch() as export_timing:
+                call_command("export_auctions", "bids", output=target, stderr=open(os.devnull, "w"))
+
+            report = {
+                "bids": options["bids"],
+                "imported": Bid.objects.count(),
+                "import_seconds": round(import_timing["seconds"], 2),
+                "import_bids_per_second": round(options["bids"] / import_timing["seconds"]),
+                # Peak RSS growth during the import; stays flat as --bids grows
+                "import_max_rss_growth_mib": round((rss_after - rss_before) / 1024, 1),
+                "export_seconds": round(export_timing["seconds"], 2),
+                "file_mib": round(os.path.getsize(source) / 2**20, 1),
+            }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,98 @@
+import json
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from auctions import bidding, caching
+from auctions.benchmarks import scratch_database, stopwatch
+from auctions.models import Bid, Listing, User
+
+WRITES = ("INSERT", "UPDATE", "DELETE")
+
+
+class Command(BaseCommand):
+    help = (
+        "Settle the same bidding wars twice: bidders outbidding each other by one increment "
+        "through the place_bid view until one runs out of budget, and each bidder posting "
+        "their budget once as a maximum bid. Reports requests, Bid rows and SQL writes per "
+        "resolved auction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--auctions", type=int, default=50)
+        parser.add_argument("--bidders", type=int, default=2)
+        parser.add_argument("--max-budget", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        # Whole-dollar budgets so both ways end at the same price more often
+        wars = [
+            [Decimal(rng.randint(20, options["max_budget"])) for _ in range(options["bidders"])]
+            for _ in range(options["auctions"])
+        ]
+        report = {"auctions": len(wars), "bidders": options["bidders"], "results": {}}
+        with scratch_database():
+            owner = User.objects.create_user("owner", "owner@example.com", "x")
+            users = [User.objects.create_user(f"bidder{n}", f"bidder{n}@example.com", "x") for n in range(options["bidders"])]
+            clients = []
+            for user in users:
+                client = Client()
+                client.force_login(user)
+                clients.append(client)
+            for name, run in (("manual", self.manual), ("proxy", self.proxy)):
+                caching.get_cache().clear()
+                listings = []
+                for n in range(len(wars)):
+                    listing = Listing(title=f"Item {n}", starting_bid=Decimal("10.00"), owner=owner)
+                    listing.save()
+                    listings.append(listing.pk)
+                report["results"][name] = self.measure(run, clients, users, listings, wars)
+        manual, proxy = report["results"]["manual"], report["results"]["proxy"]
+        report["writes_saved_per_auction"] = round(manual["writes"] - proxy["writes"], 2)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def manual(self, clients, users, listing_id, budgets):
+        """Outbid the leader by one increment until nobody can afford it."""
+        requests = 0
+        while True:
+            listing = Listing.objects.values("current_bid", "high_bidder").get(pk=listing_id)
+            price = listing["current_bid"]
+            amount = price + bidding.bid_increment(price)
+            bidder = next(
+                (n for n, user in enumerate(users) if user.pk != listing["high_bidder"] and budgets[n] >= amount),
+                None,
+            )
+            if bidder is None:
+                return requests
+            clients[bidder].post(reverse("place_bid", args=[listing_id]), {"bid_amount": str(amount)})
+            requests += 1
+
+    def proxy(self, clients, users, listing_id, budgets):
+        for client, budget in zip(clients, budgets):
+            client.post(reverse("place_max_bid", args=[listing_id]), {"max_amount": str(budget)})
+        return len(clients)
+
+    def measure(self, run, clients, users, listings, wars):
+        requests = writes = 0
+        with stopwatch() as timing:
+            for listing_id, budgets in zip(listings, wars):
+                # The query log is capped; captures of a full log are empty
+                reset_queries()
+                with CaptureQueriesContext(connection) as captured:
+                    requests += run(clients, users, listing_id, budgets)
+                writes += sum(query["sql"].startswith(WRITES) for query in captured.captured_queries)
+        final = Listing.objects.filter(pk__in=listings)
+        count = len(listings)
+        return {
+            "requests": round(requests / count, 2),
+            "bid_rows": round(Bid.objects.filter(listing__in=listings).count() / count, 2),
+            "writes": round(writes / count, 2),
+            "mean_ms": round(timing["seconds"] / count * 1000, 3),
+            "mean_final_price": str(round(sum(row.current_bid for row in final) / count, 2)),
+        }
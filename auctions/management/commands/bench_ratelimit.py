@@ -0,0 +1,67 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from auctions import ratelimit
+from auctions.benchmarks import stopwatch
+from auctions.models import User
+
+
+BACKENDS = {
+    "local": "auctions.ratelimit.LocalBackend",
+    "cache": "auctions.ratelimit.CacheBackend",
+}
+
+
+def bare_view(request, auction_id):
+    return HttpResponse()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the time the rate limiter adds to a place_bid request with the "
+        "in-process and the cache backend. No database is used."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--listings", type=int, default=100)
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        requests = []
+        # Unsaved users: the limiter only reads their primary key
+        users = [User(pk=n + 1) for n in range(options["users"])]
+        for n in range(options["requests"]):
+            request = factory.post(f"/bid/{n % options['listings']}", {"bid_amount": "10"})
+            request.user = users[n % len(users)]
+            requests.append((request, n % options["listings"]))
+
+        report = {
+            "requests": options["requests"],
+            "users": options["users"],
+            "bare_view_us": self.measure(bare_view, requests)["mean_us"],
+            "results": {},
+        }
+        limited_view = ratelimit.limit("place_bid")(bare_view)
+        for name, path in BACKENDS.items():
+            with override_settings(AUCTIONS_RATE_LIMIT_BACKEND=path):
+                result = self.measure(limited_view, requests)
+            result["overhead_us"] = round(result["mean_us"] - report["bare_view_us"], 3)
+            report["results"][name] = result
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, view, requests):
+        view(*requests[0])  # import the backend before timing
+        limited = 0
+        with stopwatch() as timing:
+            for request, listing_id in requests:
+                limited += view(request, auction_id=listing_id).status_code == 429
+        return {
+            "mean_us": round(timing["seconds"] / len(requests) * 1e6, 3),
+            "limited": limited,
+        }
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from auctions import search
+from auctions.benchmarks import scratch_database, stopwatch
+from auctions.benchmarks.seed import seed_listings, seed_users
+
+
+# Common terms, a rare combination and a term that matches nothing
+QUERIES = ["camera", "vintage guitar", "leather jack", "telescope 417", "zeppelin"]
+
+
+class Command(BaseCommand):
+    help = "Compare FTS5 (bm25 ranked) search against an icontains scan on a seeded corpus."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=200000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--query", action="append", help="Search terms (repeatable).")
+
+    def handle(self, *args, **options):
+        report = {"listings": options["listings"], "results": {}}
+        with scratch_database():
+            if connection.vendor != "sqlite":
+                self.stderr.write("FTS5 search is only available on SQLite.")
+                return
+            seed_listings(options["listings"], seed_users(options["users"]))
+            for query in options["query"] or QUERIES:
+                terms = search.search_terms(query)
+                report["results"][query] = {
+                    "fts5_bm25": self.measure(lambda: search._fts_search(terms, None, search.ACTIVE, 0, 21), options["repeat"]),
+                    "icontains": self.measure(lambda: search._icontains_search(terms, None, search.ACTIVE, 0, 21), options["repeat"]),
+                }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, run, repeat):
+        best, rows = None, 0
+        for _ in range(repeat):
+            with stopwatch() as timing:
+                rows = len(run())
+            best = timing["seconds"] if best is None else min(best, timing["seconds"])
+        return {"best_ms": round(best * 1000, 2), "rows": rows}
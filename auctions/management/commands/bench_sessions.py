@@ -0,0 +1,97 @@
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from auctions import caching, sessions
+from auctions.benchmarks import scratch_database, stopwatch
+from auctions.models import Listing, User, Watchlist
+
+
+CONFIGS = {
+    "db": {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+        "AUTHENTICATION_BACKENDS": ["django.contrib.auth.backends.ModelBackend"],
+    },
+    "cached": {
+        "SESSION_ENGINE": "auctions.sessions",
+        "AUTHENTICATION_BACKENDS": ["auctions.auth.CachedModelBackend"],
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare queries and time per request of the watchlist and place_bid views with "
+        "database sessions and users against the cached session engine and auth backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--watched", type=int, default=20)
+
+    def handle(self, *args, **options):
+        report = {"requests": options["requests"], "results": {}}
+        with scratch_database():
+            for name, config in CONFIGS.items():
+                with override_settings(**config):
+                    report["results"][name] = self.run_config(name, options["requests"], options["watched"])
+                sessions.flush()
+        report["queries_saved_per_request"] = {
+            path: round(report["results"]["db"][path]["queries"] - report["results"]["cached"][path]["queries"], 2)
+            for path in report["results"]["db"]
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run_config(self, name, requests, watched):
+        caching.get_cache().clear()
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        owner = User.objects.create_user(f"owner-{name}", f"owner-{name}@example.com", "x")
+        user = User.objects.create_user(f"bidder-{name}", f"bidder-{name}@example.com", "x")
+        listings = []
+        for n in range(watched):
+            listing = Listing(title=f"Item {n}", starting_bid=Decimal("1.00"), owner=owner)
+            listing.save()
+            listings.append(listing)
+        Watchlist.objects.bulk_create(Watchlist(user=user, listing=listing) for listing in listings)
+        client = Client()
+        client.force_login(user)
+        amounts = (Decimal(2 + n) for n in range(10 ** 9))
+
+        paths = {
+            "watchlist": lambda: client.get(reverse("watchlist")),
+            "place_bid": lambda: client.post(
+                reverse("place_bid", args=[listings[0].id]), {"bid_amount": str(next(amounts))}
+            ),
+        }
+        results = {}
+        for path, send in paths.items():
+            results[path] = self.measure(send, requests)
+        # Every response writes the session, as when it is modified on each request
+        with override_settings(SESSION_SAVE_EVERY_REQUEST=True):
+            results["watchlist_saving_session"] = self.measure(paths["watchlist"], requests)
+        return results
+
+    def measure(self, send, requests):
+        send()  # warm the caches
+        queries = session_queries = user_queries = 0
+        with stopwatch() as timing:
+            for _ in range(requests):
+                with CaptureQueriesContext(connection) as captured:
+                    send()
+                sql = [query["sql"] for query in captured.captured_queries]
+                queries += len(sql)
+                session_queries += sum('"django_session"' in statement for statement in sql)
+                user_queries += sum(statement.startswith('SELECT') and 'FROM "auctions_user"' in statement for statement in sql)
+        return {
+            "queries": round(queries / requests, 2),
+            "session_queries": round(session_queries / requests, 2),
+            "user_queries": round(user_queries / requests, 2),
+            "mean_ms": round(timing["seconds"] / requests * 1000, 3),
+        }
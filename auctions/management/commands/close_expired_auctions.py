@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from auctions.expiry import BATCH_SIZE, close_expired_listings
+
+
+class Command(BaseCommand):
+    help = "Close every active auction whose end date has passed and record its won price."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        closed = close_expired_listings(batch_size=options["batch_size"])
+        self.stdout.write(f"Closed {closed} expired auction(s).")
@@ -0,0 +1,26 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from auctions.transfer import CHUNK_SIZE, FORMATS, KINDS, export_rows, write_records
+
+
+class Command(BaseCommand):
+    help = "Stream listings, bids or comments to a JSONL or CSV file, reading the table in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=KINDS)
+        parser.add_argument("--output", "-o", default="-", help='File to write, or "-" for standard output.')
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension, else jsonl.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["output"]
+        format = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        stream = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+        try:
+            count = write_records(options["kind"], export_rows(options["kind"], options["chunk_size"]), stream, format)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        self.stderr.write(f"Exported {count} {options['kind']}.")
@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions import facets
+from auctions.bidding import refresh_bid_stats
+from auctions.models import Listing
+from auctions.transfer import BATCH_SIZE, FORMATS, KINDS, import_records, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream listings, bids or comments from a JSONL or CSV file into the database "
+        "with batched bulk inserts. Import listings before the bids and comments that refer to them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=KINDS)
+        parser.add_argument("path", help='File to read, or "-" for standard input.')
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension, else jsonl.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--ignore-conflicts", action="store_true", help="Skip rows whose id already exists.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        try:
+            stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        except OSError as exc:
+            raise CommandError(exc)
+        with stream:
+            report = import_records(
+                options["kind"],
+                read_records(stream, format),
+                batch_size=options["batch_size"],
+                ignore_conflicts=options["ignore_conflicts"],
+            )
+        if report.listing_ids:
+            # bulk_create bypasses the bidding service; rebuild its counters
+            refresh_bid_stats(Listing.objects.filter(pk__in=report.listing_ids))
+        if report.created and options["kind"] in ("listings", "bids"):
+            # Same for the category counts and price ranges
+            facets.rebuild()
+        for error in report.errors:
+            self.stderr.write(error)
+        self.stdout.write(f"Imported {report.created} {options['kind']}, skipped {report.skipped}.")
@@ -0,0 +1,73 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions.benchmarks import scratch_database, stopwatch
+from auctions.benchmarks.runner import SCENARIOS, LoadRunner, compare
+from auctions.benchmarks.seed import SCALES, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database and drive every auctions view with concurrent "
+        "clients; report throughput, latency percentiles and queries per view as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=50, help="Requests per client and view.")
+        parser.add_argument("--views", nargs="+", metavar="NAME", help="Only run these URL names.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Also write the report to this file.")
+        parser.add_argument("--baseline", help="Compare against a report written by an earlier run.")
+        parser.add_argument(
+            "--threshold", type=float, default=0.2,
+            help="Relative change in p95 latency or throughput reported as a regression.",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = SCENARIOS
+        if options["views"]:
+            unknown = set(options["views"]) - {scenario.name for scenario in SCENARIOS}
+            if unknown:
+                raise CommandError(f"Unknown views: {', '.join(sorted(unknown))}")
+            scenarios = [scenario for scenario in SCENARIOS if scenario.name in options["views"]]
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as stream:
+                baseline = json.load(stream)
+
+        with scratch_database() as connection:
+            with stopwatch() as seeding:
+                rows = seed_dataset(options["scale"], seed=options["seed"])
+            runner = LoadRunner(options["concurrency"], options["requests"], seed=options["seed"])
+            results = runner.run(scenarios)
+            vendor = connection.vendor
+
+        report = {
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": vendor,
+            },
+            "scale": options["scale"],
+            "rows": rows,
+            "seed_seconds": round(seeding["seconds"], 2),
+            "concurrency": options["concurrency"],
+            "requests_per_client": options["requests"],
+            "results": results,
+        }
+        if baseline is not None:
+            report["comparison"] = compare(results, baseline, options["threshold"])
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as stream:
+                stream.write(output)
+        self.stdout.write(output)
+        if baseline is not None:
+            regressed = sorted(name for name, row in report["comparison"].items() if row["regressions"])
+            if regressed:
+                self.stderr.write(f"Regressions in: {', '.join(regressed)}")
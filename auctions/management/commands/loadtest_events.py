@@ -0,0 +1,107 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncRequestFactory
+from django.urls import reverse
+
+from auctions import events, views
+
+
+class Command(BaseCommand):
+    help = (
+        "Open thousands of in-process event-stream subscribers, leave them idle, then "
+        "publish events. Reports memory per subscriber, delivery latency and DB queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=5000)
+        parser.add_argument("--listings", type=int, default=50, help="Subscribers are spread over this many listings.")
+        parser.add_argument("--events", dest="events_per_listing", type=int, default=20, help="Events published per listing.")
+        parser.add_argument("--idle", type=float, default=2.0, help="Seconds to stay idle before publishing.")
+
+    def handle(self, *args, **options):
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            report = asyncio.run(self.run(**options))
+        report["db_queries"] = len(queries)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    async def run(self, subscribers, listings, events_per_listing, idle, **options):
+        factory = AsyncRequestFactory()
+        broker = events.get_broker()
+        received = [0] * subscribers
+        latencies = []
+
+        async def consume(index, response):
+            async for chunk in response.streaming_content:
+                for line in chunk.decode().splitlines():
+                    if line.startswith("data: "):
+                        latencies.append(time.perf_counter() - json.loads(line[6:])["sent"])
+                        received[index] += 1
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        tasks = []
+        for index in range(subscribers):
+            listing_id = index % listings + 1
+            request = factory.get(reverse("listing_events", args=[listing_id]))
+            response = await views.listing_events(request, listing_id)
+            tasks.append(asyncio.create_task(consume(index, response)))
+        await asyncio.sleep(0.1)
+        subscribed, _ = tracemalloc.get_traced_memory()
+
+        idle_start = time.process_time()
+        await asyncio.sleep(idle)
+        idle_cpu = time.process_time() - idle_start
+        after_idle, peak = tracemalloc.get_traced_memory()
+        # Tracing slows every allocation; measure delivery without it
+        tracemalloc.stop()
+
+        def publisher():
+            for _ in range(events_per_listing):
+                for listing_id in range(1, listings + 1):
+                    message = events.format_event("bid", {"listing": listing_id, "sent": time.perf_counter()})
+                    broker.publish(events.channel_name(listing_id), message)
+
+        expected = subscribers * events_per_listing
+        start = time.perf_counter()
+        thread = threading.Thread(target=publisher)
+        thread.start()
+        while sum(received) < expected and time.perf_counter() - start < 60:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        thread.join()
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        latencies.sort()
+        return {
+            "subscribers": subscribers,
+            "bytes_per_idle_subscriber": (subscribed - before) // subscribers,
+            "memory_growth_while_idle_bytes": after_idle - subscribed,
+            "idle_cpu_seconds": round(idle_cpu, 4),
+            "peak_traced_mib": round(peak / 2**20, 2),
+            "published": events_per_listing * listings,
+            "deliveries": sum(received),
+            "expected_deliveries": expected,
+            "delivery_seconds": round(elapsed, 3),
+            "latency_ms": {
+                "p50": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+                "p99": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2) if latencies else None,
+            },
+            "subscribers_left": broker.subscriber_count(),
+        }
+
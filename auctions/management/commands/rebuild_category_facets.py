@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from auctions import facets
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the active listing count and price range of every category. "
+        "Use after bulk loads that bypass the model signals, or to repair drifted counts."
+    )
+
+    def handle(self, *args, **options):
+        rebuilt = facets.rebuild()
+        self.stdout.write(f"Rebuilt {rebuilt} category facet(s).")
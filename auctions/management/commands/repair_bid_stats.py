@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from auctions import facets
+from auctions.bidding import refresh_bid_stats
+from auctions.models import Listing
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute current_bid, high_bidder, bid_count and last_bid_at of listings "
+        "from their bids. Use after importing bids or to repair drifted counters."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("listing_ids", nargs="*", type=int, help="Only repair these listings.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        listings = None
+        if options["listing_ids"]:
+            listings = Listing.objects.filter(pk__in=options["listing_ids"])
+        refreshed = refresh_bid_stats(listings, batch_size=options["batch_size"])
+        # Current bids may have moved, and with them the category price ranges
+        facets.rebuild()
+        self.stdout.write(f"Refreshed bid stats of {refreshed} listing(s).")
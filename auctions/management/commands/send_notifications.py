@@ -0,0 +1,53 @@
+import json
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from auctions.notifications import BATCH_SIZE, DeliveryReport, deliver_due, outbox_stats, purge_delivered
+
+
+logger = logging.getLogger("auctions.notifications")
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the queued outbid and auction-won notifications in batches, every "
+        "--interval seconds until stopped, or once with --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Notifications claimed at a time.")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds to wait once nothing is due.")
+        parser.add_argument("--once", action="store_true", help="Send what is due now, then exit.")
+        parser.add_argument("--stats", action="store_true", help="Print the outbox counts as JSON and exit.")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(outbox_stats(), indent=2))
+            return
+        if options["once"]:
+            report = self.run_once(options["batch_size"])
+            self.stdout.write(json.dumps(vars(report), indent=2))
+            return
+        while True:
+            try:
+                self.run_once(options["batch_size"])
+            except Exception:
+                logger.exception("Sending notifications failed")
+            finally:
+                close_old_connections()
+            time.sleep(options["interval"])
+
+    def run_once(self, batch_size):
+        report = deliver_due(batch_size)
+        purged = purge_delivered()
+        if report != DeliveryReport() or purged:
+            logger.info(
+                "Notifications: %d sent in %d message(s), %d superseded, %d to retry, %d failed, "
+                "%d purged; lag %.1fs",
+                report.delivered, report.messages, report.superseded, report.retried, report.failed,
+                purged, report.lag,
+            )
+        return report
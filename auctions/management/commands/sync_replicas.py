@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from auctions import routing
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over every replica file, once or every --interval "
+        "seconds: a stand-in for replication when trying the replica router locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, help="Keep copying, this many seconds apart.")
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != "sqlite":
+            raise CommandError("Only SQLite replicas are copied; other databases replicate themselves.")
+        aliases = routing.replicas()
+        if not aliases:
+            raise CommandError("No replicas are configured; set AUCTIONS_SQLITE_REPLICAS.")
+        while True:
+            for alias in aliases:
+                routing.copy_sqlite(connections[alias].settings_dict["NAME"])
+            self.stdout.write(f"Copied the primary to {len(aliases)} replica(s).")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,30 @@
+import os
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions import assets
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "static")
+
+
+class Command(BaseCommand):
+    help = (
+        "Download the pinned Bootstrap, jQuery and Popper builds into auctions/static, "
+        "checking each against its integrity hash. Commit the files; run collectstatic to deploy them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--timeout", type=float, default=30)
+
+    def handle(self, *args, **options):
+        target = os.path.join(STATIC_DIR, *assets.VENDOR_DIR.split("/"))
+        os.makedirs(target, exist_ok=True)
+        for url, name, expected in assets.VENDOR:
+            with urlopen(url, timeout=options["timeout"]) as response:
+                data = response.read()
+            if assets.integrity(data) != expected:
+                raise CommandError(f"{url} does not match its integrity hash {expected}.")
+            with open(os.path.join(target, name), "wb") as vendored:
+                vendored.write(assets.strip_source_map(data))
+            self.stdout.write(f"Vendored {name} ({len(data)} bytes).")
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:56
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_watchlist_rows(apps, schema_editor):
+    # get_or_create never guaranteed uniqueness; keep the oldest row of each pair
+    Watchlist = apps.get_model('auctions', 'Watchlist')
+    keep = Watchlist.objects.values('user', 'listing').annotate(first_id=Min('id')).values('first_id')
+    Watchlist.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0002_listing_end_date_listing_won_price_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['listing', '-amount'], name='bid_listing_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['created_at'], name='listing_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'created_at'], name='listing_cat_active_created_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_watchlist_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='watchlist',
+            constraint=models.UniqueConstraint(fields=('user', 'listing'), name='unique_watchlist_user_listing'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:19
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def build_facets(apps, schema_editor):
+    Listing = apps.get_model('auctions', 'Listing')
+    CategoryFacet = apps.get_model('auctions', 'CategoryFacet')
+    rows = (
+        Listing.objects.filter(is_active=True)
+        .values_list('category')
+        .annotate(count=Count('id'), low=Min('current_bid'), high=Max('current_bid'))
+        .order_by()
+    )
+    CategoryFacet.objects.bulk_create(
+        CategoryFacet(category=category, active_count=count, min_price=low, max_price=high)
+        for category, count, low, high in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0006_listing_search_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryFacet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, choices=[('Electronics', 'Electronics'), ('Fashion', 'Fashion'), ('Home', 'Home'), ('Toys', 'Toys'), ('Sports', 'Sports'), ('Automotive', 'Automotive')], max_length=64, unique=True)),
+                ('active_count', models.PositiveIntegerField(default=0)),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+            ],
+            options={
+                'ordering': ['category'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'current_bid'], name='listing_cat_active_price_idx'),
+        ),
+        migrations.RunPython(build_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0009_listing_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='image',
+            field=models.FileField(blank=True, null=True, upload_to='listings/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='thumbnails',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0010_listing_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaxBid',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('placed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='max_bids', to='auctions.listing')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='max_bids', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['listing', '-amount', 'placed_at'], name='maxbid_listing_amount_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='maxbid',
+            constraint=models.UniqueConstraint(fields=('listing', 'user'), name='maxbid_listing_user_unique'),
+        ),
+    ]
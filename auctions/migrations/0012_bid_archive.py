@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0011_listing_max_bids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BidArchive',
+            fields=[
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='bid_archive', serialize=False, to='auctions.listing')),
+                ('bid_count', models.PositiveIntegerField()),
+                ('won_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('top_bids', models.JSONField(default=list)),
+                ('history', models.BinaryField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('winner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0013_notification_outbox'),
+    ]
+
+    # Only the Python-side default changes. Altering the columns would
+    # rebuild the listing table on SQLite and drop its search triggers.
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='bid',
+                name='created_at',
+                field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+            ),
+            migrations.AlterField(
+                model_name='comment',
+                name='created_at',
+                field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+            ),
+            migrations.AlterField(
+                model_name='listing',
+                name='created_at',
+                field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+            ),
+        ]),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:06
+
+from django.db import migrations, models
+
+
+def fill_top_max_bid(apps, schema_editor):
+    Listing = apps.get_model('auctions', 'Listing')
+    MaxBid = apps.get_model('auctions', 'MaxBid')
+    top = MaxBid.objects.filter(listing=models.OuterRef('pk')).order_by('-amount').values('amount')[:1]
+    Listing.objects.filter(pk__in=MaxBid.objects.values('listing')).update(top_max_bid=models.Subquery(top))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0014_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='top_max_bid',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        # A nullable column without a default is added in place on SQLite,
+        # without rebuilding the table and its search triggers
+        migrations.RunPython(fill_top_max_bid, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.files.storage import default_storage
 from django.db import models
-from auctions.common import CATEGORY_CHOICES
+from django.utils import timezone
+from auctions.common import AUCTION_DAYS, CATEGORY_CHOICES, DEFAULT_IMAGE_URL, THUMBNAIL_SIZES, thumbnail_name
 
 
 class User(AbstractUser):
@@ -9,6 +11,14 @@ class User(AbstractUser):
     def __str__(self):
         return str(self.username)
 
+    def get_session_auth_hash(self):
+        # Users restored by auctions.auth.CachedModelBackend carry the hash
+        # instead of the password it is made from
+        cached = getattr(self, "cached_session_auth_hash", None)
+        if cached is not None and "password" in self.get_deferred_fields():
+            return cached
+        return super().get_session_auth_hash()
+
 class Listing(models.Model):
     title = models.CharField(max_length=64)
     description = models.TextField(2000, blank=True)
@@ -17,20 +27,111 @@ class Listing(models.Model):
     won_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     end_date = models.DateTimeField(blank=True, null=True)
     image_url = models.URLField(blank=True)
+    # Uploaded image, used instead of image_url. thumbnails lists the widths
+    # of its resized copies (auctions/images.py), null until they are made
+    image = models.FileField(upload_to="listings/%Y/%m/", blank=True, null=True)
+    thumbnails = models.JSONField(blank=True, null=True)
     category = models.CharField(max_length=64, blank=True, choices=CATEGORY_CHOICES)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add, so that imports keep their own
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='listings')
     is_active = models.BooleanField(default=True)
+    # Maintained by auctions.bidding when a bid is accepted, so pages can
+    # show the leader and activity without reading the Bid table
+    high_bidder = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='leading_listings'
+    )
+    bid_count = models.PositiveIntegerField(default=0)
+    last_bid_at = models.DateTimeField(blank=True, null=True)
+    # Highest MaxBid amount, null without any: no maximum answers a bid
+    # above it, so such bids never read the MaxBid table
+    top_max_bid = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    # Last change to the listing (save, bid, close), for HTTP validators.
+    # Not auto_now: most writes are conditional UPDATEs that set it
+    # themselves. Null on rows bulk-loaded without it; see last_modified.
+    updated_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        # Partial indexes: the feeds only ever read active listings, and
+        # SQLite cannot seek on a bare boolean column inside a composite index
+        indexes = [
+            # index feed: active listings ordered by created_at
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(is_active=True),
+                name="listing_active_created_idx",
+            ),
+            # category feed: one category's active listings ordered by created_at
+            models.Index(
+                fields=["category", "created_at"],
+                condition=models.Q(is_active=True),
+                name="listing_cat_active_created_idx",
+            ),
+            # expiry sweep: active listings whose end_date has passed
+            models.Index(
+                fields=["end_date"],
+                condition=models.Q(is_active=True),
+                name="listing_active_end_idx",
+            ),
+            # category facets: lowest and highest current bid of a category
+            models.Index(
+                fields=["category", "current_bid"],
+                condition=models.Q(is_active=True),
+                name="listing_cat_active_price_idx",
+            ),
+        ]
     
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        listing = super().from_db(db, field_names, values)
+        # As loaded, so that post_save receivers can tell what a save()
+        # changed (auctions.facets)
+        listing._loaded_values = dict(zip(field_names, values))
+        return listing
+
+    def apply_defaults(self):
+        """
+            Fill in the values a new listing gets when they are left empty.
+            Called by save(); bulk loaders call it before bulk_create.
+        """
         if not self.current_bid:
             self.current_bid = self.starting_bid
         if not self.image_url:
-            self.image_url = "https://placehold.co/600x400"
+            self.image_url = DEFAULT_IMAGE_URL
         if not self.end_date:
-            from django.utils import timezone
-            self.end_date = timezone.now() + timezone.timedelta(days=7)
-        
+            self.end_date = timezone.now() + timezone.timedelta(days=AUCTION_DAYS)
+
+    @property
+    def last_modified(self):
+        return self.updated_at or self.created_at
+
+    @property
+    def image_src(self):
+        """
+            URL for the src attribute: the card sized thumbnail, the upload
+            itself until its thumbnails are made, or the external image_url.
+        """
+        if self.image and self.thumbnails:
+            card = THUMBNAIL_SIZES["card"]
+            width = min(self.thumbnails, key=lambda width: (width < card, abs(width - card)))
+            return default_storage.url(thumbnail_name(self.image.name, width))
+        if self.image:
+            return self.image.url
+        return self.image_url
+
+    @property
+    def image_srcset(self):
+        """Value of the srcset attribute, empty without thumbnails."""
+        if not (self.image and self.thumbnails):
+            return ""
+        return ", ".join(
+            f"{default_storage.url(thumbnail_name(self.image.name, width))} {width}w"
+            for width in self.thumbnails
+        )
+
+    def save(self, *args, **kwargs):
+        self.apply_defaults()
+        self.updated_at = timezone.now()
         super().save(*args, **kwargs)
         
     def __str__(self):
@@ -41,17 +142,111 @@ class Bid(models.Model):
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='bids')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bids')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # top bid of a listing
+            models.Index(fields=["listing", "-amount"], name="bid_listing_amount_idx"),
+        ]
 
     def __str__(self):
         return f"Bid {self.amount} by {self.user.username} on {self.listing.title}"
 
 
+class BidArchive(models.Model):
+    """
+        Bid history of a listing closed long ago, moved out of the Bid
+        table by auctions.archive: a summary, and every bid compressed.
+    """
+    listing = models.OneToOneField(Listing, on_delete=models.CASCADE, primary_key=True, related_name='bid_archive')
+    bid_count = models.PositiveIntegerField()
+    winner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    won_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # The highest bids, highest first, as {"id", "user", "amount", "created_at"}
+    top_bids = models.JSONField(default=list)
+    # Every bid, highest first, one such JSON object per line, gzipped
+    history = models.BinaryField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.bid_count} archived bids of listing {self.listing_id}"
+
+
+class Notification(models.Model):
+    """
+        Outbox of the notices sent to users: written in the transaction
+        of the bid or close that caused it, sent later by the
+        send_notifications worker (auctions.notifications).
+    """
+    OUTBID = 'outbid'
+    WON = 'won'
+    KIND_CHOICES = [(OUTBID, 'Outbid'), (WON, 'Won')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    # The bid that outbid the user, or the won price
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Not sent before this time: a retry's backoff, or a worker's claim
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Sent, or found no longer needed
+    delivered_at = models.DateTimeField(blank=True, null=True)
+    # Given up on after the last attempt
+    failed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # notices due to be sent, oldest first
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(delivered_at__isnull=True, failed_at__isnull=True),
+                name="notification_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} notice to {self.user_id} on listing {self.listing_id}"
+
+
+class MaxBid(models.Model):
+    """
+        The most a user is willing to pay for a listing. auctions.bidding
+        bids for them, one increment at a time, up to this amount.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='max_bids')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='max_bids')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # When the amount was last set; the earlier of two equal maxima wins
+    placed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "user"], name="maxbid_listing_user_unique"),
+        ]
+        indexes = [
+            # top two maxima of a listing
+            models.Index(fields=["listing", "-amount", "placed_at"], name="maxbid_listing_amount_idx"),
+        ]
+
+    def __str__(self):
+        return f"Max bid {self.amount} by {self.user.username} on {self.listing.title}"
+
+
 class Comment(models.Model):
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
     content = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # comments of a listing, newest first (read backwards)
+            models.Index(fields=["listing", "created_at"], name="comment_listing_created_idx"),
+        ]
 
     def __str__(self):
         return f"Comment by {self.user.username} on {self.listing.title}"
@@ -61,5 +256,28 @@ class Watchlist(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='watchlist')
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='watchlist')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "listing"], name="unique_watchlist_user_listing"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} is watching {self.listing.title}"
+
+
+class CategoryFacet(models.Model):
+    """
+        Active listing count and current price range of one category,
+        kept up to date by auctions.facets so pages never aggregate
+        over the Listing table.
+    """
+    category = models.CharField(max_length=64, unique=True, choices=CATEGORY_CHOICES, blank=True)
+    active_count = models.PositiveIntegerField(default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+
+    class Meta:
+        ordering = ["category"]
+
+    def __str__(self):
+        return f"{self.category or 'Uncategorized'}: {self.active_count} active"
@@ -0,0 +1,281 @@
+"""
+Outbid and auction-won notifications, through a transactional outbox.
+
+A Notification row is written by the receivers below in the transaction
+of the bid or close that causes it, so a notice exists exactly when its
+bid or close was committed. A bid transaction pays for at most one
+insert, for the leader it displaced, whom bidding already knows: the
+sending happens in another process, the send_notifications worker.
+
+The worker claims a batch of due rows by moving their next_attempt_at
+past a lease, so that two workers do not send the same rows and the rows
+of a worker that died are sent again once the lease runs out (delivery
+is at least once). A user's outbid notices in a batch go out as one
+message; a notice for a listing the user leads again is dropped. Sending
+is done by AUCTIONS_NOTIFICATION_SENDER; the default sends email through
+EMAIL_BACKEND. A message that fails is retried with an exponential
+backoff, up to AUCTIONS_NOTIFICATION_MAX_ATTEMPTS attempts.
+"""
+import itertools
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count, Min, Q
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import routing, signals
+from .models import Listing, Notification, User
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SENDER = "auctions.notifications.EmailSender"
+BATCH_SIZE = 100
+
+# Seconds a claimed batch is kept from other workers
+LEASE = 300
+
+# Seconds before the first retry, doubled on every further attempt
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 3600
+MAX_ATTEMPTS = 8
+
+RETENTION_DAYS = 7
+
+
+@dataclass
+class Message:
+    user: User
+    subject: str
+    body: str
+    notifications: list = field(default_factory=list)
+
+
+@dataclass
+class DeliveryReport:
+    notifications: int = 0
+    messages: int = 0
+    delivered: int = 0
+    # Outbid notices dropped because the user leads again
+    superseded: int = 0
+    retried: int = 0
+    failed: int = 0
+    # Seconds between the oldest notice sent and its sending
+    lag: float = 0.0
+
+    def add(self, other):
+        for name in ("notifications", "messages", "delivered", "superseded", "retried", "failed"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.lag = max(self.lag, other.lag)
+
+
+class EmailSender:
+    """Send each message as an email, over one EMAIL_BACKEND connection per batch."""
+
+    def send(self, messages):
+        """Send `messages`; returns {index: exception} of those that failed."""
+        failures = {}
+        with get_connection() as connection:
+            for index, message in enumerate(messages):
+                email = EmailMessage(message.subject, message.body, to=[message.user.email], connection=connection)
+                try:
+                    email.send()
+                except Exception as error:
+                    failures[index] = error
+        return failures
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def get_sender():
+    global _sender
+    if _sender is None:
+        with _sender_lock:
+            if _sender is None:
+                path = getattr(settings, "AUCTIONS_NOTIFICATION_SENDER", DEFAULT_SENDER)
+                _sender = import_string(path)()
+    return _sender
+
+
+def max_attempts():
+    return getattr(settings, "AUCTIONS_NOTIFICATION_MAX_ATTEMPTS", MAX_ATTEMPTS)
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the `attempts`-th failed attempt."""
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+@receiver(signals.bid_placed)
+def _queue_outbid(sender, listing_id, bid, previous_bidder_id, **kwargs):
+    # One notice per transaction, for the leader it displaced: maxima
+    # that were outbid within it never led
+    if previous_bidder_id is not None and previous_bidder_id != bid.user_id:
+        Notification.objects.create(
+            user_id=previous_bidder_id, listing_id=listing_id, kind=Notification.OUTBID, amount=bid.amount
+        )
+
+
+@receiver(signals.listings_closed)
+def _queue_won(sender, listing_ids, **kwargs):
+    won = Listing.objects.filter(pk__in=listing_ids, high_bidder__isnull=False).values_list(
+        "pk", "high_bidder_id", "won_price"
+    )
+    Notification.objects.bulk_create([
+        Notification(user_id=user_id, listing_id=listing_id, kind=Notification.WON, amount=price)
+        for listing_id, user_id, price in won
+    ])
+
+
+def pending():
+    return Notification.objects.filter(delivered_at__isnull=True, failed_at__isnull=True)
+
+
+def claim(batch_size=BATCH_SIZE, now=None):
+    """Take up to `batch_size` due notifications, oldest first, for LEASE seconds."""
+    now = now or timezone.now()
+    ids = list(
+        pending().filter(next_attempt_at__lte=now)
+        .order_by("next_attempt_at", "pk")
+        .values_list("pk", flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    lease = now + timedelta(seconds=LEASE)
+    # Rows claimed meanwhile by another worker no longer match
+    pending().filter(pk__in=ids, next_attempt_at__lte=now).update(next_attempt_at=lease)
+    with routing.primary_reads():
+        return list(Notification.objects.filter(pk__in=ids, next_attempt_at=lease).order_by("pk"))
+
+
+def _link(listing_id):
+    return reverse("auction_detail", args=[listing_id])
+
+
+def compose(notifications, listings, users):
+    """
+        The messages for `notifications`: one per user for their outbid
+        notices, with the latest bid per listing, and one per won auction.
+        Returns (messages, superseded notifications).
+    """
+    messages, superseded = [], []
+    by_user = itertools.groupby(sorted(notifications, key=lambda n: (n.user_id, n.pk)), key=lambda n: n.user_id)
+    for user_id, group in by_user:
+        user = users[user_id]
+        outbid = {}
+        for notification in group:
+            listing = listings[notification.listing_id]
+            if notification.kind == Notification.WON:
+                messages.append(Message(
+                    user,
+                    f"You won {listing.title}",
+                    f"Your bid of {notification.amount} won {listing.title}.\n{_link(listing.pk)}\n",
+                    [notification],
+                ))
+            elif listing.high_bidder_id == user_id:
+                superseded.append(notification)
+            else:
+                outbid.setdefault(listing.pk, []).append(notification)
+        if not outbid:
+            continue
+        lines = []
+        for listing_id, rows in outbid.items():
+            listing = listings[listing_id]
+            lines.append(f"{listing.title}: outbid at {max(row.amount for row in rows)}\n{_link(listing_id)}")
+        subject = (
+            f"You have been outbid on {listings[next(iter(outbid))].title}"
+            if len(outbid) == 1 else f"You have been outbid on {len(outbid)} auctions"
+        )
+        messages.append(Message(user, subject, "\n\n".join(lines) + "\n", [n for rows in outbid.values() for n in rows]))
+    return messages, superseded
+
+
+def _ids(notifications):
+    return [notification.pk for notification in notifications]
+
+
+def deliver_batch(batch_size=BATCH_SIZE, now=None):
+    """Claim one batch of due notifications and send it; returns a DeliveryReport."""
+    report = DeliveryReport()
+    notifications = claim(batch_size, now)
+    if not notifications:
+        return report
+    report.notifications = len(notifications)
+    listings = Listing.objects.only("title", "high_bidder").in_bulk({n.listing_id for n in notifications})
+    users = User.objects.only("username", "email").in_bulk({n.user_id for n in notifications})
+    messages, superseded = compose(notifications, listings, users)
+    try:
+        failures = get_sender().send(messages) if messages else {}
+    except Exception as error:
+        failures = dict.fromkeys(range(len(messages)), error)
+
+    sent_at = timezone.now()
+    delivered = superseded + [
+        notification
+        for index, message in enumerate(messages) if index not in failures
+        for notification in message.notifications
+    ]
+    Notification.objects.filter(pk__in=_ids(delivered)).update(delivered_at=sent_at, last_error="")
+    for index, error in failures.items():
+        rows = messages[index].notifications
+        attempts = max(row.attempts for row in rows) + 1
+        logger.warning("Sending notifications %s failed (attempt %d): %s", _ids(rows), attempts, error)
+        if attempts >= max_attempts():
+            Notification.objects.filter(pk__in=_ids(rows)).update(attempts=attempts, failed_at=sent_at, last_error=str(error))
+            report.failed += len(rows)
+        else:
+            Notification.objects.filter(pk__in=_ids(rows)).update(
+                attempts=attempts,
+                next_attempt_at=sent_at + timedelta(seconds=retry_delay(attempts)),
+                last_error=str(error),
+            )
+            report.retried += len(rows)
+
+    report.messages = len(messages) - len(failures)
+    report.delivered = len(delivered) - len(superseded)
+    report.superseded = len(superseded)
+    if delivered:
+        report.lag = (sent_at - min(row.created_at for row in delivered)).total_seconds()
+    return report
+
+
+def deliver_due(batch_size=BATCH_SIZE, now=None):
+    """Send every notification due at `now`, batch by batch; returns a DeliveryReport."""
+    report = DeliveryReport()
+    while True:
+        batch = deliver_batch(batch_size, now)
+        if not batch.notifications:
+            return report
+        report.add(batch)
+
+
+def purge_delivered(days=None, now=None):
+    """Delete notifications delivered more than `days` ago; returns how many."""
+    days = getattr(settings, "AUCTIONS_NOTIFICATION_RETENTION_DAYS", RETENTION_DAYS) if days is None else days
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    deleted, _ = Notification.objects.filter(delivered_at__lte=cutoff).delete()
+    return deleted
+
+
+def outbox_stats(now=None):
+    """Counts of the outbox by state, and the age in seconds of the oldest unsent notification."""
+    now = now or timezone.now()
+    counts = Notification.objects.aggregate(
+        pending=Count("pk", filter=Q(delivered_at__isnull=True, failed_at__isnull=True)),
+        retrying=Count("pk", filter=Q(delivered_at__isnull=True, failed_at__isnull=True, attempts__gt=0)),
+        delivered=Count("pk", filter=Q(delivered_at__isnull=False)),
+        failed=Count("pk", filter=Q(failed_at__isnull=False)),
+        oldest=Min("created_at", filter=Q(delivered_at__isnull=True, failed_at__isnull=True)),
+    )
+    oldest = counts.pop("oldest")
+    counts["oldest_pending_seconds"] = round((now - oldest).total_seconds(), 3) if oldest else 0
+    return counts
@@ -0,0 +1,129 @@
+"""
+Keyset (cursor) pagination for the listing feeds.
+
+Pages are addressed by the (created_at, id) of the last row shown, so
+fetching page 10,000 costs the same index seek as fetching page 1.
+"""
+import base64
+import binascii
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+        Return the (created_at, id) pair stored in `cursor`,
+        or None if the cursor is missing or malformed
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created, pk = raw.rsplit("|", 1)
+        created_at = parse_datetime(created)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if created_at is None:
+        return None
+    return created_at, pk
+
+
+def get_page_size(request):
+    """
+        Page size from the `page_size` query parameter, falling back to
+        the AUCTIONS_PAGE_SIZE setting and capped at AUCTIONS_MAX_PAGE_SIZE
+    """
+    default = getattr(settings, "AUCTIONS_PAGE_SIZE", DEFAULT_PAGE_SIZE)
+    maximum = getattr(settings, "AUCTIONS_MAX_PAGE_SIZE", MAX_PAGE_SIZE)
+    try:
+        size = int(request.GET.get("page_size", default))
+    except ValueError:
+        size = default
+    return max(1, min(size, maximum))
+
+
+def after_cursor(queryset, cursor, descending=False):
+    """
+        Order `queryset` by (created_at, id), newest first if `descending`,
+        and keep only the rows after `cursor`. The `created_at >= ...`
+        (or `<=`) bound lets the database seek straight into the index;
+        the OR only settles ties.
+    """
+    if descending:
+        queryset = queryset.order_by("-created_at", "-id")
+    else:
+        queryset = queryset.order_by("created_at", "id")
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, pk = position
+        if descending:
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(id__lt=pk)
+            )
+        else:
+            queryset = queryset.filter(created_at__gte=created_at).filter(
+                Q(created_at__gt=created_at) | Q(id__gt=pk)
+            )
+    return queryset
+
+
+def keyset_paginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, descending=False):
+    """
+        Return the page of `queryset` that follows `cursor`
+    """
+    rows = list(after_cursor(queryset, cursor, descending)[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.pk)
+    return KeysetPage(rows, next_cursor)
+
+
+def newest_first_paginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+        Return the page of `queryset`, highest id first, that follows
+        `cursor`, the id of the last row of the previous page
+    """
+    queryset = queryset.order_by("-id")
+    try:
+        last = int(cursor) if cursor else None
+    except ValueError:
+        last = None
+    if last is not None:
+        queryset = queryset.filter(id__lt=last)
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = str(rows[-1].pk)
+    return KeysetPage(rows, next_cursor)
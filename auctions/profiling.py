@@ -0,0 +1,176 @@
+"""
+Per-request SQL and template timing.
+
+ProfilingMiddleware profiles a sample of requests (AUCTIONS_PROFILING_SAMPLE_RATE).
+For a profiled request it adds a Server-Timing header, which browsers show
+in the network panel, and logs one JSON line to the "auctions.profiling"
+logger with the query count, database and template time, the slowest
+statements and any N+1 pattern: the same SQL run many times with
+different parameters.
+
+Queries are recorded by an execute wrapper installed on every database
+connection when it is opened, and templates by wrapping Template.render.
+Both only look up a context variable when the request is not sampled.
+"""
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 0.1
+SLOW_QUERIES = 5
+N_PLUS_ONE = 5
+SQL_CHARS = 300
+
+_current = ContextVar("auctions_profile", default=None)
+
+
+@dataclass
+class RequestProfile:
+    start: float = field(default_factory=time.perf_counter)
+    queries: list = field(default_factory=list)
+    template_seconds: float = 0.0
+    template_depth: int = 0
+
+    @property
+    def db_seconds(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def slowest(self, count):
+        ranked = sorted(self.queries, key=lambda query: query[2], reverse=True)[:count]
+        return [{"sql": sql[:SQL_CHARS], "ms": _ms(duration)} for sql, _, duration in ranked]
+
+    def repeated(self, threshold):
+        """SQL run at least `threshold` times with more than one set of parameters."""
+        params = defaultdict(list)
+        for sql, query_params, _ in self.queries:
+            params[sql].append(query_params)
+        return [
+            {"sql": sql[:SQL_CHARS], "count": len(seen)}
+            for sql, seen in params.items()
+            if len(seen) >= threshold and len(set(seen)) > 1
+        ]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries.append((sql, repr(params), time.perf_counter() - start))
+
+
+def _install_wrapper(sender, connection, **kwargs):
+    # connection_created fires again when a closed connection reconnects
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+_render = Template.render
+
+
+def _timed_render(self, context):
+    profile = _current.get()
+    if profile is None:
+        return _render(self, context)
+    # Only the outermost template is timed; includes and extends nest inside it
+    profile.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _render(self, context)
+    finally:
+        profile.template_depth -= 1
+        if profile.template_depth == 0:
+            profile.template_seconds += time.perf_counter() - start
+
+
+def install():
+    connection_created.connect(_install_wrapper, dispatch_uid="auctions.profiling")
+    Template.render = _timed_render
+
+
+def server_timing(profile, total):
+    return ", ".join([
+        f'db;dur={_ms(profile.db_seconds)};desc="{len(profile.queries)} queries"',
+        f"tmpl;dur={_ms(profile.template_seconds)}",
+        f"total;dur={_ms(total)}",
+    ])
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        rate = getattr(settings, "AUCTIONS_PROFILING_SAMPLE_RATE", SAMPLE_RATE)
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.report(profile, request, response)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        profile = RequestProfile()
+        # Copied into sync_to_async threads with the rest of the context
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.report(profile, request, response)
+        return response
+
+    def report(self, profile, request, response):
+        total = time.perf_counter() - profile.start
+        response["Server-Timing"] = server_timing(profile, total)
+        match = getattr(request, "resolver_match", None)
+        repeated = profile.repeated(getattr(settings, "AUCTIONS_PROFILING_N_PLUS_ONE", N_PLUS_ONE))
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": _ms(total),
+            "queries": len(profile.queries),
+            "db_ms": _ms(profile.db_seconds),
+            "template_ms": _ms(profile.template_seconds),
+            "slowest": profile.slowest(getattr(settings, "AUCTIONS_PROFILING_SLOW_QUERIES", SLOW_QUERIES)),
+            "n_plus_one": repeated,
+        }
+        logger.log(logging.WARNING if repeated else logging.INFO, json.dumps(record))
@@ -0,0 +1,232 @@
+"""
+Token-bucket rate limiting for the write views.
+
+Each limited view has a list of buckets in AUCTIONS_RATE_LIMITS (RATE_LIMITS
+below when unset), keyed by the user, the client address, the listing or
+the username submitted to the login form together with the address it
+came from. A username alone is not a key: anyone could then use up its
+bucket and keep its owner from logging in.
+A bucket holds `burst` tokens and refills at `rate`; a request takes one
+token from each of the view's buckets and is answered 429 Too Many
+Requests, with a Retry-After header, when one is empty. Buckets are taken
+in order and the first empty one stops the request, so a throttled user
+does not also use up the listing's bucket for everybody else.
+
+The check runs before the view: it reads request.user, which comes from
+the session and user caches, and nothing from the database.
+
+A bucket is stored as the single time at which it will be full again.
+The backend is chosen by AUCTIONS_RATE_LIMIT_BACKEND: LocalBackend keeps
+the buckets in the process, CacheBackend in the AUCTIONS_RATE_LIMIT_CACHE
+cache shared by every server process. CacheBackend reads and writes a
+bucket without a lock, so requests racing in several processes can take
+the last token more than once.
+"""
+import hashlib
+import math
+import threading
+import time
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+
+DEFAULT_BACKEND = "auctions.ratelimit.LocalBackend"
+DEFAULT_CACHE = "default"
+
+# Buckets kept by LocalBackend; the least recently used one is dropped
+# first, which only makes it full again
+MAX_KEYS = 100000
+
+RATE_LIMITS = {
+    "place_bid": [
+        {"key": "user", "rate": "60/m", "burst": 10},
+        {"key": "listing", "rate": "600/m", "burst": 60},
+    ],
+    "place_max_bid": [
+        {"key": "user", "rate": "30/m", "burst": 5},
+        {"key": "listing", "rate": "300/m", "burst": 30},
+    ],
+    "add_comment": [
+        {"key": "user", "rate": "10/m", "burst": 5},
+        {"key": "listing", "rate": "120/m", "burst": 20},
+    ],
+    "add_to_watchlist": [
+        {"key": "user", "rate": "60/m", "burst": 20},
+    ],
+    "login": [
+        {"key": "ip", "rate": "30/m", "burst": 10},
+        # Guessing one account's password, however slowly
+        {"key": "username", "rate": "20/h", "burst": 5},
+    ],
+}
+
+# Where the client's address is read: REMOTE_ADDR, or the header a proxy
+# sets, and how many proxies in front of the app append to that header
+CLIENT_IP_HEADER = "REMOTE_ADDR"
+TRUSTED_PROXIES = 1
+
+# Seconds of float rounding ignored when a token is due
+TOLERANCE = 1e-6
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """Seconds per token of a rate such as "60/m" (per s, m, h or d)."""
+    count, _, period = rate.partition("/")
+    return PERIODS[period] / int(count)
+
+
+def take_token(refilled_at, now, interval, burst):
+    """
+        Take a token from a bucket that is full again at `refilled_at`
+        (None for a new bucket). Returns the new refill time and 0, or
+        the unchanged time and the seconds until a token is free.
+    """
+    refilled_at = max(refilled_at or now, now)
+    wait = refilled_at - (burst - 1) * interval - now
+    if wait > TOLERANCE:
+        return refilled_at, wait
+    return refilled_at + interval, 0.0
+
+
+class LocalBackend:
+
+    def __init__(self, max_keys=MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, interval, burst):
+        now = time.monotonic()
+        with self._lock:
+            # Popped and put back, so the dict is ordered by last use
+            refilled_at, wait = take_token(self._buckets.pop(key, None), now, interval, burst)
+            self._buckets[key] = refilled_at
+            if len(self._buckets) > self.max_keys:
+                del self._buckets[next(iter(self._buckets))]
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBackend:
+
+    def __init__(self, alias=None):
+        self.alias = alias or getattr(settings, "AUCTIONS_RATE_LIMIT_CACHE", DEFAULT_CACHE)
+
+    def take(self, key, interval, burst):
+        cache = caches[self.alias]
+        key = f"auctions.ratelimit:{key}"
+        now = time.time()
+        refilled_at, wait = take_token(cache.get(key), now, interval, burst)
+        if not wait:
+            # A bucket that has refilled is the same as a missing one
+            cache.set(key, refilled_at, math.ceil(refilled_at - now) + 1)
+        return wait
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    path = getattr(settings, "AUCTIONS_RATE_LIMIT_BACKEND", DEFAULT_BACKEND)
+    backend = _backends.get(path)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(path)
+            if backend is None:
+                backend = _backends[path] = import_string(path)()
+    return backend
+
+
+def client_ip(request, view_kwargs):
+    """
+        The client's address, from AUCTIONS_CLIENT_IP_HEADER. In a list
+        such as X-Forwarded-For ("client, proxy1, ...") only the entries
+        appended by the AUCTIONS_TRUSTED_PROXIES proxies can be believed,
+        so the address the first of them saw is used.
+    """
+    header = getattr(settings, "AUCTIONS_CLIENT_IP_HEADER", CLIENT_IP_HEADER)
+    value = request.META.get(header) or request.META.get("REMOTE_ADDR", "")
+    addresses = [address.strip() for address in value.split(",") if address.strip()]
+    if not addresses:
+        return ""
+    proxies = getattr(settings, "AUCTIONS_TRUSTED_PROXIES", TRUSTED_PROXIES)
+    return addresses[-min(max(proxies, 1), len(addresses))]
+
+
+def user_key(request, view_kwargs):
+    # Anonymous clients share their address's bucket
+    user = request.user
+    if user.is_authenticated:
+        return f"user{user.pk}"
+    return f"ip{client_ip(request, view_kwargs)}"
+
+
+def listing_key(request, view_kwargs):
+    return view_kwargs.get("auction_id")
+
+
+def username_key(request, view_kwargs):
+    # The submitted name is anything the client sent: hashed to a short key.
+    # Per address, so a flood from elsewhere leaves the owner's bucket full
+    username = request.POST.get("username", "").strip().lower()
+    return f"{client_ip(request, view_kwargs)}:{hashlib.sha256(username.encode()).hexdigest()[:32]}"
+
+
+KEYS = {
+    "ip": client_ip,
+    "user": user_key,
+    "listing": listing_key,
+    "username": username_key,
+}
+
+
+def retry_after(name, request, view_kwargs):
+    """
+        Take a token from each bucket of the view `name`; returns 0, or
+        the seconds until the request would be let through.
+    """
+    rules = getattr(settings, "AUCTIONS_RATE_LIMITS", RATE_LIMITS).get(name)
+    if not rules:
+        return 0
+    backend = get_backend()
+    for rule in rules:
+        value = KEYS[rule["key"]](request, view_kwargs)
+        wait = backend.take(f"{name}:{rule['key']}:{value}", parse_rate(rule["rate"]), rule.get("burst", 1))
+        if wait:
+            return wait
+    return 0
+
+
+def too_many_requests(wait):
+    response = HttpResponse("Too many requests, please try again shortly.", status=429, content_type="text/plain")
+    response["Retry-After"] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def limit(name, methods=None):
+    """
+        Rate limit a view with the buckets of AUCTIONS_RATE_LIMITS[name],
+        only for `methods` if given. Goes below login_required, so that
+        the user is known.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                wait = retry_after(name, request, kwargs)
+                if wait:
+                    return too_many_requests(wait)
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
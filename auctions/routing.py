@@ -0,0 +1,150 @@
+"""
+Primary/replica database routing.
+
+Reads go to one of the AUCTIONS_DB_REPLICAS aliases, picked at random,
+and writes to "default", the primary. Once anything asks where to
+write, the rest of the request (or of the thread outside requests)
+reads from the primary too, as do queries inside a transaction on it.
+
+Sessions always use the primary, and writing one pins nothing.
+
+A replica trails the primary, so PrimaryPinningMiddleware also sets a
+short-lived cookie on the response of a request that wrote: the
+redirect that follows a bid and the pages after it, for
+AUCTIONS_PRIMARY_PIN_SECONDS, read from the primary and show the bid.
+
+Without replicas every query goes to the primary, as before.
+"""
+import random
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PIN_COOKIE = "auctions_primary"
+PIN_SECONDS = 5
+
+# None outside a pinned request; a one item list (written flag) inside,
+# shared with sync_to_async threads that copy the context
+_pinned = ContextVar("auctions_pinned", default=None)
+_thread_wrote = ContextVar("auctions_thread_wrote", default=False)
+_primary_block = ContextVar("auctions_primary_block", default=False)
+
+
+def replicas():
+    return getattr(settings, "AUCTIONS_DB_REPLICAS", [])
+
+
+def pinned():
+    """True if reads must go to the primary in the current context."""
+    if _primary_block.get():
+        return True
+    state = _pinned.get()
+    if state is not None:
+        return state[0]
+    return _thread_wrote.get()
+
+
+def pin():
+    state = _pinned.get()
+    if state is not None:
+        state[0] = True
+    else:
+        _thread_wrote.set(True)
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside the block, e.g. to fill a cache."""
+    token = _primary_block.set(True)
+    try:
+        yield
+    finally:
+        _primary_block.reset(token)
+
+
+def primary_only(model):
+    # Sessions are read and written on the primary alone (a session just
+    # created must not be missed on a replica), so writing one, as login,
+    # logout, messages and CSRF rotation do, pins nothing else
+    return model._meta.label == "sessions.Session"
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or pinned() or primary_only(model) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        if not primary_only(model):
+            pin()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema along with the data
+        return db not in replicas()
+
+
+def copy_sqlite(path):
+    """
+        Copy the primary SQLite database over the file at `path` with the
+        online backup API; readers of the copy see the old or new state.
+    """
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        primary.connection.backup(target)
+    finally:
+        target.close()
+
+
+class PrimaryPinningMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = [PIN_COOKIE in request.COOKIES]
+        token = _pinned.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.process_response(request, response, state)
+
+    async def __acall__(self, request):
+        state = [PIN_COOKIE in request.COOKIES]
+        token = _pinned.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.process_response(request, response, state)
+
+    def process_response(self, request, response, state):
+        # Only when the request wrote; a pin from an earlier one runs out
+        if state[0] and PIN_COOKIE not in request.COOKIES and replicas():
+            seconds = getattr(settings, "AUCTIONS_PRIMARY_PIN_SECONDS", PIN_SECONDS)
+            response.set_cookie(PIN_COOKIE, "1", max_age=seconds, httponly=True, samesite="Lax")
+        return response
@@ -0,0 +1,54 @@
+"""
+Optional in-process scheduler for the expiry sweep.
+
+Set AUCTIONS_EXPIRY_SWEEP_INTERVAL (seconds) to have each server process
+close expired auctions in a daemon thread. Leave it unset and run the
+close_expired_auctions management command from cron instead when
+several processes serve the site.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+_sweeper = None
+_lock = threading.Lock()
+
+
+class ExpirySweeper(threading.Thread):
+
+    def __init__(self, interval):
+        super().__init__(name="auction-expiry-sweeper", daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        from .expiry import close_expired_listings
+
+        while not self.stopped.wait(self.interval):
+            try:
+                close_expired_listings()
+            except Exception:
+                logger.exception("Expiry sweep failed")
+            finally:
+                connection.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def start():
+    """Start the sweeper once per process if an interval is configured."""
+    global _sweeper
+    interval = getattr(settings, "AUCTIONS_EXPIRY_SWEEP_INTERVAL", None)
+    if not interval:
+        return None
+    with _lock:
+        if _sweeper is None:
+            _sweeper = ExpirySweeper(interval)
+            _sweeper.start()
+    return _sweeper
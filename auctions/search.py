@@ -0,0 +1,140 @@
+"""
+Full-text search over listing titles and descriptions.
+
+On SQLite, queries run against the auctions_listing_fts FTS5 index
+created by migration 0006 and are ranked with bm25, with title matches
+weighted above description matches. Other databases fall back to an
+icontains filter, newest listings first.
+
+The index is kept in sync by triggers on auctions_listing. SQLite drops
+them whenever a migration rebuilds that table (most AlterFields do), and
+search then silently misses new and edited listings, so the
+auctions.E003 check, which migrate runs, reports any that are missing.
+"""
+import re
+from dataclasses import dataclass
+
+from django.core import checks
+from django.db import connection, connections
+from django.db.models import Q
+
+from .feeds import CARD_FIELDS, PREVIEW_CHARS, listing_cards
+from .models import Listing
+
+
+ACTIVE = "active"
+CLOSED = "closed"
+ANY = "all"
+STATUSES = (ACTIVE, CLOSED, ANY)
+
+FTS_TABLE = "auctions_listing_fts"
+FTS_TRIGGERS = ("auctions_listing_fts_insert", "auctions_listing_fts_delete", "auctions_listing_fts_update")
+
+# bm25 column weights: title, description
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+@dataclass
+class SearchPage:
+    items: list
+    number: int
+    has_next: bool
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def search_terms(query):
+    return re.findall(r"\w+", query or "")
+
+
+def match_expression(terms):
+    """
+        Build an FTS5 MATCH expression requiring every term. Terms are
+        quoted so user input cannot inject FTS syntax; the last one is a
+        prefix so results show up while the user is still typing.
+    """
+    quoted = ['"%s"' % term.replace('"', '""') for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search_listings(query, category=None, status=ACTIVE, page=1, page_size=20):
+    terms = search_terms(query)
+    if not terms:
+        return SearchPage([], 1, False)
+    page = max(1, page)
+    offset = (page - 1) * page_size
+    if connection.vendor == "sqlite":
+        rows = _fts_search(terms, category, status, offset, page_size + 1)
+    else:
+        rows = _icontains_search(terms, category, status, offset, page_size + 1)
+    return SearchPage(rows[:page_size], page, len(rows) > page_size)
+
+
+def _status_filter(status):
+    if status == ACTIVE:
+        return Q(is_active=True)
+    if status == CLOSED:
+        return Q(is_active=False)
+    return Q()
+
+
+def _fts_search(terms, category, status, offset, limit):
+    columns = ", ".join(f"l.{field}" for field in CARD_FIELDS)
+    where = ["auctions_listing_fts MATCH %s"]
+    params = [match_expression(terms)]
+    if category:
+        where.append("l.category = %s")
+        params.append(category)
+    if status == ACTIVE:
+        where.append("l.is_active")
+    elif status == CLOSED:
+        where.append("NOT l.is_active")
+    sql = f"""
+        SELECT {columns}, substr(l.description, 1, {PREVIEW_CHARS + 1}) AS description_preview
+        FROM auctions_listing_fts
+        JOIN auctions_listing l ON l.id = auctions_listing_fts.rowid
+        WHERE {" AND ".join(where)}
+        ORDER BY bm25(auctions_listing_fts, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}), l.id
+        LIMIT %s OFFSET %s
+    """
+    return list(Listing.objects.raw(sql, params + [limit, offset]))
+
+
+def _icontains_search(terms, category, status, offset, limit):
+    queryset = Listing.objects.filter(_status_filter(status))
+    if category:
+        queryset = queryset.filter(category=category)
+    for term in terms:
+        queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+    return list(listing_cards(queryset).order_by("-created_at", "-id")[offset:offset + limit])
+
+
+def missing_triggers(using):
+    """The FTS_TRIGGERS absent from database `using`, once its index exists."""
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        found = {(kind, name) for kind, name in cursor.fetchall()}
+    if ("table", FTS_TABLE) not in found:
+        return []
+    return [name for name in FTS_TRIGGERS if ("trigger", name) not in found]
+
+
+def check_fts_triggers(app_configs=None, databases=None, **kwargs):
+    errors = []
+    for alias in databases or []:
+        if connections[alias].vendor != "sqlite":
+            continue
+        missing = missing_triggers(alias)
+        if missing:
+            errors.append(checks.Error(
+                f"DATABASES[{alias!r}] lacks the triggers {', '.join(missing)} that keep the search index in sync.",
+                hint="A migration rebuilt auctions_listing; recreate them as migration 0006 does.",
+                id="auctions.E003",
+            ))
+    return errors
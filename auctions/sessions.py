@@ -0,0 +1,140 @@
+"""
+Write-behind cached sessions: SESSION_ENGINE = "auctions.sessions".
+
+Sessions are read from the SESSION_CACHE_ALIAS cache and, on a miss,
+from django_session, like Django's cached_db engine. Creating a session
+writes its row at once, which keeps session keys unique. Later changes
+only go to the cache and a queue; a daemon thread writes the queue to
+the database in one statement every AUCTIONS_SESSION_WRITE_INTERVAL
+seconds, so a change is written once however often it is repeated in
+between. Queued changes are read before the database, so an evicted
+session never comes back older. Deleting a session (logout) drops its
+queued change before the row is deleted.
+
+The queue lives in the process: a crash loses at most one interval of
+session changes, and several server processes need a shared cache.
+An interval of 0 writes every change through, as cached_db does.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.models import Session
+from django.db import connection, connections, router
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+WRITE_INTERVAL = 30
+
+_pending = {}
+# Database the queue was filled against; dropped unwritten if that is gone
+# (a test or benchmark database destroyed before the next write)
+_database = None
+# Held while the queue is written, so a session deleted meanwhile is not
+# written back after its row was removed
+_lock = threading.Lock()
+_flusher = None
+
+
+def write_interval():
+    return getattr(settings, "AUCTIONS_SESSION_WRITE_INTERVAL", WRITE_INTERVAL)
+
+
+def _database_name():
+    return connections[router.db_for_write(Session)].settings_dict["NAME"]
+
+
+def flush():
+    """Write every queued session change; returns the number written."""
+    with _lock:
+        rows = list(_pending.values())
+        if rows and _database_name() != _database:
+            rows = []
+        if rows:
+            Session.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["session_key"],
+                update_fields=["session_data", "expire_date"],
+            )
+        _pending.clear()
+    return len(rows)
+
+
+def pending(session_key):
+    with _lock:
+        return _pending.get(session_key)
+
+
+def _queue(row):
+    global _database, _flusher
+    with _lock:
+        _database = _database_name()
+        _pending[row.session_key] = row
+        if _flusher is None:
+            _flusher = SessionFlusher(write_interval())
+            _flusher.start()
+
+
+def _discard(session_key):
+    with _lock:
+        _pending.pop(session_key, None)
+
+
+class SessionFlusher(threading.Thread):
+
+    def __init__(self, interval):
+        super().__init__(name="auction-session-flusher", daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                flush()
+            except Exception:
+                logger.exception("Writing queued sessions failed")
+            finally:
+                connection.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+@atexit.register
+def _flush_at_exit():
+    if _pending:
+        try:
+            flush()
+        except Exception:
+            logger.exception("Writing queued sessions at exit failed")
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = "auctions.sessions"
+
+    def _get_session_from_db(self):
+        row = pending(self.session_key) if self.session_key else None
+        if row is not None and row.expire_date > timezone.now():
+            return row
+        return super()._get_session_from_db()
+
+    def exists(self, session_key):
+        return pending(session_key) is not None or super().exists(session_key)
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None or not write_interval():
+            return super().save(must_create)
+        data = self._get_session()
+        self._cache.set(self.cache_key, data, self.get_expiry_age())
+        _queue(self.create_model_instance(data))
+
+    def delete(self, session_key=None):
+        key = session_key or self.session_key
+        if key is not None:
+            _discard(key)
+        super().delete(session_key)
@@ -0,0 +1,19 @@
+"""
+Signals sent when a listing changes through the auction workflow.
+
+They are sent inside the transaction that made the change, so receivers
+that must only act on committed data should use transaction.on_commit.
+"""
+from django.dispatch import Signal
+
+
+# sender=Listing, listing_id, bid, bids, previous_bidder_id: once per
+# transaction that accepted bids; bids in order, bid the last (leading)
+# one, previous_bidder_id the leader before them (None without bids)
+bid_placed = Signal()
+
+# sender=Listing, listing_id, comment
+comment_added = Signal()
+
+# sender=Listing, listing_ids
+listings_closed = Signal()
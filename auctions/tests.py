@@ -1,3 +1,1455 @@
-from django.test import TestCase
+import contextvars
+import gzip
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from decimal import Decimal
+from types import ModuleType
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from auctions import api, archive, assets, async_views, bidding, caching, comments, db, events, expiry, facets, feeds, images, notifications, profiling, ratelimit, routing, search, sessions, transfer, urls
+from auctions.auth import CachedModelBackend, get_cache as user_cache
+from auctions.benchmarks import runner
+from auctions.common import thumbnail_name
+from auctions.management.commands.bench_feeds import legacy_index
+from .models import User, Listing, Bid, BidArchive, CategoryFacet, Comment, MaxBid, Notification, Watchlist
+from .pagination import after_cursor, decode_cursor, encode_cursor, keyset_paginate
+
+
+def make_user(username):
+    return User.objects.create_user(username, f"{username}@example.com", "password")
+
+
+def make_listing(owner, **kwargs):
+    kwargs.setdefault("title", "Item")
+    kwargs.setdefault("starting_bid", Decimal("10.00"))
+    listing = Listing(owner=owner, **kwargs)
+    listing.save()
+    return listing
+
+
+class PlaceBidTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.owner = make_user("owner")
+        self.bidder = make_user("bidder")
+        self.listing = make_listing(self.owner)
+
+    def test_higher_bid_is_accepted(self):
+        result = bidding.place_bid(self.listing.id, self.bidder, "12.50")
+        self.assertTrue(result.accepted)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_bid, Decimal("12.50"))
+        self.assertEqual(Bid.objects.get().amount, Decimal("12.50"))
+
+    def test_equal_or_lower_bid_is_outbid(self):
+        self.assertEqual(bidding.place_bid(self.listing.id, self.bidder, "10").status, bidding.OUTBID)
+        self.assertEqual(bidding.place_bid(self.listing.id, self.bidder, "9.99").status, bidding.OUTBID)
+        self.assertFalse(Bid.objects.exists())
+
+    def test_closed_listing_rejects_bids(self):
+        Listing.objects.filter(pk=self.listing.pk).update(is_active=False)
+        self.assertEqual(bidding.place_bid(self.listing.id, self.bidder, "50").status, bidding.CLOSED)
+
+    def test_listing_past_its_end_date_rejects_bids_before_the_sweep(self):
+        Listing.objects.filter(pk=self.listing.pk).update(end_date=timezone.now() - timezone.timedelta(minutes=1))
+        self.assertEqual(bidding.place_bid(self.listing.id, self.bidder, "50").status, bidding.CLOSED)
+        self.assertEqual(bidding.place_max_bid(self.listing.id, self.bidder, "60").status, bidding.CLOSED)
+        self.assertFalse(Bid.objects.exists())
+        self.assertFalse(MaxBid.objects.exists())
+        expiry.close_expired_listings()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.won_price, Decimal("0.00"))
+
+    def test_invalid_amounts(self):
+        for value in ("abc", "", "-5", "0", "nan", "inf"):
+            self.assertEqual(bidding.place_bid(self.listing.id, self.bidder, value).status, bidding.INVALID)
+
+    def test_bid_stats_are_maintained(self):
+        other = make_user("other")
+        bidding.place_bid(self.listing.id, self.bidder, "11")
+        bidding.place_bid(self.listing.id, other, "12")
+        bidding.place_bid(self.listing.id, self.bidder, "11.50")
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 2)
+        self.assertEqual(self.listing.high_bidder, other)
+        self.assertIsNotNone(self.listing.last_bid_at)
+
+    def test_repair_bid_stats(self):
+        bidding.place_bid(self.listing.id, self.bidder, "11")
+        Listing.objects.filter(pk=self.listing.pk).update(bid_count=0, high_bidder=None, current_bid=Decimal("99"))
+        self.assertEqual(bidding.refresh_bid_stats(batch_size=1), 1)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 1)
+        self.assertEqual(self.listing.high_bidder, self.bidder)
+        self.assertEqual(self.listing.current_bid, Decimal("11.00"))
+
+    def test_closed_detail_page_does_not_read_bids(self):
+        bidding.place_bid(self.listing.id, self.bidder, "11")
+        self.assertTrue(bidding.close_listing(self.listing.id, self.owner))
+        self.assertFalse(bidding.close_listing(self.listing.id, self.owner))
+        self.client.force_login(self.bidder)
+        # user, listing with owner and winner, watched ids, comments, category facets;
+        # the session is read from the cache
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("auction_detail", args=[self.listing.id]))
+        self.assertTrue(response.context["is_winner"])
+        self.assertContains(response, "Winner: bidder with a bid of $11.00")
+
+    def test_a_bid_decided_on_a_stale_read_is_decided_again(self):
+        other = make_user("other")
+        read = bidding._bid_state
+        self.addCleanup(setattr, bidding, "_bid_state", read)
+
+        def read_then_outbid(amount):
+            def stale_read(listing_id, lock=False):
+                listing = read(listing_id, lock)
+                if not lock:
+                    # Another bid is committed between the read and the write
+                    bidding._bid_state = read
+                    bidding.place_bid(listing_id, other, amount)
+                return listing
+            bidding._bid_state = stale_read
+
+        read_then_outbid("15")
+        self.assertEqual(bidding.place_bid(self.listing.id, self.bidder, "12").status, bidding.OUTBID)
+        read_then_outbid("16")
+        self.assertTrue(bidding.place_bid(self.listing.id, self.bidder, "20").accepted)
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.current_bid, self.listing.high_bidder, self.listing.bid_count), (Decimal("20.00"), self.bidder, 3))
+        # The leader the bid displaced is the one read under the lock
+        self.assertEqual(
+            list(Notification.objects.order_by("pk").values_list("user__username", "amount")),
+            [("other", Decimal("20.00"))],
+        )
+
+    def test_only_current_bid_is_written(self):
+        Listing.objects.filter(pk=self.listing.pk).update(title="Renamed")
+        bidding.place_bid(self.listing.id, self.bidder, "11")
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.title, "Renamed")
+
+
+class MaxBidTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.owner = make_user("owner")
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.listing = make_listing(self.owner)
+
+    def assertListing(self, current_bid, high_bidder, bid_count):
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_bid, Decimal(current_bid))
+        self.assertEqual(self.listing.high_bidder, high_bidder)
+        self.assertEqual(self.listing.bid_count, bid_count)
+
+    def test_increments(self):
+        self.assertEqual(bidding.bid_increment(Decimal("0.99")), Decimal("0.05"))
+        self.assertEqual(bidding.bid_increment(Decimal("10.00")), Decimal("0.50"))
+        self.assertEqual(bidding.bid_increment(Decimal("100.00")), Decimal("2.50"))
+        self.assertEqual(bidding.bid_increment(Decimal("9999.00")), Decimal("100.00"))
+
+    def test_lone_maximum_bids_one_increment(self):
+        result = bidding.place_max_bid(self.listing.id, self.alice, "50")
+        self.assertTrue(result.accepted)
+        self.assertEqual(result.amount, Decimal("10.50"))
+        self.assertListing("10.50", self.alice, 1)
+
+    def test_competing_maxima_write_only_the_result(self):
+        bidding.place_max_bid(self.listing.id, self.alice, "50")
+        result = bidding.place_max_bid(self.listing.id, self.bob, "30")
+        self.assertEqual(result.status, bidding.PROXY_OUTBID)
+        self.assertEqual(result.bid.amount, Decimal("30.00"))
+        # bob at his maximum, then alice one increment above it
+        self.assertEqual(
+            list(Bid.objects.order_by("pk").values_list("user__username", "amount")),
+            [("alice", Decimal("10.50")), ("bob", Decimal("30.00")), ("alice", Decimal("31.00"))],
+        )
+        self.assertListing("31.00", self.alice, 3)
+
+    def test_winner_is_capped_at_own_maximum(self):
+        bidding.place_max_bid(self.listing.id, self.alice, "30.20")
+        self.assertEqual(bidding.place_max_bid(self.listing.id, self.bob, "30.10").status, bidding.PROXY_OUTBID)
+        self.assertListing("30.20", self.alice, 3)
+
+    def test_tie_goes_to_earliest_maximum(self):
+        bidding.place_max_bid(self.listing.id, self.alice, "40")
+        result = bidding.place_max_bid(self.listing.id, self.bob, "40")
+        self.assertEqual(result.status, bidding.PROXY_OUTBID)
+        self.assertIsNone(result.bid)
+        self.assertListing("40.00", self.alice, 2)
+        self.assertEqual(bidding.refresh_bid_stats(), 1)
+        self.assertListing("40.00", self.alice, 2)
+
+    def test_tie_is_decided_by_placed_at_not_insertion(self):
+        now = timezone.now()
+        MaxBid.objects.create(listing=self.listing, user=self.bob, amount=Decimal("40"), placed_at=now)
+        MaxBid.objects.create(
+            listing=self.listing, user=self.alice, amount=Decimal("40"), placed_at=now - timezone.timedelta(seconds=1)
+        )
+        bidding.resolve_max_bids(self.listing.id, self.listing.current_bid, None, now)
+        self.assertListing("40.00", self.alice, 1)
+
+    def test_raising_a_maximum_loses_the_earlier_time(self):
+        bidding.place_max_bid(self.listing.id, self.alice, "20")
+        bidding.place_max_bid(self.listing.id, self.bob, "30")
+        bidding.place_max_bid(self.listing.id, self.alice, "30")
+        self.assertListing("30.00", self.bob, 4)
+
+    def test_plain_bid_is_answered_by_maximum(self):
+        bidding.place_max_bid(self.listing.id, self.alice, "50")
+        result = bidding.place_bid(self.listing.id, self.bob, "20")
+        self.assertEqual(result.status, bidding.PROXY_OUTBID)
+        self.assertEqual(result.amount, Decimal("20.50"))
+        self.assertListing("20.50", self.alice, 3)
+        # past every maximum: the plain bid stands
+        self.assertTrue(bidding.place_bid(self.listing.id, self.bob, "60").accepted)
+        self.assertListing("60.00", self.bob, 4)
+
+    def test_bids_above_every_maximum_skip_the_maxima(self):
+        carol = make_user("carol")
+        bidding.place_max_bid(self.listing.id, self.alice, "50")
+        bidding.place_max_bid(self.listing.id, self.bob, "30")
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.top_max_bid, Decimal("50.00"))
+        # Maxima written outside bidding are picked up by the repair
+        MaxBid.objects.create(listing=self.listing, user=carol, amount=Decimal("70"))
+        bidding.refresh_bid_stats()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.top_max_bid, Decimal("70.00"))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(bidding.place_bid(self.listing.id, self.bob, "80").accepted)
+        self.assertFalse([query for query in queries if "auctions_maxbid" in query["sql"]])
+
+    def test_refused_maxima_are_not_kept(self):
+        bidding.place_bid(self.listing.id, self.bob, "20")
+        self.assertEqual(bidding.place_max_bid(self.listing.id, self.alice, "20").status, bidding.OUTBID)
+        self.assertEqual(bidding.place_max_bid(self.listing.id, self.alice, "x").status, bidding.INVALID)
+        self.assertFalse(MaxBid.objects.exists())
+        bidding.place_max_bid(self.listing.id, self.alice, "30")
+        self.assertEqual(bidding.place_max_bid(self.listing.id, self.alice, "25").status, bidding.NOT_RAISED)
+        Listing.objects.filter(pk=self.listing.pk).update(is_active=False)
+        self.assertEqual(bidding.place_max_bid(self.listing.id, self.bob, "99").status, bidding.CLOSED)
+        self.assertFalse(MaxBid.objects.filter(user=self.bob).exists())
+        with self.assertRaises(Listing.DoesNotExist):
+            bidding.place_max_bid(self.listing.id + 100, self.bob, "99")
+
+    def test_view(self):
+        self.client.force_login(self.alice)
+        response = self.client.post(reverse("place_max_bid", args=[self.listing.id]), {"max_amount": "25"})
+        self.assertContains(response, bidding.MESSAGES[bidding.ACCEPTED])
+        self.assertListing("10.50", self.alice, 1)
+
+
+class ConcurrentBidTests(TransactionTestCase):
+
+    threads = 8
+    bids_per_thread = 25
+
+    def test_no_lost_bids_under_contention(self):
+        owner = make_user("owner")
+        bidders = [make_user(f"bidder{i}") for i in range(self.threads)]
+        listing = make_listing(owner, starting_bid=Decimal("1.00"))
+        accepted = []
+        crashes = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(self.threads)
+
+        def storm(index, user):
+            barrier.wait()
+            try:
+                for n in range(self.bids_per_thread):
+                    # Interleave amounts so threads keep outbidding each other
+                    amount = Decimal(2 + n * self.threads + index)
+                    while True:
+                        try:
+                            result = bidding.place_bid(listing.id, user, amount)
+                            break
+                        except OperationalError as exc:
+                            # Shared-cache test databases refuse instead of waiting
+                            if "locked" not in str(exc):
+                                raise
+                    if result.accepted:
+                        with lock:
+                            accepted.append(amount)
+            except Exception as exc:
+                # A thread's exception would only be printed, not fail the test
+                with lock:
+                    crashes.append(repr(exc))
+            finally:
+                close_old_connections()
+                connection.close()
+
+        workers = [
+            threading.Thread(target=storm, args=(i, user))
+            for i, user in enumerate(bidders)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(crashes, [])
+        listing.refresh_from_db()
+        self.assertTrue(accepted)
+        self.assertEqual(Bid.objects.filter(listing=listing).count(), len(accepted))
+        self.assertEqual(listing.current_bid, max(accepted))
+        # Accepted bids must be strictly increasing in commit order
+        amounts = list(Bid.objects.filter(listing=listing).order_by("id").values_list("amount", flat=True))
+        self.assertEqual(amounts, sorted(amounts))
+        self.assertEqual(len(set(amounts)), len(amounts))
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        owner = make_user("owner")
+        self.listings = [make_listing(owner, title=f"Item {i}", category="Toys") for i in range(7)]
+        # Force ties on created_at so the id tie-breaker is exercised
+        Listing.objects.filter(pk__in=[l.pk for l in self.listings[2:5]]).update(
+            created_at=self.listings[2].created_at
+        )
+
+    def test_pages_cover_every_row_once(self):
+        seen, cursor = [], None
+        while True:
+            page = keyset_paginate(feeds.active_listings(), cursor, page_size=3)
+            seen.extend(listing.pk for listing in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(sorted(seen), sorted(l.pk for l in self.listings))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_malformed_cursor_starts_from_the_beginning(self):
+        self.assertIsNone(decode_cursor("not-a-cursor"))
+        page = keyset_paginate(feeds.active_listings(), "not-a-cursor", page_size=3)
+        self.assertEqual(len(page), 3)
+
+    def test_cursor_round_trip(self):
+        listing = self.listings[0]
+        self.assertEqual(decode_cursor(encode_cursor(listing.created_at, listing.pk)), (listing.created_at, listing.pk))
+
+    @override_settings(AUCTIONS_PAGE_SIZE=2)
+    def test_views_render_one_page(self):
+        response = self.client.get(reverse("index"))
+        self.assertEqual(len(response.context["cards"]), 2)
+        self.assertContains(response, "Next page")
+        response = self.client.get(reverse("category_view", args=["Toys"]), {"page_size": 50})
+        self.assertEqual(len(response.context["cards"]), 7)
+        self.assertNotContains(response, "Next page")
+
+    def test_legacy_benchmark_baseline_renders_every_listing(self):
+        html = legacy_index()
+        self.assertEqual(html.count('class="list-group-item'), len(self.listings))
+        self.assertIn("Item 6", html)
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class QueryPlanTests(TestCase):
+    """
+        Guard the main query of each view against full table scans and
+        temporary sort b-trees. Fails if an index is dropped or a query
+        changes shape so that it no longer fits its index.
+    """
+
+    def setUp(self):
+        self.owner = make_user("owner")
+        self.listing = make_listing(self.owner, category="Toys")
+
+    def assertPlan(self, queryset, index=None, ordered=False):
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            self.assertIsNone(
+                re.search(r"\bSCAN (auctions_\w+)$", line.strip()),
+                f"Full table scan in plan:\n{plan}",
+            )
+        if index:
+            self.assertIn(index, plan)
+        if ordered:
+            self.assertNotIn("TEMP B-TREE", plan)
+        return plan
+
+    def test_index_feed(self):
+        queryset = feeds.active_listings().order_by("created_at", "id")
+        self.assertPlan(queryset[:21], "listing_active_created_idx", ordered=True)
+
+    def test_index_feed_after_cursor(self):
+        cursor = encode_cursor(self.listing.created_at, self.listing.pk)
+        queryset = after_cursor(feeds.active_listings(), cursor)
+        plan = self.assertPlan(queryset[:21], "listing_active_created_idx", ordered=True)
+        self.assertIn("created_at>?", plan)
+
+    def test_category_feed_after_cursor(self):
+        cursor = encode_cursor(self.listing.created_at, self.listing.pk)
+        queryset = after_cursor(feeds.category_listings("Toys"), cursor)
+        plan = self.assertPlan(queryset[:21], "listing_cat_active_created_idx", ordered=True)
+        self.assertIn("created_at>?", plan)
+
+    def test_category_feed(self):
+        queryset = feeds.category_listings("Toys").order_by("created_at", "id")
+        self.assertPlan(queryset[:21], "listing_cat_active_created_idx", ordered=True)
+
+    def test_auction_detail_listing(self):
+        plan = self.assertPlan(Listing.objects.filter(id=self.listing.id))
+        self.assertIn("INTEGER PRIMARY KEY", plan)
+
+    def test_auction_detail_winning_bid(self):
+        queryset = Bid.objects.filter(listing=self.listing).order_by("-amount")[:1]
+        self.assertPlan(queryset, "bid_listing_amount_idx", ordered=True)
+
+    def test_auction_detail_comments(self):
+        self.assertPlan(self.listing.comments.all())
+
+    def test_comment_page_after_cursor(self):
+        comment = Comment.objects.create(listing=self.listing, user=self.owner, content="First")
+        queryset = after_cursor(comments.listing_comments(self.listing.id), encode_cursor(comment.created_at, comment.pk), True)
+        plan = self.assertPlan(queryset[:21], "comment_listing_created_idx", ordered=True)
+        self.assertIn("created_at<?", plan)
+
+    def test_expiry_sweep(self):
+        queryset = expiry.expired_listings().order_by("end_date").values_list("id", flat=True)[:1000]
+        self.assertPlan(queryset, "listing_active_end_idx", ordered=True)
+
+    def test_watchlist(self):
+        self.assertPlan(Watchlist.objects.filter(user=self.owner))
+
+    def test_watchlist_get_or_create_lookup(self):
+        queryset = Watchlist.objects.filter(user=self.owner, listing=self.listing)
+        self.assertPlan(queryset, "(user_id=? AND listing_id=?)")
+
+    def test_category_price_range(self):
+        for order in ("current_bid", "-current_bid"):
+            queryset = Listing.objects.filter(category="Toys", is_active=True).order_by(order).values("current_bid")[:1]
+            self.assertPlan(queryset, "listing_cat_active_price_idx", ordered=True)
+
+
+class ExpirySweepTests(TestCase):
+
+    def setUp(self):
+        self.owner = make_user("owner")
+        self.bidder = make_user("bidder")
+        past = timezone.now() - timezone.timedelta(hours=1)
+        self.with_bids = make_listing(self.owner)
+        self.without_bids = make_listing(self.owner, end_date=past)
+        self.running = make_listing(self.owner)
+        bidding.place_bid(self.with_bids.id, self.bidder, "15")
+        bidding.place_bid(self.with_bids.id, self.bidder, "20")
+        # Bids are only taken until the end_date
+        Listing.objects.filter(pk=self.with_bids.pk).update(end_date=past)
+
+    def test_closes_expired_listings_with_top_bid(self):
+        self.assertEqual(expiry.close_expired_listings(batch_size=1), 2)
+        self.with_bids.refresh_from_db()
+        self.without_bids.refresh_from_db()
+        self.running.refresh_from_db()
+        self.assertFalse(self.with_bids.is_active)
+        self.assertEqual(self.with_bids.won_price, Decimal("20.00"))
+        self.assertFalse(self.without_bids.is_active)
+        self.assertEqual(self.without_bids.won_price, Decimal("0.00"))
+        self.assertTrue(self.running.is_active)
+
+    def test_is_idempotent(self):
+        expiry.close_expired_listings()
+        self.assertEqual(expiry.close_expired_listings(), 0)
+
+
+class EventBrokerTests(SimpleTestCase):
+
+    async def test_fan_out_to_channel_subscribers(self):
+        broker = events.InMemoryBroker(buffer_size=2)
+        first = broker.subscribe("listing:1")
+        second = broker.subscribe("listing:1")
+        other = broker.subscribe("listing:2")
+        self.assertEqual(broker.publish("listing:1", "a"), 2)
+        self.assertEqual(await first.get(timeout=1), "a")
+        self.assertEqual(await second.get(timeout=1), "a")
+        self.assertIsNone(await other.get(timeout=0.01))
+        for subscription in (first, second, other):
+            subscription.close()
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    async def test_slow_subscriber_keeps_only_latest_events(self):
+        broker = events.InMemoryBroker(buffer_size=2)
+        subscription = broker.subscribe("listing:1")
+        for message in ("a", "b", "c"):
+            broker.publish("listing:1", message)
+        self.assertEqual(await subscription.get(timeout=1), "b")
+        self.assertEqual(await subscription.get(timeout=1), "c")
+
+    def test_stream_is_refused_under_wsgi(self):
+        response = self.client.get(reverse("listing_events", args=[1]))
+        self.assertEqual(response.status_code, 204)
+
+
+@skipUnless(connection.vendor == "sqlite", "FTS5 index is SQLite specific")
+class SearchTests(TestCase):
+
+    def setUp(self):
+        owner = make_user("owner")
+        self.camera = make_listing(owner, title="Vintage camera", description="Film body", category="Electronics")
+        self.lens = make_listing(owner, title="Zoom lens", description="Fits any vintage camera", category="Electronics")
+        self.jacket = make_listing(owner, title="Leather jacket", category="Fashion")
+
+    def ids(self, query, **kwargs):
+        return [listing.id for listing in search.search_listings(query, **kwargs)]
+
+    @skipUnless(connection.vendor == "sqlite", "The index is SQLite specific")
+    def test_migrations_leave_the_index_triggers_in_place(self):
+        self.assertEqual(search.check_fts_triggers(databases=["default"]), [])
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER auctions_listing_fts_update")
+        [error] = search.check_fts_triggers(databases=["default"])
+        self.assertEqual(error.id, "auctions.E003")
+        self.assertIn("auctions_listing_fts_update", error.msg)
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.ids("camera"), [self.camera.id, self.lens.id])
+
+    def test_prefix_and_all_terms_required(self):
+        self.assertEqual(self.ids("leath"), [self.jacket.id])
+        self.assertEqual(self.ids("vintage jacket"), [])
+
+    def test_filters(self):
+        self.assertEqual(self.ids("camera", category="Fashion"), [])
+        bidding.close_listing(self.camera.id, self.camera.owner)
+        self.assertEqual(self.ids("camera"), [self.lens.id])
+        self.assertEqual(self.ids("camera", status=search.CLOSED), [self.camera.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        Listing.objects.filter(pk=self.jacket.pk).update(title="Wool coat")
+        self.assertEqual(self.ids("jacket"), [])
+        self.assertEqual(self.ids("wool"), [self.jacket.id])
+        self.jacket.delete()
+        self.assertEqual(self.ids("wool"), [])
+
+    def test_fts_syntax_is_escaped(self):
+        self.assertEqual(self.ids('camera" OR "jacket'), [])
+        self.assertEqual(self.ids("NEAR(camera"), [])
+        self.assertEqual(self.ids("camera*"), [self.camera.id, self.lens.id])
+
+    def test_pagination_and_view(self):
+        page = search.search_listings("camera", page_size=1)
+        self.assertTrue(page.has_next)
+        self.assertEqual(len(search.search_listings("camera", page=2, page_size=1)), 1)
+        response = self.client.get(reverse("search"), {"q": "camera"})
+        self.assertContains(response, "Vintage camera")
+
+
+class ImportExportTests(TestCase):
+
+    def setUp(self):
+        self.owner = make_user("owner")
+        self.bidder = make_user("bidder")
+
+    def run_import(self, kind, text, format="jsonl"):
+        stdin = io.StringIO(text)
+        records = transfer.read_records(stdin, format)
+        return transfer.import_records(kind, records, batch_size=2)
+
+    def test_listing_import_applies_save_defaults(self):
+        report = self.run_import("listings", (
+            '{"id": 50, "title": "Lamp", "starting_bid": "5.00", "owner": "owner", '
+            '"created_at": "2025-01-01T00:00:00+00:00"}\n'
+            '{"title": "Ghost", "starting_bid": "1", "owner": "nobody"}\n'
+            'not json\n'
+        ))
+        self.assertEqual((report.created, report.skipped), (1, 2))
+        listing = Listing.objects.get(pk=50)
+        self.assertEqual(listing.current_bid, Decimal("5.00"))
+        self.assertEqual(listing.image_url, "https://placehold.co/600x400")
+        self.assertIsNotNone(listing.end_date)
+        self.assertEqual(listing.created_at.year, 2025)
+
+    def test_bids_and_comments_round_trip_through_csv(self):
+        listing = make_listing(self.owner)
+        bidding.place_bid(listing.id, self.bidder, "12")
+        Comment.objects.create(listing=listing, user=self.bidder, content="Nice, really")
+        exported = {}
+        for kind in ("bids", "comments"):
+            stream = io.StringIO()
+            transfer.write_records(kind, transfer.export_rows(kind), stream, "csv")
+            exported[kind] = stream.getvalue()
+        Bid.objects.all().delete()
+        Comment.objects.all().delete()
+
+        self.assertEqual(self.run_import("bids", exported["bids"], "csv").created, 1)
+        self.assertEqual(self.run_import("comments", exported["comments"], "csv").created, 1)
+        self.assertEqual(Bid.objects.get().amount, Decimal("12.00"))
+        self.assertEqual(Comment.objects.get().content, "Nice, really")
+
+    def test_imported_bids_keep_their_timestamps(self):
+        listing = make_listing(self.owner)
+        self.run_import("bids", (
+            f'{{"listing": {listing.id}, "user": "bidder", "amount": "11", "created_at": "2025-01-01T00:00:00+00:00"}}\n'
+            f'{{"listing": {listing.id}, "user": "bidder", "amount": "12"}}\n'
+        ))
+        self.assertEqual(
+            [bid.created_at.year for bid in Bid.objects.order_by("amount")],
+            [2025, timezone.now().year],
+        )
+
+    def test_unknown_listing_is_skipped(self):
+        report = self.run_import("bids", '{"listing": 999, "user": "bidder", "amount": "3"}\n')
+        self.assertEqual((report.created, report.skipped), (0, 1))
+
+    def test_import_command_refreshes_bid_stats(self):
+        listing = make_listing(self.owner)
+        path = self.tmp_file(f'{{"listing": {listing.id}, "user": "bidder", "amount": "30"}}\n')
+        call_command("import_auctions", "bids", path, stdout=io.StringIO())
+        listing.refresh_from_db()
+        self.assertEqual((listing.bid_count, listing.current_bid), (1, Decimal("30.00")))
+
+    def tmp_file(self, content):
+        handle = tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False)
+        self.addCleanup(os.remove, handle.name)
+        with handle:
+            handle.write(content)
+        return handle.name
+
+
+class LoadTestTests(TestCase):
+
+    def test_every_url_has_a_scenario(self):
+        self.assertEqual({scenario.name for scenario in runner.SCENARIOS}, runner.url_names())
+
+    def test_staff_only_views_are_loaded_as_staff(self):
+        scenario = next(scenario for scenario in runner.SCENARIOS if scenario.name == "cache_stats")
+        self.assertTrue(scenario.staff)
+        self.client.force_login(runner.staff_user())
+        path, data = scenario.build(None)
+        self.assertEqual(self.client.get(path, data).status_code, 200)
+
+    def test_percentiles_and_regressions(self):
+        report = runner.summarize([(n / 1000, 3, n == 100) for n in range(1, 101)], 1.0)
+        self.assertEqual(report["latency_ms"]["p50"], 50.0)
+        self.assertEqual(report["latency_ms"]["p99"], 99.0)
+        self.assertEqual((report["errors"], report["throughput_rps"]), (1, 100.0))
+
+        slower = dict(report, latency_ms=dict(report["latency_ms"], p95=report["latency_ms"]["p95"] * 2))
+        comparison = runner.compare({"index": slower}, {"results": {"index": report}})
+        self.assertEqual(comparison["index"]["regressions"], ["p95"])
+
+
+@override_settings(AUCTIONS_PROFILING_SAMPLE_RATE=1)
+class ProfilingTests(TestCase):
+
+    def test_server_timing_header_and_log_line(self):
+        make_listing(make_user("seller"))
+        with self.assertLogs("auctions.profiling", "INFO") as logs:
+            response = self.client.get(reverse("index"))
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", tmpl;dur=[\d.]+, total;dur=[\d.]+$')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record["view"], record["status"]), ("index", 200))
+        self.assertGreater(record["queries"], 0)
+        self.assertGreater(record["template_ms"], 0)
+        self.assertLessEqual(len(record["slowest"]), 5)
+
+    @override_settings(AUCTIONS_PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_untouched(self):
+        self.assertNotIn("Server-Timing", self.client.get(reverse("index")))
+
+    def test_repeated_sql_with_different_parameters_is_n_plus_one(self):
+        profile = profiling.RequestProfile()
+        token = profiling._current.set(profile)
+        try:
+            owner = make_user("seller")
+            for n in range(5):
+                Listing.objects.filter(pk=n).first()
+            for n in range(5):
+                User.objects.filter(pk=owner.pk).first()
+        finally:
+            profiling._current.reset(token)
+        repeated = profile.repeated(5)
+        self.assertEqual(len(repeated), 1)
+        self.assertIn("auctions_listing", repeated[0]["sql"])
+        self.assertEqual(repeated[0]["count"], 5)
+
+
+class FragmentCacheTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        caching.reset_stats()
+        self.owner = make_user("seller")
+        self.bidder = make_user("bidder")
+        self.listing = make_listing(self.owner)
+
+    def test_cards_are_reused_until_a_bid(self):
+        self.assertContains(self.client.get(reverse("index")), "(0 bids)")
+        with self.assertNumQueries(1):  # the page of ids; the card is cached
+            self.assertContains(self.client.get(reverse("index")), "(0 bids)")
+        self.assertEqual(caching.stats()["index"], {"hits": 1, "misses": 1, "hit_rate": 0.5})
+
+        # The version is bumped once the bid is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            bidding.place_bid(self.listing.id, self.bidder, "11")
+        self.assertContains(self.client.get(reverse("index")), "(1 bid)")
+
+    def test_detail_sections_are_invalidated_by_comments_and_close(self):
+        url = reverse("auction_detail", args=[self.listing.id])
+        self.client.get(url)
+        with self.assertNumQueries(1):  # listing with owner and winner; no comments query
+            self.client.get(url)
+
+        self.client.force_login(self.bidder)
+        self.client.post(reverse("add_comment", args=[self.listing.id]), {"comment_content": "Still there?"})
+        self.assertContains(self.client.get(url), "Still there?")
+
+        bidding.close_listing(self.listing.id, self.owner)
+        self.assertContains(self.client.get(url), "Auction closed. No bids were placed.")
+
+    def test_new_listing_with_reused_id_is_not_served_stale(self):
+        self.client.get(reverse("auction_detail", args=[self.listing.id]))
+        pk = self.listing.id
+        self.listing.delete()
+        make_listing(self.owner, id=pk, title="Replacement")
+        self.assertContains(self.client.get(reverse("auction_detail", args=[pk])), "Replacement")
+
+
+class WatchlistTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.owner = make_user("seller")
+        self.user = make_user("watcher")
+        self.client.force_login(self.user)
+
+    def watch(self, count):
+        for _ in range(count):
+            Watchlist.objects.create(user=self.user, listing=make_listing(self.owner))
+
+    def test_page_query_count_does_not_grow_with_items(self):
+        self.watch(2)
+        # user, one page of items with their listings, category facets; the
+        # session is read from the cache, and so is the user the next time
+        with self.assertNumQueries(3):
+            self.client.get(reverse("watchlist"))
+        self.watch(5)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("watchlist"))
+        self.assertEqual(len(response.context["watchlist"]), 7)
+
+    @override_settings(AUCTIONS_PAGE_SIZE=2)
+    def test_pages_are_newest_first(self):
+        self.watch(3)
+        newest = list(Watchlist.objects.order_by("-id").values_list("listing__title", "listing_id"))
+        response = self.client.get(reverse("watchlist"))
+        self.assertEqual([item.listing_id for item in response.context["watchlist"]], [pk for _, pk in newest[:2]])
+        response = self.client.get(reverse("watchlist"), {"after": response.context["page"].next_cursor})
+        self.assertEqual([item.listing_id for item in response.context["watchlist"]], [newest[2][1]])
+
+    def test_watched_ids_are_cached_until_the_watchlist_changes(self):
+        listing = make_listing(self.owner)
+        url = reverse("auction_detail", args=[listing.id])
+        self.assertFalse(self.client.get(url).context["is_watched"])
+
+        self.client.get(reverse("add_to_watchlist", args=[listing.id]))
+        self.assertTrue(self.client.get(url).context["is_watched"])
+        with self.assertNumQueries(0):
+            self.assertEqual(caching.watched_ids(self.user), {listing.id})
+        self.assertContains(self.client.get(reverse("index")), "Watching")
+
+        self.client.get(reverse("remove_from_watchlist", args=[listing.id]))
+        self.assertFalse(self.client.get(url).context["is_watched"])
+
+
+class CategoryFacetTests(TestCase):
+
+    def setUp(self):
+        self.owner = make_user("seller")
+        self.bidder = make_user("bidder")
+
+    def facet(self, category):
+        facet = CategoryFacet.objects.get(category=category)
+        return facet.active_count, facet.min_price, facet.max_price
+
+    def test_facets_follow_creates_bids_and_closes(self):
+        cheap = make_listing(self.owner, category="Toys", starting_bid=Decimal("5"))
+        make_listing(self.owner, category="Toys", starting_bid=Decimal("20"))
+        self.assertEqual(self.facet("Toys"), (2, Decimal("5.00"), Decimal("20.00")))
+
+        # Bids leave the facets to the next sweep
+        bidding.place_bid(cheap.id, self.bidder, "30")
+        self.assertEqual(self.facet("Toys"), (2, Decimal("5.00"), Decimal("20.00")))
+        self.assertEqual(expiry.close_expired_listings(), 0)
+        self.assertEqual(self.facet("Toys"), (2, Decimal("20.00"), Decimal("30.00")))
+        self.assertEqual(facets.refresh_prices(), 0)
+
+        bidding.close_listing(cheap.id, self.owner)
+        self.assertEqual(self.facet("Toys"), (1, Decimal("20.00"), Decimal("20.00")))
+
+        expiring = make_listing(self.owner, category="Home", end_date=timezone.now() - timezone.timedelta(days=1))
+        self.assertEqual(self.facet("Home")[0], 1)
+        expiry.close_expired_listings()
+        self.assertEqual(self.facet("Home"), (0, None, None))
+
+        expiring.delete()
+        facets.rebuild()
+        self.assertEqual(self.facet("Toys"), (1, Decimal("20.00"), Decimal("20.00")))
+        self.assertEqual(self.facet("Home"), (0, None, None))
+
+    def test_a_bid_writes_no_facet_row(self):
+        cheap = make_listing(self.owner, category="Toys", starting_bid=Decimal("5"))
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            bidding.place_bid(cheap.id, self.bidder, "6")
+        self.assertFalse([query for query in queries if "auctions_categoryfacet" in query["sql"]])
+        self.assertEqual(self.facet("Toys"), (1, Decimal("5.00"), Decimal("5.00")))
+
+    def test_edits_through_save_move_the_counts(self):
+        listing = make_listing(self.owner, category="Toys")
+        listing = Listing.objects.get(pk=listing.pk)
+        listing.category = "Home"
+        listing.save()
+        self.assertEqual((self.facet("Toys")[0], self.facet("Home")[0]), (0, 1))
+        listing.is_active = False
+        listing.save()
+        self.assertEqual(self.facet("Home"), (0, None, None))
+        listing.save()
+        self.assertEqual(self.facet("Home")[0], 0)
+        listing.is_active = True
+        listing.save()
+        self.assertEqual(self.facet("Home")[0], 1)
+
+    def test_navigation_hides_empty_categories(self):
+        make_listing(self.owner, category="Toys")
+        make_listing(self.owner, category="Sports", is_active=False)
+        response = self.client.get(reverse("category_view", args=["Toys"]))
+        self.assertContains(response, "Toys (1)")
+        self.assertNotContains(response, "Sports (")
+
+
+@override_settings(AUCTIONS_PAGE_SIZE=2)
+class CommentPageTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.owner = make_user("seller")
+        self.listing = make_listing(self.owner)
+        self.comments = [
+            Comment.objects.create(listing=self.listing, user=make_user(f"user{n}"), content=f"Comment {n}")
+            for n in range(5)
+        ]
+
+    def test_json_pages_are_newest_first_with_one_query_each(self):
+        url = reverse("listing_comments", args=[self.listing.id])
+        seen = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(1):
+                data = self.client.get(url, {"after": cursor} if cursor else {}).json()
+            seen += [(comment["user"], comment["content"]) for comment in data["comments"]]
+            cursor = data["next"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [(f"user{n}", f"Comment {n}") for n in reversed(range(5))])
+
+    def test_detail_page_renders_only_the_first_page(self):
+        response = self.client.get(reverse("auction_detail", args=[self.listing.id]))
+        self.assertContains(response, "Comment 4")
+        self.assertContains(response, "Comment 3")
+        self.assertNotContains(response, "Comment 2")
+        self.assertContains(response, 'id="more-comments"')
+
+
+class ApiTests(TestCase):
+
+    def setUp(self):
+        self.owner = make_user("seller")
+        self.bidder = make_user("bidder")
+        self.listing = make_listing(self.owner, category="Toys")
+
+    def test_detail_answers_304_with_only_the_validator_query(self):
+        url = reverse("api_listing", args=[self.listing.id])
+        response = self.client.get(url)
+        self.assertEqual(response.json()["owner"], "seller")
+        self.assertIn("Last-Modified", response)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_after_a_bid(self):
+        url = reverse("api_listing", args=[self.listing.id])
+        etag = self.client.get(url)["ETag"]
+        bidding.place_bid(self.listing.id, self.bidder, Decimal("12.00"))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["high_bidder"], "bidder")
+
+    def test_feed_etag_changes_when_a_listing_closes(self):
+        url = reverse("api_listings")
+        response = self.client.get(url)
+        self.assertEqual([row["id"] for row in response.json()["listings"]], [self.listing.id])
+        bidding.close_listing(self.listing.id, self.owner)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["listings"], [])
+
+    def test_bids_are_streamed_highest_first(self):
+        for amount in ("11.00", "15.00", "20.00"):
+            bidding.place_bid(self.listing.id, self.bidder, Decimal(amount))
+        response = self.client.get(reverse("api_listing_bids", args=[self.listing.id]))
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([bid["amount"] for bid in data["bids"]], ["20.00", "15.00", "11.00"])
+
+    def test_bids_filling_whole_stream_batches_are_valid_json(self):
+        Bid.objects.bulk_create([
+            Bid(listing=self.listing, user=self.bidder, amount=Decimal(11 + n))
+            for n in range(api.STREAM_BATCH)
+        ])
+        response = self.client.get(reverse("api_listing_bids", args=[self.listing.id]))
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(len(data["bids"]), api.STREAM_BATCH)
+        self.assertEqual(data["bids"][0]["amount"], f"{10 + api.STREAM_BATCH}.00")
+
+    def test_unknown_listing_is_a_json_404(self):
+        response = self.client.get(reverse("api_listing", args=[9999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("error", response.json())
+
+
+class StaticAssetTests(SimpleTestCase):
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        override = self.settings(STATIC_ROOT=root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+        self.root = root.name
+        self.css = staticfiles_storage.url("admin/css/base.css")
+
+    def test_collected_names_are_hashed_with_compressed_siblings(self):
+        self.assertRegex(self.css, r"/static/admin/css/base\.[0-9a-f]{12}\.css$")
+        hashed = os.path.join(self.root, self.css[len("/static/"):])
+        with open(hashed, "rb") as original, gzip.open(hashed + ".gz") as compressed:
+            self.assertEqual(compressed.read(), original.read())
+
+    def test_hashed_files_are_immutable_and_served_compressed(self):
+        response = self.client.get(self.css, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Cache-Control"], assets.IMMUTABLE)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        b"".join(response.streaming_content)
+        response.close()
+        response = self.client.get(self.css, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_source_names_get_a_short_lifetime(self):
+        response = self.client.get("/static/admin/css/base.css")
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+        self.assertNotIn("Content-Encoding", response)
+        response.close()
+
+    def test_layout_loads_the_vendored_builds_and_nothing_from_other_hosts(self):
+        with open(os.path.join(os.path.dirname(__file__), "templates", "auctions", "layout.html")) as layout:
+            html = layout.read()
+        self.assertNotRegex(html, r"(?:src|href)=\"(?:https?:)?//")
+        vendored = re.findall(r"\{% static 'auctions/vendor/([^']+)' %\}", html)
+        self.assertEqual(sorted(vendored), sorted(name for _, name, _ in assets.VENDOR))
+
+    def test_missing_vendored_files_are_reported(self):
+        self.addCleanup(setattr, assets, "VENDOR", assets.VENDOR)
+        assets.VENDOR = [*assets.VENDOR, ("https://example.com/missing.js", "missing.js", "")]
+        [warning] = assets.check_vendored()
+        self.assertEqual(warning.id, "auctions.W001")
+        self.assertIn("missing.js", warning.msg)
+
+    def test_source_map_comments_are_stripped(self):
+        self.assertEqual(assets.strip_source_map(b"x=1;\n//# sourceMappingURL=x.min.js.map\n"), b"x=1;\n")
+        self.assertEqual(assets.strip_source_map(b"a{}\n/*# sourceMappingURL=a.css.map */"), b"a{}\n")
+
+
+@override_settings(AUCTIONS_THUMBNAIL_WORKERS=0)
+class ListingImageTests(TestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = self.settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.owner = make_user("seller")
+        self.client.force_login(self.owner)
+
+    def create(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse("create_auction"), {
+                "title": "Lamp", "description": "Brass", "starting_bid": "10.00",
+                "end_date": "2099-01-01T00:00", "category": "Home", "image_upload": upload,
+            })
+
+    def test_cards_offer_the_thumbnails_through_srcset(self):
+        make_listing(self.owner, image="listings/lamp.jpg", thumbnails=[250, 300, 500])
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, 'src="/media/thumbs/listings/lamp-300w.webp"')
+        self.assertContains(
+            response,
+            'srcset="/media/thumbs/listings/lamp-250w.webp 250w, /media/thumbs/listings/lamp-300w.webp 300w, '
+            '/media/thumbs/listings/lamp-500w.webp 500w" sizes="300px"',
+        )
+
+    def test_a_file_that_is_not_an_image_is_refused(self):
+        response = self.create(SimpleUploadedFile("lamp.jpg", b"not an image"))
+        self.assertContains(response, "alert-danger")
+        self.assertFalse(Listing.objects.exists())
+
+    @skipUnless(images.Image, "Pillow is not installed")
+    def test_upload_gets_thumbnails_no_wider_than_itself(self):
+        buffer = io.BytesIO()
+        images.Image.new("RGB", (700, 350), "orange").save(buffer, "PNG")
+        self.create(SimpleUploadedFile("lamp.png", buffer.getvalue(), content_type="image/png"))
+        listing = Listing.objects.get()
+        self.assertEqual(listing.thumbnails, [250, 300, 500, 540, 600])
+        with default_storage.open(thumbnail_name(listing.image.name, 300)) as thumbnail:
+            self.assertEqual(images.Image.open(thumbnail).size, (300, 150))
+
+
+@override_settings(AUCTIONS_SESSION_WRITE_INTERVAL=3600)
+class CachedSessionTests(TestCase):
+
+    def setUp(self):
+        user_cache().clear()
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        self.addCleanup(sessions.flush)
+
+    def stored(self, session_key):
+        row = Session.objects.filter(session_key=session_key).first()
+        return row and row.get_decoded()
+
+    def test_changes_reach_the_database_when_flushed(self):
+        store = sessions.SessionStore()
+        store["step"] = 1
+        store.create()
+        store.save()
+        self.assertEqual(self.stored(store.session_key), {"step": 1})
+        store["step"] = 2
+        with self.assertNumQueries(0):
+            store.save()
+        self.assertEqual(self.stored(store.session_key), {"step": 1})
+        # Evicted from the cache: the queued change is still seen
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        self.assertEqual(sessions.SessionStore(store.session_key)["step"], 2)
+        self.assertEqual(sessions.flush(), 1)
+        self.assertEqual(self.stored(store.session_key), {"step": 2})
+
+    def test_deleted_session_is_not_written_back(self):
+        store = sessions.SessionStore()
+        store.create()
+        store["step"] = 2
+        store.save()
+        store.delete()
+        self.assertEqual(sessions.flush(), 0)
+        self.assertIsNone(self.stored(store.session_key))
+
+    def test_user_is_cached_until_saved(self):
+        user = make_user("bidder")
+        backend = CachedModelBackend()
+        with self.assertNumQueries(1):
+            backend.get_user(user.pk)
+        with self.assertNumQueries(0):
+            backend.get_user(user.pk)
+        user.set_password("changed")
+        user.save()
+        with self.assertNumQueries(1):
+            self.assertTrue(backend.get_user(user.pk).check_password("changed"))
+
+    def test_cached_user_leaves_its_password_out(self):
+        user = make_user("bidder")
+        user.set_password("secret")
+        user.save()
+        backend = CachedModelBackend()
+        backend.get_user(user.pk)
+        self.assertNotIn(user.password, repr(user_cache().get(f"user:{user.pk}:object")))
+        self.assertIsNot(user_cache(), caching.get_cache())
+        cached = backend.get_user(user.pk)
+        self.assertEqual(cached.get_session_auth_hash(), user.get_session_auth_hash())
+        cached.email = "bidder@example.org"
+        cached.save()
+        self.assertTrue(User.objects.get(pk=user.pk).check_password("secret"))
+        self.client.force_login(user)
+        self.client.get(reverse("watchlist"))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse("watchlist")).status_code, 200)
+        self.assertFalse([query for query in queries if 'FROM "auctions_user"' in query["sql"]])
+
+    def test_password_change_logs_other_sessions_out(self):
+        user = make_user("bidder")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse("watchlist")).status_code, 200)
+        user.set_password("changed")
+        user.save()
+        self.assertEqual(self.client.get(reverse("watchlist")).status_code, 302)
+
+
+@skipUnless(connection.vendor == "sqlite", "Pragmas are SQLite specific")
+class DatabaseProfileTests(SimpleTestCase):
+
+    def open(self, profile):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        default = connections["default"]
+        wrapper = default.__class__({**default.settings_dict, "NAME": os.path.join(directory.name, "db.sqlite3")})
+        self.addCleanup(wrapper.close)
+        with override_settings(AUCTIONS_DB_PROFILE=profile):
+            wrapper.ensure_connection()
+        return wrapper.connection
+
+    def test_wal_profile_sets_its_pragmas_on_connect(self):
+        raw = self.open("sqlite-wal")
+        self.assertEqual(raw.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(raw.execute("PRAGMA synchronous").fetchone()[0], 1)
+        self.assertEqual(raw.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+
+    def test_plain_profile_keeps_the_rollback_journal(self):
+        raw = self.open("sqlite")
+        self.assertEqual(raw.execute("PRAGMA journal_mode").fetchone()[0], "delete")
+
+    def test_pgbouncer_check_requires_transaction_pooling_safe_settings(self):
+        postgres = {"ENGINE": "django.db.backends.postgresql"}
+        errors = db.pgbouncer_errors({"default": postgres, "other": {"ENGINE": "django.db.backends.sqlite3"}})
+        self.assertIn("auctions.E001", [error.id for error in errors])
+        safe = {**postgres, "DISABLE_SERVER_SIDE_CURSORS": True, "OPTIONS": {"prepare_threshold": None}}
+        self.assertEqual(db.pgbouncer_errors({"default": safe}), [])
+
+
+class RouterTests(SimpleTestCase):
+
+    @override_settings(AUCTIONS_DB_REPLICAS=["replica1"])
+    def test_reads_go_to_a_replica_until_something_is_written(self):
+        router = routing.PrimaryReplicaRouter()
+
+        def check():
+            self.assertEqual(router.db_for_read(Listing), "replica1")
+            with routing.primary_reads():
+                self.assertEqual(router.db_for_read(Listing), "default")
+            self.assertEqual(router.db_for_read(Session), "default")
+            self.assertEqual(router.db_for_write(Session), "default")
+            self.assertEqual(router.db_for_read(Listing), "replica1")
+            self.assertEqual(router.db_for_write(Bid), "default")
+            self.assertEqual(router.db_for_read(Listing), "default")
+
+        # A fresh context, as in a new thread
+        contextvars.Context().run(check)
+
+
+# The primary stands in for its own replica: only the pinning is checked
+@override_settings(AUCTIONS_DB_REPLICAS=["default"])
+class PrimaryPinningTests(TestCase):
+
+    def setUp(self):
+        self.owner = make_user("seller")
+        self.listing = make_listing(self.owner)
+        self.client.force_login(make_user("bidder"))
+
+    def test_a_request_that_writes_pins_the_browser_to_the_primary(self):
+        response = self.client.post(reverse("place_bid", args=[self.listing.id]), {"bid_amount": "12"})
+        self.assertEqual(response.cookies[routing.PIN_COOKIE]["max-age"], 5)
+
+    def test_reading_requests_set_no_pin(self):
+        response = self.client.get(reverse("auction_detail", args=[self.listing.id]))
+        self.assertNotIn(routing.PIN_COOKIE, response.cookies)
+
+    def test_session_writes_set_no_pin(self):
+        response = self.client.get(reverse("logout"))
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn(routing.PIN_COOKIE, response.cookies)
+
+
+@skipUnless(connection.vendor == "sqlite", "The replica stand-in copies SQLite files")
+class ReplicaCopyTests(TransactionTestCase):
+
+    def test_copy_has_the_committed_rows(self):
+        make_listing(make_user("seller"))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "replica.sqlite3")
+            routing.copy_sqlite(path)
+            copy = sqlite3.connect(path)
+            try:
+                self.assertEqual(copy.execute("SELECT COUNT(*) FROM auctions_listing").fetchone()[0], 1)
+            finally:
+                copy.close()
+
+
+@override_settings(AUCTIONS_RATE_LIMITS={
+    "place_bid": [{"key": "user", "rate": "1/m", "burst": 2}, {"key": "listing", "rate": "1/m", "burst": 3}],
+    "login": [{"key": "ip", "rate": "1/h", "burst": 3}, {"key": "username", "rate": "1/h", "burst": 1}],
+})
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        ratelimit.get_backend().clear()
+        self.addCleanup(ratelimit.get_backend().clear)
+        self.listing = make_listing(make_user("seller"))
+        self.bidder = make_user("bidder")
+        self.client.force_login(self.bidder)
+
+    def bid(self, client, amount):
+        return client.post(reverse("place_bid", args=[self.listing.id]), {"bid_amount": amount})
+
+    def test_bucket_refills_at_its_rate(self):
+        refilled_at, wait = ratelimit.take_token(None, 100.0, 10.0, 2)
+        self.assertEqual((refilled_at, wait), (110.0, 0.0))
+        refilled_at, wait = ratelimit.take_token(refilled_at, 100.0, 10.0, 2)
+        self.assertEqual((refilled_at, wait), (120.0, 0.0))
+        self.assertEqual(ratelimit.take_token(refilled_at, 100.0, 10.0, 2), (120.0, 10.0))
+        self.assertEqual(ratelimit.take_token(refilled_at, 110.0, 10.0, 2), (130.0, 0.0))
+
+    def test_throttled_bid_is_refused_without_a_query(self):
+        self.assertEqual(self.bid(self.client, "11").status_code, 200)
+        self.assertEqual(self.bid(self.client, "12").status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.bid(self.client, "13")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+        self.assertEqual(Bid.objects.count(), 2)
+
+    def test_listing_bucket_is_shared_by_every_bidder(self):
+        self.bid(self.client, "11")
+        self.bid(self.client, "12")
+        other = self.client_class()
+        other.force_login(make_user("other"))
+        self.assertEqual(self.bid(other, "13").status_code, 200)
+        self.assertEqual(self.bid(other, "14").status_code, 429)
+
+    def test_only_login_attempts_are_limited(self):
+        credentials = {"username": "bidder", "password": "wrong"}
+        self.assertEqual(self.client.post(reverse("login"), credentials).status_code, 200)
+        self.assertEqual(self.client.post(reverse("login"), credentials).status_code, 429)
+        self.assertEqual(self.client.get(reverse("login")).status_code, 200)
+
+    def test_login_attempts_on_one_username_are_limited_per_address(self):
+        login = reverse("login")
+        credentials = {"username": "bidder", "password": "wrong"}
+        self.assertEqual(self.client.post(login, credentials, REMOTE_ADDR="10.0.0.1").status_code, 200)
+        self.assertEqual(self.client.post(login, dict(credentials, username=" Bidder"), REMOTE_ADDR="10.0.0.1").status_code, 429)
+        self.assertEqual(self.client.post(login, dict(credentials, username="seller"), REMOTE_ADDR="10.0.0.1").status_code, 200)
+
+    def test_flooding_a_username_does_not_lock_its_owner_out(self):
+        login = reverse("login")
+        for _ in range(3):
+            self.client.post(login, {"username": "bidder", "password": "wrong"}, REMOTE_ADDR="10.0.0.1")
+        owner = self.client_class()
+        response = owner.post(login, {"username": "bidder", "password": "password"}, REMOTE_ADDR="10.0.0.2")
+        self.assertRedirects(response, reverse("index"), fetch_redirect_response=False)
+
+    @override_settings(AUCTIONS_CLIENT_IP_HEADER="HTTP_X_FORWARDED_FOR", AUCTIONS_TRUSTED_PROXIES=1)
+    def test_client_address_comes_from_the_trusted_proxy_header(self):
+        request = RequestFactory().get("/", HTTP_X_FORWARDED_FOR="6.6.6.6, 203.0.113.7", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(ratelimit.client_ip(request, {}), "203.0.113.7")
+        with self.settings(AUCTIONS_TRUSTED_PROXIES=2):
+            self.assertEqual(ratelimit.client_ip(request, {}), "6.6.6.6")
+        self.assertEqual(ratelimit.client_ip(RequestFactory().get("/", REMOTE_ADDR="10.0.0.1"), {}), "10.0.0.1")
+
+    def test_cache_backends_share_buckets(self):
+        first, second = ratelimit.CacheBackend(), ratelimit.CacheBackend()
+        key = f"test:{self.id()}"
+        self.assertEqual(first.take(key, 60, 1), 0)
+        self.assertGreater(second.take(key, 60, 1), 0)
+        caches["default"].delete(f"auctions.ratelimit:{key}")
+
+
+async_urls = ModuleType("async_urls")
+async_urls.urlpatterns = [path("", include(urls.build(async_views)))]
+
+
+# Committed rows: the async views read on connections of their own
+@override_settings(ROOT_URLCONF=async_urls)
+class AsyncReadViewTests(TransactionTestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.owner = make_user("seller")
+        self.listing = make_listing(self.owner, title="Brass telescope", category="Home")
+        self.closed = make_listing(self.owner, title="Tin drum", is_active=False)
+        self.bidder = make_user("bidder")
+        Comment.objects.create(listing=self.listing, user=self.bidder, content="Still available?")
+        Watchlist.objects.create(user=self.bidder, listing=self.listing)
+        self.async_client.force_login(self.bidder)
+
+    async def test_pages_render_without_lazy_queries(self):
+        # A query left to the template raises SynchronousOnlyOperation
+        pages = {
+            reverse("index"): "Brass telescope",
+            reverse("category_view", args=["Home"]): "Brass telescope",
+            reverse("auction_detail", args=[self.listing.id]): "Still available?",
+            reverse("auction_detail", args=[self.closed.id]): "No bids were placed",
+            reverse("watchlist"): "Brass telescope",
+        }
+        for url, text in pages.items():
+            response = await self.async_client.get(url)
+            self.assertContains(response, text)
+
+    async def test_detail_marks_watched_listings(self):
+        response = await self.async_client.get(reverse("auction_detail", args=[self.listing.id]))
+        self.assertTrue(response.context["is_watched"])
+        self.assertEqual(response.context["user"], self.bidder)
+
+    async def test_anonymous_watchlist_goes_to_login(self):
+        response = await self.async_client_class().get(reverse("watchlist"))
+        self.assertRedirects(response, f"{settings.LOGIN_URL}?next={reverse('watchlist')}", fetch_redirect_response=False)
+
+
+class BidArchiveTests(TestCase):
+
+    def setUp(self):
+        self.owner = make_user("seller")
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.old = make_listing(self.owner)
+        self.recent = make_listing(self.owner)
+        for listing in (self.old, self.recent):
+            bidding.place_bid(listing.id, self.alice, "11")
+            bidding.place_bid(listing.id, self.bob, "12")
+            bidding.place_bid(listing.id, self.alice, "15")
+            bidding.close_listing(listing.id, self.owner)
+        Listing.objects.filter(pk=self.old.pk).update(updated_at=timezone.now() - timezone.timedelta(days=40))
+        self.history = list(archive.bid_history(self.old.id))
+
+    def test_old_bids_move_to_a_summary_and_compressed_history(self):
+        report = archive.archive_closed_bids(days=30, batch_size=1, top=2)
+        self.assertEqual((report.listings, report.bids), (1, 3))
+        self.assertFalse(Bid.objects.filter(listing=self.old).exists())
+        self.assertEqual(Bid.objects.filter(listing=self.recent).count(), 3)
+        summary = BidArchive.objects.get(listing=self.old)
+        self.assertEqual((summary.bid_count, summary.winner, summary.won_price), (3, self.alice, Decimal("15.00")))
+        self.assertEqual([bid["amount"] for bid in summary.top_bids], ["15.00", "12.00"])
+        self.assertEqual(list(archive.bid_history(self.old.id)), self.history)
+
+    def test_archiving_again_changes_nothing(self):
+        archive.archive_closed_bids(days=30)
+        self.assertEqual(archive.archive_closed_bids(days=30), archive.ArchiveReport())
+        self.assertEqual(bidding.refresh_bid_stats(Listing.objects.filter(pk=self.old.pk)), 0)
+        self.old.refresh_from_db()
+        self.assertEqual(self.old.bid_count, 3)
+
+    def test_api_and_export_still_see_archived_bids(self):
+        call_command("archive_bids", "--days", "30", stdout=io.StringIO())
+        response = self.client.get(reverse("api_listing_bids", args=[self.old.id]))
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([(bid["amount"], bid["user"]) for bid in data["bids"]], [
+            ("15.00", "alice"), ("12.00", "bob"), ("11.00", "alice"),
+        ])
+        exported = [row for row in transfer.export_rows("bids") if row["listing"] == self.old.id]
+        self.assertEqual([row["amount"] for row in exported], [Decimal("11.00"), Decimal("12.00"), Decimal("15.00")])
+
+
+class FailingSender:
+
+    def send(self, messages):
+        raise ConnectionError("mail server down")
+
+
+class NotificationOutboxTests(TestCase):
+
+    def setUp(self):
+        notifications._sender = None
+        self.addCleanup(setattr, notifications, "_sender", None)
+        self.owner = make_user("seller")
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.lamp = make_listing(self.owner, title="Lamp")
+        self.chair = make_listing(self.owner, title="Chair")
+
+    def test_outbid_and_won_notices_are_queued_with_the_bid_and_close(self):
+        bidding.place_bid(self.lamp.id, self.alice, "11")
+        bidding.place_bid(self.lamp.id, self.alice, "12")
+        bidding.place_bid(self.lamp.id, self.bob, "13")
+        bidding.place_max_bid(self.lamp.id, self.alice, "20")
+        bidding.close_listing(self.lamp.id, self.owner)
+        self.assertEqual(
+            list(Notification.objects.order_by("pk").values_list("user__username", "kind", "amount")),
+            [("alice", "outbid", Decimal("13.00")), ("bob", "outbid", Decimal("13.50")), ("alice", "won", Decimal("13.50"))],
+        )
+
+    def test_a_bidding_war_queues_one_notice_for_the_displaced_leader(self):
+        carol = make_user("carol")
+        bidding.place_max_bid(self.lamp.id, self.alice, "50")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(bidding.place_max_bid(self.lamp.id, self.bob, "30").status, bidding.PROXY_OUTBID)
+        self.assertFalse([query for query in queries if query["sql"].startswith('SELECT "auctions_bid"')])
+        self.assertEqual(bidding.place_bid(self.lamp.id, carol, "40").status, bidding.PROXY_OUTBID)
+        self.assertFalse(Notification.objects.exists())
+        self.assertTrue(bidding.place_bid(self.lamp.id, carol, "60").accepted)
+        self.assertEqual(
+            list(Notification.objects.values_list("user__username", "kind", "amount")),
+            [("alice", "outbid", Decimal("60.00"))],
+        )
+
+    def test_outbid_notices_of_a_user_are_sent_as_one_message(self):
+        for listing in (self.lamp, self.chair):
+            bidding.place_bid(listing.id, self.alice, "11")
+            bidding.place_bid(listing.id, self.bob, "12")
+        bidding.place_bid(self.chair.id, self.alice, "13")
+        bidding.place_bid(self.chair.id, self.bob, "14")
+        bidding.close_listing(self.lamp.id, self.owner)
+
+        report = notifications.deliver_due()
+        # Bob's notice for the chair is dropped: he leads it again
+        self.assertEqual((report.notifications, report.messages, report.delivered, report.superseded), (5, 2, 4, 1))
+        self.assertEqual(sorted((email.to[0], email.subject) for email in mail.outbox), [
+            ("alice@example.com", "You have been outbid on 2 auctions"),
+            ("bob@example.com", "You won Lamp"),
+        ])
+        alice_email = next(email for email in mail.outbox if email.to == ["alice@example.com"])
+        self.assertIn("Lamp: outbid at 12.00", alice_email.body)
+        self.assertIn("Chair: outbid at 14.00", alice_email.body)
+        self.assertEqual(notifications.deliver_due(), notifications.DeliveryReport())
+
+    def test_notices_for_listings_the_user_leads_again_are_dropped(self):
+        bidding.place_bid(self.lamp.id, self.alice, "11")
+        bidding.place_bid(self.lamp.id, self.bob, "12")
+        bidding.place_bid(self.lamp.id, self.alice, "13")
+        report = notifications.deliver_due()
+        self.assertEqual((report.superseded, report.delivered), (1, 1))
+        self.assertEqual([email.to for email in mail.outbox], [["bob@example.com"]])
+        self.assertEqual(notifications.outbox_stats()["delivered"], 2)
+
+    @override_settings(AUCTIONS_NOTIFICATION_SENDER="auctions.tests.FailingSender", AUCTIONS_NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_failed_sends_are_retried_with_backoff_then_given_up(self):
+        bidding.place_bid(self.lamp.id, self.alice, "11")
+        bidding.place_bid(self.lamp.id, self.bob, "12")
+        now = timezone.now()
+        self.assertEqual(notifications.deliver_due(now=now).retried, 1)
+        notice = Notification.objects.get()
+        self.assertEqual((notice.attempts, notice.last_error), (1, "mail server down"))
+        self.assertGreaterEqual(notice.next_attempt_at, now + timezone.timedelta(seconds=notifications.RETRY_DELAY))
+        self.assertEqual(notifications.deliver_due(now=now).notifications, 0)
+
+        later = notice.next_attempt_at
+        self.assertEqual(notifications.deliver_due(now=later).failed, 1)
+        stats = notifications.outbox_stats()
+        self.assertEqual((stats["pending"], stats["failed"]), (0, 1))
+
+    def test_claimed_notices_are_not_claimed_again_until_the_lease_ends(self):
+        bidding.place_bid(self.lamp.id, self.alice, "11")
+        bidding.place_bid(self.lamp.id, self.bob, "12")
+        now = timezone.now()
+        self.assertEqual(len(notifications.claim(now=now)), 1)
+        self.assertEqual(notifications.claim(now=now), [])
+        self.assertEqual(len(notifications.claim(now=now + timezone.timedelta(seconds=notifications.LEASE))), 1)
@@ -0,0 +1,300 @@
+"""
+Streaming bulk import and export of listings, bids and comments.
+
+Records are read and written one line at a time and saved with batched
+bulk_create, so memory use does not grow with the size of the file.
+Users are referenced by username and resolved through a bounded cache;
+listings are referenced by id.
+"""
+import csv
+import json
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .archive import archived_bids, usernames
+from .models import Bid, BidArchive, Comment, Listing, User
+
+
+BATCH_SIZE = 5000
+CHUNK_SIZE = 2000
+FORMATS = ("jsonl", "csv")
+
+# Exported columns per kind. "owner" and "user" are usernames.
+FIELDS = {
+    "listings": [
+        "id", "title", "description", "starting_bid", "current_bid", "won_price",
+        "end_date", "image_url", "category", "created_at", "owner", "is_active",
+    ],
+    "bids": ["id", "listing", "user", "amount", "created_at"],
+    "comments": ["id", "listing", "user", "content", "created_at"],
+}
+KINDS = tuple(FIELDS)
+
+
+class RecordError(ValueError):
+    pass
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+    listing_ids: set = field(default_factory=set)
+
+    MAX_ERRORS = 20
+
+    def error(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(f"line {line}: {message}")
+
+
+class UserCache:
+    """
+        Username -> id lookups, resolved a batch at a time with one
+        query and remembered in a bounded LRU.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._ids = OrderedDict()
+
+    def prefetch(self, usernames):
+        missing = {name for name in usernames if name and name not in self._ids}
+        if missing:
+            for username, pk in User.objects.filter(username__in=missing).values_list("username", "id"):
+                self._remember(username, pk)
+
+    def get(self, username):
+        pk = self._ids.get(username)
+        if pk is not None:
+            self._ids.move_to_end(username)
+        return pk
+
+    def _remember(self, username, pk):
+        self._ids[username] = pk
+        if len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+
+def read_records(stream, format):
+    """Yield (line number, dict) pairs from a JSONL or CSV text stream."""
+    if format == "csv":
+        for number, row in enumerate(csv.DictReader(stream), start=2):
+            yield number, row
+        return
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if line:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as exc:
+                record = RecordError(f"invalid JSON ({exc.msg})")
+            if not isinstance(record, (dict, RecordError)):
+                record = RecordError("expected a JSON object")
+            yield number, record
+
+
+def _decimal(value, name):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        raise RecordError(f"invalid {name} {value!r}")
+
+
+def _datetime(value, name, default=None):
+    if value in (None, ""):
+        return default
+    parsed = parse_datetime(value) if isinstance(value, str) else value
+    if not isinstance(parsed, datetime):
+        raise RecordError(f"invalid {name} {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+def _user_id(users, username, name):
+    pk = users.get(username)
+    if pk is None:
+        raise RecordError(f"unknown {name} {username!r}")
+    return pk
+
+
+def _pk(record):
+    return int(record["id"]) if record.get("id") not in (None, "") else None
+
+
+def build_listing(record, users, now):
+    listing = Listing(
+        id=_pk(record),
+        title=record["title"],
+        description=record.get("description") or "",
+        starting_bid=_decimal(record["starting_bid"], "starting_bid"),
+        current_bid=_decimal(record.get("current_bid") or 0, "current_bid"),
+        won_price=_decimal(record.get("won_price") or 0, "won_price"),
+        end_date=_datetime(record.get("end_date"), "end_date"),
+        image_url=record.get("image_url") or "",
+        category=record.get("category") or "",
+        created_at=_datetime(record.get("created_at"), "created_at", now),
+        owner_id=_user_id(users, record["owner"], "owner"),
+        is_active=_bool(record.get("is_active", True)),
+    )
+    # Same defaults Listing.save() applies to a new listing
+    listing.apply_defaults()
+    return listing
+
+
+def build_bid(record, users, now):
+    return Bid(
+        id=_pk(record),
+        listing_id=int(record["listing"]),
+        user_id=_user_id(users, record["user"], "user"),
+        amount=_decimal(record["amount"], "amount"),
+        created_at=_datetime(record.get("created_at"), "created_at", now),
+    )
+
+
+def build_comment(record, users, now):
+    return Comment(
+        id=_pk(record),
+        listing_id=int(record["listing"]),
+        user_id=_user_id(users, record["user"], "user"),
+        content=record["content"],
+        created_at=_datetime(record.get("created_at"), "created_at", now),
+    )
+
+
+BUILDERS = {
+    "listings": (Listing, "owner", build_listing),
+    "bids": (Bid, "user", build_bid),
+    "comments": (Comment, "user", build_comment),
+}
+
+
+def _drop_unknown_listings(built, report):
+    # One query per batch instead of failing the whole batch on commit
+    wanted = {obj.listing_id for _, obj in built}
+    known = set(Listing.objects.filter(pk__in=wanted).values_list("pk", flat=True))
+    if known == wanted:
+        return built
+    kept = []
+    for number, obj in built:
+        if obj.listing_id in known:
+            kept.append((number, obj))
+        else:
+            report.error(number, f"unknown listing {obj.listing_id}")
+    return kept
+
+
+def import_records(kind, records, batch_size=BATCH_SIZE, ignore_conflicts=False):
+    """
+        Import (line number, record) pairs of `kind`. Invalid records are
+        skipped and reported; each batch is saved in its own transaction.
+    """
+    model, user_field, build = BUILDERS[kind]
+    users = UserCache()
+    report = ImportReport()
+    now = timezone.now()
+    batch = []
+
+    def flush():
+        users.prefetch(record.get(user_field) for _, record in batch)
+        built = []
+        for number, record in batch:
+            try:
+                built.append((number, build(record, users, now)))
+            except KeyError as exc:
+                report.error(number, f"missing field {exc}")
+            except (RecordError, TypeError, ValueError) as exc:
+                report.error(number, exc)
+        if model is not Listing and built:
+            built = _drop_unknown_listings(built, report)
+        objects = [obj for _, obj in built]
+        with transaction.atomic():
+            model.objects.bulk_create(objects, ignore_conflicts=ignore_conflicts)
+        report.created += len(objects)
+        if model is Bid:
+            report.listing_ids.update(obj.listing_id for obj in objects)
+        batch.clear()
+
+    for number, record in records:
+        if isinstance(record, RecordError):
+            report.error(number, record)
+            continue
+        batch.append((number, record))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return report
+
+
+def export_rows(kind, chunk_size=CHUNK_SIZE):
+    """Yield one dict per row of `kind`, fetched `chunk_size` rows at a time."""
+    if kind == "listings":
+        queryset = Listing.objects.values_list(
+            "id", "title", "description", "starting_bid", "current_bid", "won_price",
+            "end_date", "image_url", "category", "created_at", "owner__username", "is_active",
+        )
+    elif kind == "bids":
+        queryset = Bid.objects.values_list("id", "listing_id", "user__username", "amount", "created_at")
+    else:
+        queryset = Comment.objects.values_list("id", "listing_id", "user__username", "content", "created_at")
+    names = FIELDS[kind]
+    for row in queryset.order_by("id").iterator(chunk_size=chunk_size):
+        yield dict(zip(names, row))
+    if kind == "bids":
+        yield from _archived_bid_rows()
+
+
+def _archived_bid_rows():
+    # After the Bid table: the bids moved to archives by auctions.archive
+    for bid_archive in BidArchive.objects.order_by("pk").iterator(chunk_size=100):
+        bids = list(archived_bids(bid_archive))
+        names = usernames(bid["user"] for bid in bids)
+        for bid in sorted(bids, key=lambda bid: bid["id"]):
+            yield {
+                "id": bid["id"],
+                "listing": bid_archive.listing_id,
+                "user": names.get(bid["user"]),
+                "amount": bid["amount"],
+                "created_at": bid["created_at"],
+            }
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def write_records(kind, rows, stream, format):
+    """Write `rows` to `stream` as JSONL or CSV and return how many were written."""
+    count = 0
+    if format == "csv":
+        writer = csv.DictWriter(stream, fieldnames=FIELDS[kind])
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: _encode(value) for key, value in row.items()})
+            count += 1
+        return count
+    for row in rows:
+        stream.write(json.dumps({key: _encode(value) for key, value in row.items()}, separators=(",", ":")))
+        stream.write("\n")
+        count += 1
+    return count
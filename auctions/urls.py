@@ -1,19 +1,35 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import api, async_views, views
 
-urlpatterns = [
-    path("", views.index, name="index"),
-    path("login", views.login_view, name="login"),
-    path("logout", views.logout_view, name="logout"),
-    path("register", views.register, name="register"),
-    path("create_auction", views.create_auction, name="create_auction"),
-    path("listing/<int:auction_id>", views.auction_detail, name="auction_detail"),
-    path("bid/<int:auction_id>", views.place_bid, name="place_bid"),
-    path("watchlist", views.watchlist, name="watchlist"),
-    path("add_to_watchlist/<int:auction_id>", views.add_to_watchlist, name="add_to_watchlist"),
-    path("remove_from_watchlist/<int:auction_id>", views.remove_from_watchlist, name="remove_from_watchlist"),
-    path('add_comment/<int:auction_id>', views.add_comment, name='add_comment'),
-    path('close_auction/<int:auction_id>', views.close_auction, name='close_auction'),
-    path('category/<str:category_name>', views.category_view, name='category_view'),
-]
+
+def build(read_views):
+    """The app's URL patterns, with index, category, detail and watchlist pages from `read_views`."""
+    return [
+        path("", read_views.index, name="index"),
+        path("login", views.login_view, name="login"),
+        path("logout", views.logout_view, name="logout"),
+        path("register", views.register, name="register"),
+        path("create_auction", views.create_auction, name="create_auction"),
+        path("listing/<int:auction_id>", read_views.auction_detail, name="auction_detail"),
+        path("listing/<int:auction_id>/events", views.listing_events, name="listing_events"),
+        path("listing/<int:auction_id>/comments", views.listing_comments, name="listing_comments"),
+        path("bid/<int:auction_id>", views.place_bid, name="place_bid"),
+        path("max_bid/<int:auction_id>", views.place_max_bid, name="place_max_bid"),
+        path("watchlist", read_views.watchlist, name="watchlist"),
+        path("add_to_watchlist/<int:auction_id>", views.add_to_watchlist, name="add_to_watchlist"),
+        path("remove_from_watchlist/<int:auction_id>", views.remove_from_watchlist, name="remove_from_watchlist"),
+        path('add_comment/<int:auction_id>', views.add_comment, name='add_comment'),
+        path('close_auction/<int:auction_id>', views.close_auction, name='close_auction'),
+        path('category/<str:category_name>', read_views.category_view, name='category_view'),
+        path('search', views.search_view, name='search'),
+        path('cache_stats', views.cache_stats, name='cache_stats'),
+        path("api/v1/listings", api.listing_feed, name="api_listings"),
+        path("api/v1/listings/<int:auction_id>", api.listing_detail, name="api_listing"),
+        path("api/v1/listings/<int:auction_id>/bids", api.listing_bids, name="api_listing_bids"),
+    ]
+
+
+# Under ASGI the read views load their data concurrently (auctions/async_views.py)
+urlpatterns = build(async_views if getattr(settings, "AUCTIONS_ASYNC_VIEWS", False) else views)
@@ -1,21 +1,33 @@
+import asyncio
+
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
+from django.core.handlers.asgi import ASGIRequest
 from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
-from django.contrib.auth.decorators import login_required
+from django.utils.functional import SimpleLazyObject
+from django.contrib.auth.decorators import login_required, user_passes_test
 
+from auctions import bidding, caching, comments, events, feeds, images, ratelimit, search, signals
 from auctions.common import CATEGORY_CHOICES
-from .models import User, Listing, Bid, Comment, Watchlist
+from .models import User, Listing, Comment, Watchlist
+from .pagination import get_page_size, keyset_paginate, newest_first_paginate
 
 
 def index(request):
-    listings = Listing.objects.filter().order_by('created_at')
+    """
+        Render one page of active listings, oldest first.
+        The `after` query parameter is the cursor of the previous page
+    """
+    page = keyset_paginate(feeds.listing_keys(feeds.active()), request.GET.get("after"), get_page_size(request))
     return render(request, "auctions/index.html", {
-        "listings": listings,
-        "categories": [category[0] for category in CATEGORY_CHOICES] # List of categories for the dropdown
+        "cards": caching.listing_cards_html(page, "index"),
+        "page": page,
     })
 
+@ratelimit.limit("login", methods=("POST",))
 def login_view(request):
     if request.method == "POST":
 
@@ -93,6 +105,7 @@ def create_auction(request):
         starting_bid = request.POST["starting_bid"]
         end_date = request.POST["end_date"]
         image_auction = request.POST.get("image_auction", None)
+        image_upload = request.FILES.get("image_upload")
         categories = request.POST["category"]
         auction = Listing(
             title=title,
@@ -102,11 +115,23 @@ def create_auction(request):
             category=categories,
             owner=request.user
         )
+        if image_upload:
+            try:
+                images.validate(image_upload)
+            except images.InvalidImage as error:
+                return render(request, "auctions/auction_form.html", {
+                    "user": request.user,
+                    "categories": categories_list,
+                    "error": str(error),
+                })
+            auction.image = image_upload
         if image_auction:
             auction.image_url = image_auction
         else:
             auction.image_url = "https://placehold.co/600x400"
         auction.save()
+        if image_upload:
+            images.schedule(auction.id)
     return redirect("/", {
         "message": "Auction created successfully!"
     })
@@ -117,86 +142,121 @@ def auction_detail(request, auction_id):
         Render the auction detail page for a specific auction
         with the auction item, comments, and check if the user is the owner
         If the auction is closed, display the user who won the auction
+        The summary and comments come from the fragment cache; the
+        version is read first so a newer bid cannot be cached as older
     """
-    item = Listing.objects.get(id=auction_id)
-    if not item.is_active:
-        #if item.won_price > 0 and item.current_bid != item.starting_bid:
-        winner = Bid.objects.filter(listing=item).order_by('-amount').first()
-        if winner:
-            is_winner = winner.user == request.user
-        else:
-            is_winner = False
-        return render(request, "auctions/auction_detail.html", {
-            "listing": item,
-            "comments": item.comments.all(),
-            "is_owner": item.owner == request.user,
-            "is_active": item.is_active,
-            "is_winner": is_winner,
-            "winner": winner if winner else None
-        })
-    else:
-        winner = None
-        is_winner = False
-        return render(request, "auctions/auction_detail.html", {
-            "listing": item,
-            "comments": item.comments.all(),
-            "is_owner": item.owner == request.user,
-            "is_active": item.is_active,
-            "is_winner": is_winner
-        })
+    version = caching.versions([auction_id])[auction_id]
+    item = Listing.objects.select_related("owner", "high_bidder").get(id=auction_id)
+    is_winner = (
+        not item.is_active
+        and item.high_bidder_id is not None
+        and item.high_bidder_id == request.user.id
+    )
+    return render(request, "auctions/auction_detail.html", {
+        "listing": item,
+        "fragments": caching.detail_fragments(
+            item, version, SimpleLazyObject(lambda: comments.comment_page(auction_id))
+        ),
+        "is_owner": item.owner == request.user,
+        "is_active": item.is_active,
+        "is_winner": is_winner,
+        "is_watched": auction_id in caching.watched_ids(request.user),
+        "winner": item.high_bidder if not item.is_active else None
+    })
+
+async def listing_events(request, auction_id):
+    """
+        Stream bid, comment and close events of a listing as server-sent
+        events. Needs an ASGI server; under WSGI answer 204 so that the
+        browser's EventSource stops reconnecting.
+        The stream ends after AUCTIONS_EVENT_STREAM_TIMEOUT seconds and
+        the browser reconnects, so abandoned connections cannot pile up.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    subscription = events.get_broker().subscribe(events.channel_name(auction_id))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + getattr(settings, "AUCTIONS_EVENT_STREAM_TIMEOUT", events.STREAM_TIMEOUT)
+    heartbeat = getattr(settings, "AUCTIONS_EVENT_HEARTBEAT", events.HEARTBEAT)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while loop.time() < deadline:
+                message = await subscription.get(timeout=heartbeat)
+                yield message if message is not None else ": keep-alive\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 @login_required
+@ratelimit.limit("place_bid")
 def place_bid(request, auction_id):
     """
         Get bid of current user for a specific auction
-        check if the bid is higher than the current bid
-        if so, update the current bid and create a new Bid object
+        and hand it to the bidding service, which accepts it only
+        if it is higher than the current bid at the moment of writing
     """
-    item = Listing.objects.get(id=auction_id)
-    if request.method == "POST":
-        bid_amount = request.POST.get("bid_amount", None) 
-        if bid_amount is None:
-            return render(request, "auctions/auction_detail.html", {
-                "listing": item,
-                "message": "Please enter a bid amount."
-            })
-        try:
-            bid_amount = float(bid_amount) #parse the bid amount to float
-            if bid_amount <= item.current_bid:
-                return render(request, "auctions/auction_detail.html", {
-                    "listing": item,
-                    "message": "Bid must be higher than the current bid."
-                })
-            # Update the current bid of the item
-            item.current_bid = bid_amount
-            item.save()
-            # Create a new Bid object
-            new_bid = Bid(listing=item, user=request.user, amount=bid_amount)
-            new_bid.save()
-            return render(request, "auctions/auction_detail.html", {
-                "listing": item,
-                "message": "Bid placed successfully!"
-            })
-        except ValueError:
-            return render(request, "auctions/auction_detail.html", {
-                "listing": item,
-                "message": "Invalid bid amount. Please enter a valid number."
-            })
+    if request.method != "POST":
+        return redirect("auction_detail", auction_id=auction_id)
+
+    bid_amount = request.POST.get("bid_amount", None)
+    listings = Listing.objects.select_related("owner", "high_bidder")
+    if bid_amount is None:
+        return render(request, "auctions/auction_detail.html", {
+            "listing": listings.get(id=auction_id),
+            "message": "Please enter a bid amount."
+        })
+    result = bidding.place_bid(auction_id, request.user, bid_amount)
+    return render(request, "auctions/auction_detail.html", {
+        "listing": listings.get(id=auction_id),
+        "message": result.message
+    })
+
+@login_required
+@ratelimit.limit("place_max_bid")
+def place_max_bid(request, auction_id):
+    """
+        Register the highest amount the current user will pay for an
+        auction; the bidding service bids for them up to it, one
+        increment above competing bids
+    """
+    if request.method != "POST":
+        return redirect("auction_detail", auction_id=auction_id)
+
+    result = bidding.place_max_bid(auction_id, request.user, request.POST.get("max_amount", ""))
+    return render(request, "auctions/auction_detail.html", {
+        "listing": Listing.objects.select_related("owner", "high_bidder").get(id=auction_id),
+        "message": result.message
+    })
+
+def watchlist_items(user):
+    return (
+        Watchlist.objects.filter(user=user)
+        .select_related("listing")
+        .only("id", "listing__id", "listing__title", "listing__image_url", "listing__image", "listing__thumbnails")
+    )
 
 @login_required
 def watchlist(request):
     """
-        Render the user's watchlist
-        Display all items in the watchlist
+        Render one page of the user's watchlist, most recently added first
+        The listings are joined in the same query, loading only the
+        columns the page shows
     """
-    user_watchlist = Watchlist.objects.filter(user=request.user)
-    for item in user_watchlist:
-        print(item.listing.id, item.listing.title)
+    page = newest_first_paginate(watchlist_items(request.user), request.GET.get("after"), get_page_size(request))
     return render(request, "auctions/watchlist.html", {
-        "watchlist": user_watchlist,
+        "watchlist": page,
+        "page": page,
     })
 
 @login_required
+@ratelimit.limit("add_to_watchlist")
 def add_to_watchlist(request, auction_id):
     """
         Add an item to the user's watchlist
@@ -208,9 +268,11 @@ def add_to_watchlist(request, auction_id):
     if not created:
         message = "Item already in your watchlist."
     else:
+        caching.forget_watched(request.user.id)
         message = "Item added to your watchlist."
     return render(request, "auctions/auction_detail.html", {
         "listing": item,
+        "is_watched": True,
         "message": message
     })
 
@@ -221,9 +283,9 @@ def remove_from_watchlist(request, auction_id):
         remove an item from the user's watchlist
     """
     item = Listing.objects.get(id=auction_id)
-    watchlist_item = Watchlist.objects.filter(user=request.user, listing=item)
-    if watchlist_item.exists():
-        watchlist_item.delete()
+    deleted, _ = Watchlist.objects.filter(user=request.user, listing=item).delete()
+    if deleted:
+        caching.forget_watched(request.user.id)
         message = "Item removed from your watchlist."
     else:
         message = "Item not found in your watchlist."
@@ -233,6 +295,7 @@ def remove_from_watchlist(request, auction_id):
     })
 
 @login_required
+@ratelimit.limit("add_comment")
 def add_comment(request, auction_id):
     """
         Add a comment to an auction listing
@@ -246,17 +309,18 @@ def add_comment(request, auction_id):
         if comment_content:
             new_comment = Comment(listing=item, user=request.user, content=comment_content)
             new_comment.save()
+            signals.comment_added.send(sender=Listing, listing_id=item.id, comment=new_comment)
             
             return render(request, "auctions/auction_detail.html", {
                 "listing": item,
-                "comments": item.comments.all(),
+                "comments": comments.comment_page(item.id),
                 "message": "Comment added successfully!",
                 "page_url": request.build_absolute_uri()
             })
         else:
-            return redirect(request, "auctions/auction_detail.html", {
+            return render(request, "auctions/auction_detail.html", {
                 "listing": item,
-                "comments": item.comments.all(),
+                "comments": comments.comment_page(item.id),
                 "message": "Comment content cannot be empty."
             })
 
@@ -265,33 +329,84 @@ def close_auction(request, auction_id):
     """
         Check if the auction is active
         and current user is the owner of the auction
-        If so, close the auction and update the won price
+        If so, close the auction and record the won price
     """
-    item = Listing.objects.get(id=auction_id)
-    if item.is_active and item.owner == request.user:
-        item.is_active = False
-        item.won_price = item.current_bid
-        item.save()
+    closed = bidding.close_listing(auction_id, request.user)
+    item = Listing.objects.select_related("owner", "high_bidder").get(id=auction_id)
+    if closed:
         return render(request, "auctions/auction_detail.html", {
             "listing": item,
             "message": "Auction closed successfully!",
-            "comments": item.comments.all(),
-            "is_owner": True
+            "comments": comments.comment_page(item.id),
+            "is_owner": True,
+            "winner": item.high_bidder
         })
     else:
         return render(request, "auctions/auction_detail.html", {
             "listing": item,
-            "comments": item.comments.all(),
-            "is_owner": False
+            "comments": comments.comment_page(item.id),
+            "is_owner": item.owner == request.user
         })
 
+def listing_comments(request, auction_id):
+    """
+        One page of a listing's comments, newest first, as JSON
+        `next` is the cursor of the following page, or null on the last one
+    """
+    page = comments.comment_page(auction_id, request.GET.get("after"), get_page_size(request))
+    return JsonResponse({
+        "comments": [comments.serialize(comment) for comment in page],
+        "next": page.next_cursor,
+    })
+
 def category_view(request, category_name):
     """
-        Render the auction listings for a specific category
+        Render one page of the active auction listings for a specific category
     """
-    listings = Listing.objects.filter(category=category_name, is_active=True).order_by('created_at')
+    page = keyset_paginate(
+        feeds.listing_keys(feeds.in_category(category_name)), request.GET.get("after"), get_page_size(request)
+    )
     return render(request, "auctions/category.html", {
         "category": category_name,
-        "listings": listings,
+        "cards": caching.listing_cards_html(page, "category"),
+        "page": page,
+    })
+
+
+def search_view(request):
+    """
+        Full-text search over listing titles and descriptions,
+        ranked by relevance and filterable by category and state
+    """
+    query = request.GET.get("q", "").strip()
+    category = request.GET.get("category", "")
+    status = request.GET.get("status", search.ACTIVE)
+    if status not in search.STATUSES:
+        status = search.ACTIVE
+    try:
+        page_number = int(request.GET.get("page", 1))
+    except ValueError:
+        page_number = 1
+    results = search.search_listings(
+        query,
+        category=category or None,
+        status=status,
+        page=page_number,
+        page_size=get_page_size(request),
+    )
+    return render(request, "auctions/search.html", {
+        "query": query,
+        "category": category,
+        "status": status,
+        "statuses": search.STATUSES,
+        "results": results,
         "categories": [category[0] for category in CATEGORY_CHOICES]
-    })
\ No newline at end of file
+    })
+
+
+@user_passes_test(lambda user: user.is_staff)
+def cache_stats(request):
+    """
+        Hit and miss counters of the fragment cache in this server process
+    """
+    return JsonResponse(caching.stats())
@@ -3,6 +3,12 @@ ASGI config for commerce project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project through this module (e.g. ``uvicorn commerce.asgi:application``)
+to enable the live listing event streams at /listing/<id>/events; under WSGI
+those endpoints answer 204 No Content. The index, category, listing and
+watchlist pages are served by the async views in auctions/async_views.py,
+unless AUCTIONS_ASYNC_VIEWS=0.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 """
@@ -12,5 +18,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'commerce.settings')
+os.environ.setdefault('AUCTIONS_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
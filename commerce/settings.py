@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.0/ref/settings/
 """
 
+import importlib.util
 import os
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -41,7 +42,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'auctions.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'auctions.assets.StaticAssetMiddleware',
+    'auctions.routing.PrimaryPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -63,6 +67,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'auctions.context_processors.watched',
+                'auctions.context_processors.category_facets',
             ],
         },
     },
@@ -74,15 +80,124 @@ WSGI_APPLICATION = 'commerce.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# AUCTIONS_DB_PROFILE selects sqlite-wal (default), sqlite or postgres;
+# see auctions/db.py. Connections are kept for CONN_MAX_AGE seconds
+# instead of being opened for every request.
+
+AUCTIONS_DB_PROFILE = os.environ.get('AUCTIONS_DB_PROFILE', 'sqlite-wal')
+
+# Django has no connection pool of its own: CONN_MAX_AGE keeps one
+# persistent connection per thread. Pool PostgreSQL connections with
+# PgBouncer in front of it. AUCTIONS_PGBOUNCER=1 says PgBouncer runs in
+# transaction pooling mode, where a server connection keeps no state
+# between transactions, so server-side cursors and psycopg 3's prepared
+# statements are turned off; a system check (auctions/db.py) keeps them off.
+AUCTIONS_PGBOUNCER = os.environ.get('AUCTIONS_PGBOUNCER') == '1'
+
+if AUCTIONS_DB_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'commerce'),
+            'USER': os.environ.get('POSTGRES_USER', 'commerce'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': AUCTIONS_PGBOUNCER,
+            # psycopg 3 prepares a query once it has run five times;
+            # psycopg2 never does, and would reject the option
+            'OPTIONS': (
+                {'prepare_threshold': None}
+                if AUCTIONS_PGBOUNCER and importlib.util.find_spec('psycopg') else {}
+            ),
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+            'CONN_MAX_AGE': 0 if AUCTIONS_DB_PROFILE == 'sqlite' else 600,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+
+# Read replicas: reads go to these aliases and writes to "default"
+# (auctions/routing.py). POSTGRES_REPLICA_HOSTS lists replica hosts;
+# with SQLite, AUCTIONS_SQLITE_REPLICAS=N adds N replica files that the
+# sync_replicas command copies from the primary, standing in for
+# replication.
+
+if AUCTIONS_DB_PROFILE == 'postgres':
+    _replicas = [{'HOST': host} for host in os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',') if host]
+else:
+    _replicas = [
+        {'NAME': os.path.join(BASE_DIR, f'db-replica{n}.sqlite3')}
+        for n in range(1, int(os.environ.get('AUCTIONS_SQLITE_REPLICAS', '0')) + 1)
+    ]
+AUCTIONS_DB_REPLICAS = []
+for _n, _replica in enumerate(_replicas, 1):
+    DATABASES[f'replica{_n}'] = {**DATABASES['default'], **_replica, 'TEST': {'MIRROR': 'default'}}
+    AUCTIONS_DB_REPLICAS.append(f'replica{_n}')
+
+DATABASE_ROUTERS = ['auctions.routing.PrimaryReplicaRouter']
+# Seconds a browser reads from the primary after a request of its wrote
+AUCTIONS_PRIMARY_PIN_SECONDS = 5
 
 AUTH_USER_MODEL = 'auctions.User'
 
+# Logged-in users are read from the "users" cache, without their password
+# hashes (auctions/auth.py)
+AUTHENTICATION_BACKENDS = ['auctions.auth.CachedModelBackend']
+
+# Sessions are read from the "sessions" cache; changes to existing ones
+# reach django_session in one batch per interval (auctions/sessions.py).
+# Several server processes need a shared cache for both.
+SESSION_ENGINE = 'auctions.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+AUCTIONS_SESSION_WRITE_INTERVAL = 30
+
+# Caches
+# The "fragments" cache holds rendered listing cards and detail page
+# sections (auctions/caching.py). LocMemCache evicts least recently used
+# entries beyond MAX_ENTRIES; set AUCTIONS_FRAGMENT_CACHE_DIR to share a
+# file-based cache between server processes instead.
+
+AUCTIONS_FRAGMENT_CACHE = 'fragments'
+AUCTIONS_USER_CACHE = 'users'
+AUCTIONS_FRAGMENT_CACHE_DIR = os.environ.get('AUCTIONS_FRAGMENT_CACHE_DIR')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auctions-fragments',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auctions-sessions',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    # Kept in the process whatever the fragments cache is
+    'users': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auctions-users',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+if AUCTIONS_FRAGMENT_CACHE_DIR:
+    CACHES['fragments'].update({
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': AUCTIONS_FRAGMENT_CACHE_DIR,
+    })
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -133,7 +248,100 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# collectstatic writes content-hashed copies with .gz/.br siblings here
+# (auctions/assets.py); StaticAssetMiddleware serves them once it exists
+STATIC_ROOT = os.environ.get('AUCTIONS_STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'auctions.assets.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Seconds browsers may cache static files served under their source names
+AUCTIONS_STATIC_MAX_AGE = 60
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-LOGIN_URL = '/login'
\ No newline at end of file
+# Listing image uploads (auctions/images.py): threads that make the
+# thumbnails after the response is sent; 0 makes them in the request
+AUCTIONS_THUMBNAIL_WORKERS = 2
+AUCTIONS_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+LOGIN_URL = '/login'
+
+# Listing feeds (index and category pages)
+
+AUCTIONS_PAGE_SIZE = 20
+AUCTIONS_MAX_PAGE_SIZE = 100
+
+# Seconds between in-process expiry sweeps; None disables the sweeper thread
+# (use the close_expired_auctions management command from cron instead)
+AUCTIONS_EXPIRY_SWEEP_INTERVAL = None
+
+# Bids of listings closed this many days ago move to compressed archives
+# when the archive_bids command runs (auctions/archive.py)
+AUCTIONS_BID_ARCHIVE_DAYS = 30
+
+# Outbid and auction-won notifications (auctions/notifications.py): queued
+# in the transaction of the bid or close, sent by the send_notifications
+# worker. The default sender emails through EMAIL_BACKEND: the console
+# here; 'django.core.mail.backends.filebased.EmailBackend' with
+# EMAIL_FILE_PATH writes them to files instead.
+AUCTIONS_NOTIFICATION_SENDER = 'auctions.notifications.EmailSender'
+AUCTIONS_NOTIFICATION_MAX_ATTEMPTS = 8
+# Days sent notifications are kept before the worker deletes them
+AUCTIONS_NOTIFICATION_RETENTION_DAYS = 7
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Live listing events (server-sent events, served under ASGI only)
+
+AUCTIONS_EVENT_BROKER = 'auctions.events.InMemoryBroker'
+AUCTIONS_EVENT_HEARTBEAT = 15
+AUCTIONS_EVENT_STREAM_TIMEOUT = 300
+
+# Async read views (auctions/async_views.py), on under commerce/asgi.py,
+# and the threads, each with its own connection, that run their queries
+AUCTIONS_ASYNC_VIEWS = os.environ.get('AUCTIONS_ASYNC_VIEWS') == '1'
+AUCTIONS_QUERY_WORKERS = 8
+
+# Token-bucket rate limits of the write views (auctions/ratelimit.py);
+# AUCTIONS_RATE_LIMITS replaces the buckets per view. Several server
+# processes share buckets through CacheBackend and a shared cache.
+AUCTIONS_RATE_LIMIT_BACKEND = 'auctions.ratelimit.LocalBackend'
+AUCTIONS_RATE_LIMIT_CACHE = 'default'
+# The client address of the "ip" buckets: REMOTE_ADDR, or behind proxies
+# the header they set (e.g. HTTP_X_FORWARDED_FOR) and how many of them
+# append to it
+AUCTIONS_CLIENT_IP_HEADER = os.environ.get('AUCTIONS_CLIENT_IP_HEADER', 'REMOTE_ADDR')
+AUCTIONS_TRUSTED_PROXIES = int(os.environ.get('AUCTIONS_TRUSTED_PROXIES', '1'))
+
+# Per-request profiling: Server-Timing header and one JSON log line per
+# profiled request. Fraction of requests profiled; 0 turns it off
+AUCTIONS_PROFILING_SAMPLE_RATE = 0.1
+# Statements listed in the log line, slowest first
+AUCTIONS_PROFILING_SLOW_QUERIES = 5
+# Same SQL run this many times with different parameters is logged as N+1
+AUCTIONS_PROFILING_N_PLUS_ONE = 5
+
+# Like Django's own loggers, printed to the console only when DEBUG is on;
+# production deployments attach their own handlers to "auctions.profiling"
+# and "auctions.notifications"
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'require_debug_true': {'()': 'django.utils.log.RequireDebugTrue'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'filters': ['require_debug_true']},
+    },
+    'loggers': {
+        'auctions.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'auctions.notifications': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}